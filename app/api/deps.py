@@ -1,10 +1,70 @@
-from fastapi import Header, HTTPException, status
+import math
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from app.core.api_keys import ApiKey, api_key_store
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.rate_limit import buckets, concurrency
+
+# Вес запроса в токенах rate limit: простой запрос по ID стоит 1
+COST_NAME_SEARCH = 2
+COST_AREA_SEARCH = 3
+COST_TREE = 5
+COST_BULK = 10
+
+
+def _too_many_requests(api_key: ApiKey, reason: str, retry_after: float):
+    metrics.inc("rate_limit_rejected_total", key=api_key.name, reason=reason)
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded" if reason == "rate" else "Too many concurrent requests",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def charge(api_key: ApiKey, cost: float):
+    """Списать cost токенов из корзины ключа или ответить 429"""
+    if not settings.RATE_LIMIT_ENABLED or cost <= 0:
+        return
+    # Запрос дороже емкости корзины иначе не прошел бы никогда
+    retry_after = buckets.acquire(api_key.name, min(cost, api_key.burst), api_key.rate, api_key.burst)
+    if retry_after > 0:
+        _too_many_requests(api_key, "rate", retry_after)
+
 
 def verify_api_key(x_api_key: str = Header(...)):
-    if x_api_key != settings.API_KEY:
+    api_key = api_key_store.get(x_api_key)
+    if api_key is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key"
         )
-    return x_api_key
\ No newline at end of file
+    if not settings.RATE_LIMIT_ENABLED:
+        yield api_key
+        return
+
+    charge(api_key, 1)
+    if not concurrency.enter(api_key.name, api_key.concurrency):
+        _too_many_requests(api_key, "concurrency", 1)
+    try:
+        yield api_key
+    finally:
+        concurrency.exit(api_key.name)
+
+
+def request_cost(weight: int):
+    """Зависимость для дорогих эндпоинтов: доплата к единице, уже списанной verify_api_key"""
+
+    def charge_request(api_key: ApiKey = Depends(verify_api_key)):
+        charge(api_key, weight - 1)
+
+    return charge_request
+
+
+def organization_search_cost(request: Request, api_key: ApiKey = Depends(verify_api_key)):
+    """Вес поиска организаций зависит от фильтра: поддерево и область дороже поиска по имени"""
+    params = request.query_params
+    if "activity_id" in params or "in_area" in params:
+        charge(api_key, COST_AREA_SEARCH - 1)
+    elif "name" in params:
+        charge(api_key, COST_NAME_SEARCH - 1)
@@ -3,14 +3,18 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app.core.database import get_db
-from app.api.deps import verify_api_key
+from app.core.responses import json_response
+from app.api.deps import COST_BULK, COST_TREE, request_cost, verify_api_key
 from app.crud import activity as crud_activity
-from app.schemas.activity import ActivityTree, ActivityDetail, ActivityCreate, ActivityUpdate, ActivitySimple
+from app.schemas.activity import (
+    ActivityTree, ActivityDetail, ActivityCreate, ActivityUpdate, ActivitySimple, ActivityStats,
+    ActivityImport, ActivityImportResult, ActivityMove
+)
 
 router = APIRouter(dependencies=[Depends(verify_api_key)])
 
 
-@router.get("/", response_model=List[ActivityTree])
+@router.get("/", response_model=List[ActivityTree], dependencies=[Depends(request_cost(COST_TREE))])
 def get_activities_tree(
         db: Session = Depends(get_db),
         max_depth: int = Query(3, ge=1, le=3, description="Максимальная глубина вложенности (1-3)")
@@ -18,30 +22,26 @@ def get_activities_tree(
     """
     Получить дерево видов деятельности с ограничением вложенности
     """
+    return json_response(crud_activity.activity.get_tree(db, max_depth=max_depth))
 
-    def build_tree_with_depth(activity, current_depth=0):
-        if current_depth >= max_depth:
-            return ActivityTree(
-                id=activity.id,
-                name=activity.name,
-                parent_id=activity.parent_id,
-                children=[]
-            )
-
-        children = [
-            build_tree_with_depth(child, current_depth + 1)
-            for child in activity.children
-        ]
-
-        return ActivityTree(
-            id=activity.id,
-            name=activity.name,
-            parent_id=activity.parent_id,
-            children=children
-        )
 
-    root_activities = crud_activity.activity.get_tree(db)
-    return [build_tree_with_depth(activity) for activity in root_activities]
+@router.get("/stats", response_model=List[ActivityStats], dependencies=[Depends(request_cost(COST_TREE))])
+def get_activities_stats(db: Session = Depends(get_db)):
+    """Статистика по всем видам деятельности (организации и здания, прямые и по поддереву)"""
+    return json_response([row._asdict() for row in crud_activity.activity.get_stats(db)])
+
+
+@router.get("/{activity_id}/stats", response_model=ActivityStats,
+            dependencies=[Depends(request_cost(COST_TREE))])
+def get_activity_stats(
+        activity_id: int,
+        db: Session = Depends(get_db)
+):
+    """Статистика по виду деятельности и его поддереву"""
+    rows = crud_activity.activity.get_stats(db, activity_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    return json_response(rows[0]._asdict())
 
 
 @router.get("/{activity_id}", response_model=ActivityDetail)
@@ -54,8 +54,8 @@ def get_activity(
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
 
-    # Подсчет организаций для этой активности
-    organizations_count = len(activity.organizations) if activity.organizations else 0
+    # Подсчет организаций для этой активности без загрузки самих организаций
+    organizations_count = crud_activity.activity.count_organizations(db, activity_id)
 
     return ActivityDetail(
         id=activity.id,
@@ -72,7 +72,10 @@ def create_activity(
         db: Session = Depends(get_db)
 ):
     """Создать новый вид деятельности"""
-    activity = crud_activity.activity.create_with_validation(db, obj_in=activity_in)
+    try:
+        activity = crud_activity.activity.create_with_validation(db, obj_in=activity_in)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     return ActivityDetail(
         id=activity.id,
         name=activity.name,
@@ -82,6 +85,47 @@ def create_activity(
     )
 
 
+@router.post("/import", response_model=ActivityImportResult, dependencies=[Depends(request_cost(COST_BULK))])
+def import_activities(
+        import_in: ActivityImport,
+        db: Session = Depends(get_db)
+):
+    """Импортировать ветку видов деятельности: вложенное дерево или плоские строки id/parent_id"""
+    try:
+        if import_in.tree:
+            ids = crud_activity.activity.import_tree(db, nodes=import_in.tree, parent_id=import_in.parent_id)
+        else:
+            ids = crud_activity.activity.import_rows(db, rows=import_in.rows, parent_id=import_in.parent_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ActivityImportResult(created=len(ids), ids=ids)
+
+
+@router.post("/{activity_id}/move", response_model=ActivityDetail)
+def move_activity(
+        activity_id: int,
+        move_in: ActivityMove,
+        db: Session = Depends(get_db)
+):
+    """Перенести вид деятельности вместе с потомками под другого родителя"""
+    activity = crud_activity.activity.get(db, activity_id)
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+
+    try:
+        activity = crud_activity.activity.move(db, db_obj=activity, parent_id=move_in.parent_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    return ActivityDetail(
+        id=activity.id,
+        name=activity.name,
+        parent_id=activity.parent_id,
+        children=[ActivitySimple(id=child.id, name=child.name) for child in activity.children],
+        organizations_count=crud_activity.activity.count_organizations(db, activity.id)
+    )
+
+
 @router.put("/{activity_id}", response_model=ActivityDetail)
 def update_activity(
         activity_id: int,
@@ -93,16 +137,19 @@ def update_activity(
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
 
-    updated_activity = crud_activity.activity.update_with_validation(
-        db, db_obj=activity, obj_in=activity_in
-    )
+    try:
+        updated_activity = crud_activity.activity.update_with_validation(
+            db, db_obj=activity, obj_in=activity_in
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
     return ActivityDetail(
         id=updated_activity.id,
         name=updated_activity.name,
         parent_id=updated_activity.parent_id,
         children=[ActivitySimple(id=child.id, name=child.name) for child in updated_activity.children],
-        organizations_count=len(updated_activity.organizations) if updated_activity.organizations else 0
+        organizations_count=crud_activity.activity.count_organizations(db, updated_activity.id)
     )
 
 
@@ -112,23 +159,22 @@ def delete_activity(
         db: Session = Depends(get_db)
 ):
     """Удалить вид деятельности"""
-    activity = crud_activity.activity.get(db, activity_id)
-    if not activity:
-        raise HTTPException(status_code=404, detail="Activity not found")
+    blockers = crud_activity.activity.get_delete_blockers(db, activity_id)
 
     # Проверяем, что у активности нет потомков
-    if activity.children:
+    if blockers.has_children:
         raise HTTPException(
             status_code=400,
             detail="Cannot delete activity that has children. Delete children first."
         )
 
     # Проверяем, что активность не используется организациями
-    if activity.organizations:
+    if blockers.has_organizations:
         raise HTTPException(
             status_code=400,
             detail="Cannot delete activity that is used by organizations. Remove associations first."
         )
 
-    crud_activity.activity.remove(db, id=activity_id)
+    if crud_activity.activity.remove(db, id=activity_id) is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
     return None
\ No newline at end of file
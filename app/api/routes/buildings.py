@@ -3,10 +3,14 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.core.database import get_db
-from app.api.deps import verify_api_key
+from app.core.responses import json_response
+from app.api.deps import COST_AREA_SEARCH, COST_BULK, request_cost, verify_api_key
 from app.crud import building as crud_building
 from app.crud import organization as crud_organization
-from app.schemas.building import BuildingSimple, BuildingWithDistance, BuildingDetail
+from app.schemas.building import (
+    BuildingSimple, BuildingWithDistance, BuildingDetail, BuildingCreate, BuildingUpdate,
+    BuildingBatchUpdate, BuildingBatchResult
+)
 from app.schemas.organization import OrganizationSimple
 
 router = APIRouter(dependencies=[Depends(verify_api_key)])
@@ -19,10 +23,43 @@ def get_buildings(
         limit: int = Query(100, ge=1, le=1000)
 ):
     """Получить список всех зданий"""
-    return crud_building.building.get_multi(db, skip=skip, limit=limit)
+    rows = crud_building.building.get_multi_rows(db, skip=skip, limit=limit)
+    return json_response([row._asdict() for row in rows])
 
 
-@router.get("/nearby", response_model=List[BuildingWithDistance])
+@router.post("/", response_model=BuildingSimple, status_code=201)
+def create_building(
+        building_in: BuildingCreate,
+        db: Session = Depends(get_db)
+):
+    """Создать здание"""
+    return crud_building.building.create(db, obj_in=building_in)
+
+
+@router.patch("/batch", response_model=BuildingBatchResult, dependencies=[Depends(request_cost(COST_BULK))])
+def update_buildings_batch(
+        batch_in: BuildingBatchUpdate,
+        db: Session = Depends(get_db)
+):
+    """Пакетное исправление адресов и координат зданий с результатом по каждой строке"""
+    return crud_building.building.update_many(db, batch_in.items)
+
+
+@router.patch("/{building_id}", response_model=BuildingSimple)
+def update_building(
+        building_id: int,
+        building_in: BuildingUpdate,
+        db: Session = Depends(get_db)
+):
+    """Частично обновить здание"""
+    building = crud_building.building.get(db, building_id)
+    if not building:
+        raise HTTPException(status_code=404, detail="Building not found")
+    return crud_building.building.update(db, db_obj=building, obj_in=building_in)
+
+
+@router.get("/nearby", response_model=List[BuildingWithDistance],
+            dependencies=[Depends(request_cost(COST_AREA_SEARCH))])
 def get_nearby_buildings(
         db: Session = Depends(get_db),
         # Вариант для радиуса
@@ -34,39 +71,23 @@ def get_nearby_buildings(
         max_lat: Optional[float] = Query(None, description="Верхняя граница широты"),
         min_lon: Optional[float] = Query(None, description="Левая граница долготы"),
         max_lon: Optional[float] = Query(None, description="Правая граница долготы"),
+        include: Optional[str] = Query(None, pattern="^org_count$",
+                                       description="org_count - количество организаций в каждом здании"),
+        limit: int = Query(100, ge=1, le=1000, description="Не более limit зданий (для круга - ближайших)"),
 ):
-    """Получить здания в заданной области"""
-    buildings = []
-
+    """Получить здания в заданной области; при поиске по радиусу - ближайшие первыми"""
     if lat is not None and lon is not None and radius is not None:
         # Поиск по радиусу
         buildings_with_distance = crud_building.building.get_in_radius(
-            db, lat=lat, lon=lon, radius_m=radius
+            db, lat=lat, lon=lon, radius_m=radius, limit=limit
         )
-        buildings = [
-            BuildingWithDistance(
-                id=building.id,
-                address=building.address,
-                latitude=building.latitude,
-                longitude=building.longitude,
-                distance=distance
-            )
-            for building, distance in buildings_with_distance
-        ]
     elif all([min_lat, max_lat, min_lon, max_lon]):
         # Поиск по прямоугольнику
-        buildings_list = crud_building.building.get_in_rectangle(
-            db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon
-        )
-        buildings = [
-            BuildingWithDistance(
-                id=building.id,
-                address=building.address,
-                latitude=building.latitude,
-                longitude=building.longitude,
-                distance=None
+        buildings_with_distance = [
+            (building, None)
+            for building in crud_building.building.get_in_rectangle(
+                db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon, limit=limit
             )
-            for building in buildings_list
         ]
     else:
         raise HTTPException(
@@ -74,7 +95,22 @@ def get_nearby_buildings(
             detail="Either provide (lat, lon, radius) for circle search or (min_lat, max_lat, min_lon, max_lon) for rectangle search"
         )
 
-    return buildings
+    items = [
+        {
+            "id": building.id,
+            "address": building.address,
+            "latitude": building.latitude,
+            "longitude": building.longitude,
+            "distance": distance
+        }
+        for building, distance in buildings_with_distance
+    ]
+    if include == "org_count":
+        # Для маркеров на карте: одно агрегирующее чтение вместо списков организаций по зданиям
+        counts = crud_organization.organization.count_by_building(db, [item["id"] for item in items])
+        for item in items:
+            item["organizations_count"] = counts[item["id"]]
+    return json_response(items)
 
 
 @router.get("/{building_id}", response_model=BuildingDetail)
@@ -83,19 +119,16 @@ def get_building(
         db: Session = Depends(get_db)
 ):
     """Получить информацию о здании по ID"""
-    building = crud_building.building.get(db, building_id)
+    building = crud_building.building.get_many(db, [building_id]).get(building_id)
     if not building:
         raise HTTPException(status_code=404, detail="Building not found")
 
-    organizations = crud_organization.organization.get_by_building(db, building_id)
+    organization_ids = crud_organization.organization.get_ids(db, building_ids=[building_id], limit=None)
 
-    return BuildingDetail(
-        id=building.id,
-        address=building.address,
-        latitude=building.latitude,
-        longitude=building.longitude,
-        organizations=organizations
-    )
+    return json_response({
+        **building._asdict(),
+        "organizations": crud_organization.organization.get_payloads(db, organization_ids)
+    })
 
 
 @router.get("/{building_id}/organizations", response_model=List[OrganizationSimple])
@@ -105,8 +138,8 @@ def get_building_organizations(
 ):
     """Получить организации в конкретном здании"""
     # Проверяем существование здания
-    building = crud_building.building.get(db, building_id)
-    if not building:
+    if not crud_building.building.get_many(db, [building_id]):
         raise HTTPException(status_code=404, detail="Building not found")
 
-    return crud_organization.organization.get_by_building(db, building_id)
\ No newline at end of file
+    organization_ids = crud_organization.organization.get_ids(db, building_ids=[building_id], limit=None)
+    return json_response(crud_organization.organization.get_payloads(db, organization_ids))
\ No newline at end of file
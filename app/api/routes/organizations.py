@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from urllib.parse import unquote
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.api.deps import verify_api_key
+from app.core.phones import normalize_phone
+from app.core.responses import json_response
+from app.api.deps import COST_BULK, organization_search_cost, request_cost, verify_api_key
 from app.crud import organization as crud_organization
 from app.crud import activity as crud_activity
 from app.crud import building as crud_building
-from app.schemas.organization import OrganizationSimple, OrganizationDetail, OrganizationCreate, OrganizationUpdate
+from app.crud import organization_document as crud_document
+from app.schemas.organization import (
+    OrganizationWithDistance, OrganizationDetail, OrganizationCreate, OrganizationUpdate,
+    OrganizationBulkDelete, OrganizationBulkDeleteResult
+)
 
 router = APIRouter(dependencies=[Depends(verify_api_key)])
 
 
-@router.get("/", response_model=List[OrganizationSimple])
+@router.get("/", response_model=List[OrganizationWithDistance], dependencies=[Depends(organization_search_cost)])
 def get_organizations(
         db: Session = Depends(get_db),
         skip: int = Query(0, ge=0),
@@ -23,79 +32,92 @@ def get_organizations(
         in_area: Optional[str] = Query(None,
                                        description="Поиск по области: circle:lat,lon,radius или rect:min_lat,min_lon,max_lat,max_lon")
 ):
-    """Поиск и фильтрация организаций"""
+    """Поиск и фильтрация организаций; при поиске по кругу - ближайшие первыми, с расстоянием"""
 
-    organizations = []
+    activity_ids = None
+    building_ids = None
 
     if activity_id is not None:
-        descendant_ids = crud_activity.activity.get_all_descendants(db, activity_id)
-        if not descendant_ids:
-            return []
-
-        seen_orgs = set()
-        for act_id in descendant_ids:
-            orgs = crud_organization.organization.get_by_activity(db, act_id)
-            for org in orgs:
-                if org.id not in seen_orgs:
-                    seen_orgs.add(org.id)
-                    organizations.append(org)
+        activity_ids = crud_activity.activity.get_all_descendants(db, activity_id)
+        if not activity_ids:
+            return json_response([])
 
     elif name is not None:
-        organizations = crud_organization.organization.search_by_name(db, unquote(name))
+        name = unquote(name)
 
     elif in_area is not None:
         if in_area.startswith('circle:'):
             try:
                 _, params = in_area.split(':', 1)
                 lat, lon, radius = map(float, params.split(','))
-
-                buildings_with_distance = crud_building.building.get_in_radius(
-                    db, lat=lat, lon=lon, radius_m=radius
-                )
-                building_ids = [b.id for b, _ in buildings_with_distance]
-
-                seen_orgs = set()
-                for building_id in building_ids:
-                    orgs = crud_organization.organization.get_by_building(db, building_id)
-                    for org in orgs:
-                        if org.id not in seen_orgs:
-                            seen_orgs.add(org.id)
-                            organizations.append(org)
-
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid circle format. Use: circle:lat,lon,radius")
 
+            distances = crud_building.building.get_distances_in_radius(db, lat=lat, lon=lon, radius_m=radius)
+            page = crud_organization.organization.get_ids_by_distance(db, distances, skip=skip, limit=limit)
+            return organizations_response(db, [org_id for org_id, _ in page], distances=dict(page))
+
         elif in_area.startswith('rect:'):
             try:
                 _, params = in_area.split(':', 1)
                 min_lat, min_lon, max_lat, max_lon = map(float, params.split(','))
-
-                buildings = crud_building.building.get_in_rectangle(
-                    db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon
-                )
-                building_ids = [b.id for b in buildings]
-
-                seen_orgs = set()
-                for building_id in building_ids:
-                    orgs = crud_organization.organization.get_by_building(db, building_id)
-                    for org in orgs:
-                        if org.id not in seen_orgs:
-                            seen_orgs.add(org.id)
-                            organizations.append(org)
-
             except ValueError:
                 raise HTTPException(status_code=400,
                                     detail="Invalid rectangle format. Use: rect:min_lat,min_lon,max_lat,max_lon")
+
+            building_ids = crud_building.building.get_ids_in_rectangle(
+                db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon
+            )
+
         else:
             raise HTTPException(status_code=400, detail="Invalid area format. Use 'circle:' or 'rect:'")
 
-    else:
-        return crud_organization.organization.get_multi_with_details(db, skip=skip, limit=limit)
+        if not building_ids:
+            return json_response([])
 
-    if skip > 0 or limit < len(organizations):
-        organizations = organizations[skip:skip + limit]
+    # Фильтры, skip и limit применяются в SQL к одной колонке id
+    organization_ids = crud_organization.organization.get_ids(
+        db, skip=skip, limit=limit, activity_ids=activity_ids, name=name, building_ids=building_ids
+    )
+    return organizations_response(db, organization_ids)
+
+
+def organizations_response(
+        db: Session, organization_ids: List[int], distances: Optional[Dict[int, float]] = None
+) -> Response:
+    """Список организаций из модели чтения или из плоских строк; distances добавляет поле distance"""
+    if settings.ORGANIZATION_READ_MODEL_ENABLED:
+        bodies = crud_document.organization_document.get_bodies(db, organization_ids)
+        if distances is not None:
+            # Документ - JSON-объект: поле дописывается перед закрывающей скобкой без разбора документа
+            bodies = {
+                org_id: body[:-1] + ',"distance":' + json.dumps(distances[org_id]) + "}"
+                for org_id, body in bodies.items()
+            }
+        content = ",".join(bodies[org_id] for org_id in organization_ids if org_id in bodies)
+        return Response(content="[" + content + "]", media_type="application/json")
+
+    payloads = crud_organization.organization.get_payloads(db, organization_ids)
+    if distances is not None:
+        for payload in payloads:
+            payload["distance"] = distances[payload["id"]]
+    return json_response(payloads)
+
+
+@router.get("/by-phone", response_model=OrganizationDetail)
+def get_organization_by_phone(
+        number: str = Query(..., min_length=1, description="Номер телефона в любом формате"),
+        db: Session = Depends(get_db)
+):
+    """Найти организацию по номеру телефона (номер приводится к E.164)"""
+    normalized = normalize_phone(number)
+    if normalized is None:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
 
-    return organizations
+    organization_id = crud_organization.organization.get_id_by_phone(db, normalized)
+    if organization_id is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return get_organization(organization_id, db)
 
 
 @router.get("/{organization_id}", response_model=OrganizationDetail)
@@ -104,6 +126,12 @@ def get_organization(
         db: Session = Depends(get_db)
 ):
     """Получить информацию об организации по ID"""
+    if settings.ORGANIZATION_READ_MODEL_ENABLED:
+        body = crud_document.organization_document.get_body(db, organization_id)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Organization not found")
+        return Response(content=body, media_type="application/json")
+
     organization = crud_organization.organization.get_with_details(db, organization_id)
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
@@ -121,9 +149,12 @@ def create_organization(
     if not building:
         raise HTTPException(status_code=400, detail="Building not found")
 
-    organization = crud_organization.organization.create_with_phones_and_activities(
-        db, obj_in=organization_in
-    )
+    try:
+        organization = crud_organization.organization.create_with_phones_and_activities(
+            db, obj_in=organization_in
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     return crud_organization.organization.get_with_details(db, organization.id)
 
 
@@ -134,18 +165,20 @@ def update_organization(
         db: Session = Depends(get_db)
 ):
     """Обновить организацию"""
-    organization = crud_organization.organization.get(db, organization_id)
-    if not organization:
-        raise HTTPException(status_code=404, detail="Organization not found")
-
     # Если меняется building_id, проверяем существование здания
     if organization_in.building_id is not None:
-        building = crud_building.building.get(db, organization_in.building_id)
-        if not building:
+        if not crud_building.building.get_many(db, [organization_in.building_id]):
             raise HTTPException(status_code=400, detail="Building not found")
 
-    updated_org = crud_organization.organization.update(db, db_obj=organization, obj_in=organization_in)
-    return crud_organization.organization.get_with_details(db, updated_org.id)
+    try:
+        payload = crud_organization.organization.update_with_relations(
+            db, id=organization_id, obj_in=organization_in
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return json_response(payload)
 
 
 @router.delete("/{organization_id}", status_code=204)
@@ -154,9 +187,21 @@ def delete_organization(
         db: Session = Depends(get_db)
 ):
     """Удалить организацию"""
-    organization = crud_organization.organization.get(db, organization_id)
-    if not organization:
+    if crud_organization.organization.remove(db, id=organization_id) is None:
         raise HTTPException(status_code=404, detail="Organization not found")
+    return None
 
-    crud_organization.organization.remove(db, id=organization_id)
-    return None
\ No newline at end of file
+
+@router.post("/bulk-delete", response_model=OrganizationBulkDeleteResult,
+             dependencies=[Depends(request_cost(COST_BULK))])
+def bulk_delete_organizations(
+        request: OrganizationBulkDelete,
+        db: Session = Depends(get_db)
+):
+    """Удалить организации пачкой (вместе с телефонами и связями с видами деятельности)"""
+    deleted = crud_organization.organization.remove_many(db, request.ids)
+    deleted_set = set(deleted)
+    return OrganizationBulkDeleteResult(
+        deleted=deleted,
+        not_found=[org_id for org_id in dict.fromkeys(request.ids) if org_id not in deleted_set]
+    )
\ No newline at end of file
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, List
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import pool_monitor
+from app.core.metrics import metrics
+from app.core.response_cache import CachedResponse, response_cache
+from app.core.single_flight import request_key
+
+metrics.register("admission_in_flight", "gauge", "Запросы, допущенные к выполнению")
+metrics.register("admission_queued", "gauge", "Запросы, ожидающие допуска")
+metrics.register("admission_queue_wait_seconds_total", "counter", "Суммарное ожидание в очереди допуска")
+metrics.register("admission_rejected_total", "counter", "Запросы, отклоненные с 503, по причине")
+metrics.register("degraded_responses_total", "counter", "Ответы из кэша в деградированном режиме")
+
+
+class AdmissionController:
+    """
+    Ограниченное число одновременно выполняемых запросов и ограниченная очередь к ним.
+    Освободившийся слот передается первому ожидающему. Построен на потоковых примитивах,
+    поэтому не привязан к конкретному event loop.
+    """
+
+    def __init__(self, max_concurrency: int, queue_size: int):
+        self._lock = threading.Lock()
+        self._waiters: Deque[Future] = deque()
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.active = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        """Занять слот; False - очередь заполнена или слот не освободился за timeout секунд"""
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                self._update_gauges()
+                return True
+            if len(self._waiters) >= self.queue_size:
+                metrics.inc("admission_rejected_total", reason="queue_full")
+                return False
+            waiter = Future()
+            self._waiters.append(waiter)
+            self._update_gauges()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(waiter)), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.done():
+                    self._waiters.remove(waiter)
+                    self._update_gauges()
+                    metrics.inc("admission_rejected_total", reason="timeout")
+                    return False
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.done()
+                if not granted:
+                    self._waiters.remove(waiter)
+                    self._update_gauges()
+            if granted:
+                self.release()
+            raise
+        finally:
+            metrics.inc("admission_queue_wait_seconds_total", time.monotonic() - started)
+        return True
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Слот не освобождается, а переходит к следующему в очереди
+                self._waiters.popleft().set_result(True)
+            else:
+                self.active -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set("admission_in_flight", self.active)
+        metrics.set("admission_queued", len(self._waiters))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+admission = AdmissionController(settings.ADMISSION_MAX_CONCURRENCY, settings.ADMISSION_QUEUE_SIZE)
+
+
+class AdmissionMiddleware:
+    """
+    Admission control для запросов к API.
+    Запрос ждет слот не дольше ADMISSION_QUEUE_TIMEOUT; при переполненной очереди или
+    истекшем сроке отвечает 503 с Retry-After, не доходя до пула соединений.
+    Успешные GET-ответы запоминаются: в деградированном режиме (пул насыщен или запрос
+    не допущен) они отдаются из кэша, в том числе устаревшие.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = ""):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        cacheable = scope["method"] == "GET"
+        key = request_key(scope) if cacheable else None
+
+        # Пока пул насыщен, чтения с готовым ответом не ставятся в очередь
+        if cacheable and pool_monitor.congested:
+            cached = response_cache.get(key, settings.DEGRADED_CACHE_MAX_STALE)
+            if cached is not None:
+                await self._send_cached(cached, send)
+                return
+
+        if not await admission.acquire(settings.ADMISSION_QUEUE_TIMEOUT):
+            cached = response_cache.get(key, settings.DEGRADED_CACHE_MAX_STALE) if cacheable else None
+            if cached is not None:
+                await self._send_cached(cached, send)
+            else:
+                await self._send_overloaded(send)
+            return
+
+        try:
+            if cacheable:
+                await self._call_and_cache(key, scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+    async def _call_and_cache(self, key, scope: Scope, receive: Receive, send: Send):
+        messages: List[Message] = []
+
+        async def capture(message: Message):
+            messages.append(message)
+            await send(message)
+
+        await self.app(scope, receive, capture)
+        if messages and messages[0]["type"] == "http.response.start" and messages[0]["status"] == 200:
+            response_cache.put(key, messages)
+
+    async def _send_cached(self, cached: CachedResponse, send: Send):
+        state = "fresh" if response_cache.is_fresh(cached) else "stale"
+        metrics.inc("degraded_responses_total", cache=state)
+        start, *rest = cached.messages
+        await send({**start, "headers": [*start["headers"], (b"x-cache", state.encode())]})
+        for message in rest:
+            await send(message)
+
+    async def _send_overloaded(self, send: Send):
+        body = json.dumps({"detail": "Service overloaded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(settings.ADMISSION_QUEUE_TIMEOUT))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
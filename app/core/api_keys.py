@@ -0,0 +1,76 @@
+import hashlib
+import json
+import logging
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ApiKey:
+    """Клиент API и его лимиты"""
+    name: str
+    rate: float  # токенов в секунду
+    burst: int  # емкость корзины
+    concurrency: int  # одновременных запросов на воркер
+
+
+def hash_key(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+class ApiKeyStore:
+    """
+    Ключи API в памяти процесса, проиндексированные по SHA-256.
+    Источник - JSON-файл API_KEYS_FILE со списком
+    {"name", "sha256", "rate", "burst", "concurrency"}; лимиты необязательны.
+    Ключ settings.API_KEY принимается всегда под именем "default".
+    Аутентификация не обращается ни к файлу, ни к БД после первой загрузки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: Optional[Dict[str, ApiKey]] = None
+
+    def _default_key(self, name: str, entry: Optional[dict] = None) -> ApiKey:
+        entry = entry or {}
+        return ApiKey(
+            name=name,
+            rate=float(entry.get("rate", settings.RATE_LIMIT_RATE)),
+            burst=int(entry.get("burst", settings.RATE_LIMIT_BURST)),
+            concurrency=int(entry.get("concurrency", settings.RATE_LIMIT_CONCURRENCY)),
+        )
+
+    def load(self) -> Dict[str, ApiKey]:
+        keys = {hash_key(settings.API_KEY): self._default_key("default")}
+        if settings.API_KEYS_FILE:
+            with open(settings.API_KEYS_FILE, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    keys[entry["sha256"].lower()] = self._default_key(entry["name"], entry)
+        with self._lock:
+            self._keys = keys
+        logger.info("Loaded %d API keys", len(keys))
+        return keys
+
+    def clear(self):
+        with self._lock:
+            self._keys = None
+
+    def get(self, raw_key: str) -> Optional[ApiKey]:
+        keys = self._keys
+        if keys is None:
+            keys = self.load()
+        return keys.get(hash_key(raw_key))
+
+
+api_key_store = ApiKeyStore()
+
+
+if __name__ == "__main__":
+    # python -m app.core.api_keys <key> - хеш ключа для API_KEYS_FILE
+    print(hash_key(sys.argv[1]))
@@ -0,0 +1,209 @@
+import asyncio
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli опционален
+    brotli = None
+
+metrics.register("compression_responses_total", "counter",
+                 "Сжатые ответы по кодировке и результату обращения к кэшу сжатых тел")
+metrics.register("compression_bytes_total", "counter", "Байты тел ответов до (in) и после (out) сжатия")
+metrics.register("compression_seconds_total", "counter", "Процессорное время сжатия тел ответов")
+
+# Тела крупнее сжимаются в потоке, чтобы не блокировать event loop (zlib и brotli отпускают GIL)
+THREAD_MIN_SIZE = 64 * 1024
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript")
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0: одинаковые тела дают одинаковые байты
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+def codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    """Доступные кодировки в порядке предпочтения сервера"""
+    available = {"br": _brotli} if brotli is not None else {}
+    available["gzip"] = _gzip
+    return available
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Кодировка по заголовку Accept-Encoding: наибольший q, при равенстве - предпочтение сервера"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in codecs():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedBodies:
+    """
+    Уже сжатые тела ответов: LRU по хешу несжатого тела и кодировке с ограничением
+    по суммарному размеру. Ключ зависит только от содержимого, поэтому записи не устаревают,
+    а повторный ответ с теми же байтами (дерево деятельностей, популярные карточки) не сжимается заново.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    @staticmethod
+    def key(encoding: str, body: bytes) -> Hashable:
+        return encoding, len(body), hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+            return compressed
+
+    def put(self, key: Hashable, compressed: bytes):
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = compressed
+            self.size += len(compressed)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+compressed_bodies = CompressedBodies(settings.COMPRESSION_CACHE_MAX_BYTES)
+
+
+def _timed(codec: Callable[[bytes], bytes], body: bytes) -> Tuple[bytes, float]:
+    # Время CPU именно этого потока: соседние запросы в него не попадают
+    started = time.thread_time()
+    compressed = codec(body)
+    return compressed, time.thread_time() - started
+
+
+async def compress(encoding: str, body: bytes) -> bytes:
+    """Сжатое тело из кэша или сжатое заново"""
+    key = CompressedBodies.key(encoding, body)
+    compressed = compressed_bodies.get(key)
+    if compressed is not None:
+        metrics.inc("compression_responses_total", encoding=encoding, cache="hit")
+        return compressed
+
+    codec = codecs()[encoding]
+    if len(body) >= THREAD_MIN_SIZE:
+        compressed, seconds = await asyncio.to_thread(_timed, codec, body)
+    else:
+        compressed, seconds = _timed(codec, body)
+    metrics.inc("compression_seconds_total", seconds)
+    metrics.inc("compression_responses_total", encoding=encoding, cache="miss")
+    compressed_bodies.put(key, compressed)
+    return compressed
+
+
+def _compressible(headers: List) -> bool:
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.startswith(COMPRESSIBLE_TYPES) or b"+json" in content_type
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip или br (если установлен brotli) по Accept-Encoding.
+    Тела меньше COMPRESSION_MIN_SIZE и несжимаемые типы отдаются как есть.
+    Стоит внутри admission control и single-flight: кэш ответов деградированного режима
+    и объединенные запросы получают уже сжатые байты (ключ запроса включает Accept-Encoding).
+    """
+
+    def __init__(self, app: ASGIApp, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = negotiate(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def capture(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+                if not _compressible(message["headers"]):
+                    passthrough = True
+                    await send(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await self._send_body(start, b"".join(chunks), encoding, send)
+            else:
+                await send(message)
+
+        await self.app(scope, receive, capture)
+
+    async def _send_body(self, start: Message, body: bytes, encoding: str, send: Send):
+        headers = [(name, value) for name, value in start["headers"] if name != b"content-length"]
+        if len(body) >= self.min_size:
+            compressed = await compress(encoding, body)
+            metrics.inc("compression_bytes_total", len(body), stage="in")
+            metrics.inc("compression_bytes_total", len(compressed), stage="out")
+            body = compressed
+            headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
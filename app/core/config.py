@@ -15,6 +15,20 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "catalog_password")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "organization_catalog")
 
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+    # Общий лимит соединений всех воркеров с БД (0 - без лимита: у каждого воркера свой полный пул)
+    DB_CONNECTION_BUDGET: int = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+
+    # Воркеры gunicorn: число процессов (0 - по числу CPU), перезапуск после max_requests
+    # запросов со случайным разбросом и время на завершение текущих запросов (сек)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    WORKER_GRACEFUL_TIMEOUT: int = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30"))
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -22,6 +36,69 @@ class Settings(BaseSettings):
     # Security
     API_KEY: str = os.getenv("API_KEY", "test-api-key-123")
     API_KEY_NAME: str = os.getenv("API_KEY_NAME", "API_KEY")
+    # JSON-файл с дополнительными ключами (хранятся SHA-256) и их лимитами
+    API_KEYS_FILE: str = os.getenv("API_KEYS_FILE", "")
+
+    # Rate limiting: лимиты по умолчанию на ключ; backend - memory | redis
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_RATE: float = float(os.getenv("RATE_LIMIT_RATE", "50"))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "100"))
+    RATE_LIMIT_CONCURRENCY: int = int(os.getenv("RATE_LIMIT_CONCURRENCY", "10"))
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+    # Change notifications: auto - NOTIFY на PostgreSQL, local - только внутри процесса
+    CHANGE_BUS: str = os.getenv("CHANGE_BUS", "auto")
+    CHANGE_CHANNEL: str = os.getenv("CHANGE_CHANNEL", "catalog_changes")
+
+    # Сериализация ответов: orjson | json
+    JSON_RESPONSE: str = os.getenv("JSON_RESPONSE", "orjson")
+
+    # Отдавать организации из денормализованной модели чтения (organization_documents)
+    ORGANIZATION_READ_MODEL_ENABLED: bool = os.getenv("ORGANIZATION_READ_MODEL_ENABLED", "false").lower() == "true"
+
+    # Объединение одинаковых одновременных GET-запросов к API
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+    # Admission control: одновременно выполняемые запросы, очередь и срок ожидания в ней (сек)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "15"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+    # Среднее ожидание соединения (сек), начиная с которого чтения отдаются из кэша
+    ADMISSION_MAX_POOL_WAIT: float = float(os.getenv("ADMISSION_MAX_POOL_WAIT", "0.5"))
+    # Кэш ответов для деградированного режима: объем и допустимый возраст устаревших записей (сек)
+    DEGRADED_CACHE_MAX_BYTES: int = int(os.getenv("DEGRADED_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    DEGRADED_CACHE_MAX_STALE: float = float(os.getenv("DEGRADED_CACHE_MAX_STALE", "300"))
+
+    # Срок выполнения запросов к БД (сек) по умолчанию и для отдельных маршрутов: "route_name=seconds,..."
+    QUERY_TIMEOUT: float = float(os.getenv("QUERY_TIMEOUT", "5"))
+    QUERY_TIMEOUTS: str = os.getenv(
+        "QUERY_TIMEOUTS",
+        "get_organizations=3,get_nearby_buildings=3,update_buildings_batch=60,bulk_delete_organizations=60,"
+        "import_activities=60"
+    )
+
+    # Сжатие ответов: gzip или br (если установлен пакет brotli) для тел от COMPRESSION_MIN_SIZE байт;
+    # уже сжатые тела кэшируются по содержимому в пределах COMPRESSION_CACHE_MAX_BYTES
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_CACHE_MAX_BYTES: int = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # Прогрев воркера при старте: число популярных организаций, чьи запросы выполняются заранее
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_ORGANIZATIONS: int = int(os.getenv("WARMUP_ORGANIZATIONS", "100"))
+
+    # Geo
+    GEO_INDEX_ENABLED: bool = os.getenv("GEO_INDEX_ENABLED", "true").lower() == "true"
+    # Геопоиск в БД без индекса в памяти: auto - PostGIS, если у buildings есть колонка geog, иначе sql
+    GEO_BACKEND: str = os.getenv("GEO_BACKEND", "auto")
+
+    # Нормализация телефонов в E.164: код страны и код города для местных семизначных номеров
+    PHONE_COUNTRY_CODE: str = os.getenv("PHONE_COUNTRY_CODE", "7")
+    PHONE_DEFAULT_AREA_CODE: str = os.getenv("PHONE_DEFAULT_AREA_CODE", "495")
 
     class Config:
         case_sensitive = True
@@ -1,13 +1,81 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.deadlines import bind_deadline, release_deadline
+from app.core.metrics import metrics
+from app.core.workers import pool_limits
 
-engine = create_engine(settings.DATABASE_URL)
+# Размер пула воркера выводится из общего бюджета соединений (DB_CONNECTION_BUDGET)
+pool_size, max_overflow = pool_limits()
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    # Ожидание соединения ограничено: при насыщении пула запрос получает 503, а не висит в очереди
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    # Кэш скомпилированных запросов на движок: по одной записи на форму запроса и диалект
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
+metrics.register("db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения из пула")
+metrics.register("db_pool_checkouts_total", "counter", "Количество выдач соединения из пула запросам")
+metrics.register("db_pool_wait_seconds_avg", "gauge", "Экспоненциальное среднее ожидания соединения из пула")
+metrics.register("db_pool_checked_out", "gauge", "Соединения пула, выданные в данный момент")
+metrics.register("sqlalchemy_compiled_cache_total", "counter",
+                 "Выполненные запросы по результату обращения к кэшу компиляции SQLAlchemy")
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is not None:
+        metrics.inc("sqlalchemy_compiled_cache_total", result=cache_hit.name.lower())
+
+
+class PoolMonitor:
+    """Время ожидания соединения из пула: по нему admission control определяет насыщение БД"""
+
+    def __init__(self, alpha: float = 0.2):
+        self._lock = threading.Lock()
+        self.alpha = alpha
+        self.average = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.average += self.alpha * (seconds - self.average)
+            average = self.average
+        metrics.inc("db_pool_wait_seconds_total", seconds)
+        metrics.inc("db_pool_checkouts_total")
+        metrics.set("db_pool_wait_seconds_avg", average)
+        metrics.set("db_pool_checked_out", engine.pool.checkedout())
+
+    @property
+    def congested(self) -> bool:
+        return self.average > settings.ADMISSION_MAX_POOL_WAIT
+
+    def reset(self):
+        with self._lock:
+            self.average = 0.0
+
+
+pool_monitor = PoolMonitor()
+
+
+def get_db(request: Request):
     db = SessionLocal()
+    bind_deadline(db, request)
     try:
+        # Соединение берется сразу, чтобы измерить ожидание пула для каждого запроса
+        started = time.perf_counter()
+        db.connection()
+        pool_monitor.record_wait(time.perf_counter() - started)
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        release_deadline(db)
+        db.close()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.register("query_deadline_exceeded_total", "counter", "Запросы, прерванные по сроку выполнения (504)")
+metrics.register("query_cancelled_total", "counter", "Запросы к БД, отмененные после отключения клиента")
+
+_SESSION_KEY = "query_deadline"
+_STATE_KEY = "query_deadline"
+
+# Код ошибки PostgreSQL query_canceled: statement_timeout или pg_cancel
+_PG_QUERY_CANCELED = "57014"
+
+# Как часто SQLite вызывает обработчик прогресса (в инструкциях виртуальной машины)
+_SQLITE_PROGRESS_STEPS = 1000
+
+
+def parse_route_timeouts(raw: str) -> Dict[str, float]:
+    """Разобрать QUERY_TIMEOUTS вида "route_name=seconds,route_name=seconds" """
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, seconds = item.partition("=")
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+_route_timeouts = parse_route_timeouts(settings.QUERY_TIMEOUTS)
+
+
+def route_timeout(route_name: Optional[str]) -> float:
+    return _route_timeouts.get(route_name, settings.QUERY_TIMEOUT)
+
+
+class QueryDeadline:
+    """
+    Срок выполнения запросов к БД в рамках одного HTTP-запроса.
+    Применяется к каждой транзакции сессии: на PostgreSQL - SET LOCAL statement_timeout
+    на оставшееся время, на SQLite - обработчик прогресса, прерывающий запрос.
+    Отмена (отключение клиента) прерывает текущий запрос к БД.
+    С завершением транзакции срок снимается с ее соединения: после коммита посреди запроса
+    соединение возвращается в пул и может достаться другому запросу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.deadline: Optional[float] = None
+        self.cancelled = False
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._sqlite_connections = []
+
+    def start(self, timeout: float):
+        self.deadline = time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        if self.cancelled:
+            return True
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def apply(self, connection):
+        """Применить срок к соединению новой транзакции"""
+        remaining = self.remaining()
+        if remaining is None:
+            return
+        dbapi_connection = connection.connection.dbapi_connection
+        dialect = connection.dialect.name
+        with self._lock:
+            if dialect == "postgresql":
+                # Истекший срок превращается в минимальный таймаут: запрос упадет с той же ошибкой
+                timeout_ms = max(1, int(remaining * 1000))
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+                self._cancel_callbacks.append(dbapi_connection.cancel)
+            elif dialect == "sqlite":
+                dbapi_connection.set_progress_handler(lambda: int(self.expired()), _SQLITE_PROGRESS_STEPS)
+                self._sqlite_connections.append(dbapi_connection)
+
+    def cancel(self):
+        """Прервать выполняющийся запрос (вызывается из другого потока)"""
+        # Под блокировкой: release не вернет соединение в пул, пока отмена не отправлена
+        with self._lock:
+            if self.deadline is None:
+                return
+            self.cancelled = True
+            metrics.inc("query_cancelled_total")
+            for callback in self._cancel_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Failed to cancel query")
+
+    def _detach(self):
+        self._cancel_callbacks.clear()
+        for dbapi_connection in self._sqlite_connections:
+            dbapi_connection.set_progress_handler(None, 0)
+        self._sqlite_connections.clear()
+
+    def detach(self):
+        """Снять срок с соединений завершенной транзакции; следующая транзакция применит его заново"""
+        with self._lock:
+            self._detach()
+
+    def release(self):
+        """Снять срок до возврата соединения в пул"""
+        with self._lock:
+            self.deadline = None
+            self._detach()
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session: Session, transaction, connection):
+    deadline = session.info.get(_SESSION_KEY)
+    if deadline is not None:
+        deadline.apply(connection)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _detach_deadline(session: Session):
+    # Вызывается до возврата соединения в пул; точки сохранения транзакцию не завершают
+    deadline = session.info.get(_SESSION_KEY)
+    if deadline is not None and session.get_nested_transaction() is None:
+        deadline.detach()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _detach_closed_deadline(session: Session, transaction):
+    # Транзакция, закрытая без коммита и отката (Session.close)
+    deadline = session.info.get(_SESSION_KEY)
+    if deadline is not None and transaction.parent is None:
+        deadline.detach()
+
+
+def bind_deadline(db: Session, request: Request) -> QueryDeadline:
+    """Привязать к сессии срок маршрута запроса; до первой транзакции сессии"""
+    deadline = request.scope.get("state", {}).get(_STATE_KEY) or QueryDeadline()
+    route = request.scope.get("route")
+    deadline.start(route_timeout(getattr(route, "name", None)))
+    db.info[_SESSION_KEY] = deadline
+    return deadline
+
+
+def release_deadline(db: Session):
+    deadline = db.info.pop(_SESSION_KEY, None)
+    if deadline is not None:
+        deadline.release()
+
+
+def is_deadline_error(exc: OperationalError) -> bool:
+    orig = exc.orig
+    if getattr(orig, "pgcode", None) == _PG_QUERY_CANCELED:
+        return True
+    return str(orig) == "interrupted"
+
+
+class QueryCancellationMiddleware:
+    """
+    Отменяет запросы к БД, если клиент отключился до ответа.
+    Receive с начала запроса читает фоновая задача: сообщения с телом передаются
+    приложению через очередь, а http.disconnect отменяет выполняющийся запрос.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = QueryDeadline()
+        scope.setdefault("state", {})[_STATE_KEY] = deadline
+        messages: "asyncio.Queue[Message]" = asyncio.Queue()
+        disconnected = asyncio.Event()
+        response_sent = False
+
+        async def watch():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    break
+                await messages.put(message)
+            disconnected.set()
+            # Отключение после отправленного ответа - штатное завершение запроса
+            if not response_sent:
+                await run_in_threadpool(deadline.cancel)
+
+        async def receive_request() -> Message:
+            get_message = asyncio.ensure_future(messages.get())
+            wait_disconnect = asyncio.ensure_future(disconnected.wait())
+            done, pending = await asyncio.wait(
+                {get_message, wait_disconnect}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            if get_message in done:
+                return get_message.result()
+            return {"type": "http.disconnect"}
+
+        async def send_response(message: Message):
+            nonlocal response_sent
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+            await send(message)
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await self.app(scope, receive_request, send_response)
+        finally:
+            watcher.cancel()
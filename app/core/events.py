@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Уникальный идентификатор процесса: свои уведомления listener пропускает,
+# они уже применены локально после коммита
+WORKER_ID = uuid.uuid4().hex
+
+# Ограничение PostgreSQL на размер payload у NOTIFY - 8000 байт
+_MAX_PAYLOAD = 7000
+
+_PENDING_KEY = "pending_change_events"
+
+ALL = "*"
+
+
+@dataclass
+class ChangeEvent:
+    """Событие изменения сущности"""
+    entity: str
+    action: str  # upsert | bulk_upsert | delete | reset
+    id: Optional[int] = None
+    data: Optional[dict] = None
+    origin: str = field(default=WORKER_ID)
+
+    def to_dict(self) -> dict:
+        return {"e": self.entity, "a": self.action, "i": self.id, "d": self.data}
+
+    @classmethod
+    def from_dict(cls, raw: dict, origin: str) -> "ChangeEvent":
+        return cls(entity=raw["e"], action=raw["a"], id=raw.get("i"), data=raw.get("d"), origin=origin)
+
+
+Handler = Callable[[ChangeEvent], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+
+def subscribe(entity: str, handler: Handler):
+    """Подписать обработчик на изменения сущности ("*" - на все сущности)"""
+    _handlers[entity].append(handler)
+
+
+def dispatch(change: ChangeEvent):
+    """Применить событие к локальным кэшам процесса"""
+    if change.entity == ALL:
+        handlers = [handler for entity_handlers in _handlers.values() for handler in entity_handlers]
+    else:
+        handlers = _handlers.get(change.entity, []) + _handlers.get(ALL, [])
+    for handler in handlers:
+        try:
+            handler(change)
+        except Exception:
+            logger.exception("Change handler failed for %s", change)
+
+
+def publish(db: Session, entity: str, action: str, id: Optional[int] = None, data: Optional[dict] = None):
+    """
+    Зарегистрировать изменение в текущей транзакции.
+    Событие рассылается только после успешного коммита и отбрасывается при откате.
+    """
+    db.info.setdefault(_PENDING_KEY, []).append(ChangeEvent(entity, action, id, data))
+
+
+def _uses_notify(db: Session) -> bool:
+    if settings.CHANGE_BUS == "local":
+        return False
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _serialize(change: ChangeEvent) -> List[str]:
+    """JSON события; пакетное событие (data["rows"]) крупнее лимита payload делится на части"""
+    item = json.dumps(change.to_dict(), separators=(",", ":"))
+    rows = (change.data or {}).get("rows")
+    if len(item) <= _MAX_PAYLOAD or not rows or len(rows) < 2:
+        return [item]
+    middle = len(rows) // 2
+    return [
+        part
+        for half in (rows[:middle], rows[middle:])
+        for part in _serialize(ChangeEvent(change.entity, change.action, change.id, {**change.data, "rows": half}))
+    ]
+
+
+def _chunk_payloads(changes: List[ChangeEvent]) -> List[str]:
+    payloads, chunk, size = [], [], 0
+    for item in (item for change in changes for item in _serialize(change)):
+        if chunk and size + len(item) > _MAX_PAYLOAD:
+            payloads.append(chunk)
+            chunk, size = [], 0
+        chunk.append(item)
+        size += len(item) + 1
+    if chunk:
+        payloads.append(chunk)
+    return ['{"o":"%s","c":[%s]}' % (WORKER_ID, ",".join(items)) for items in payloads]
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session):
+    changes = session.info.get(_PENDING_KEY)
+    if not changes or not _uses_notify(session):
+        return
+    # NOTIFY транзакционный: другие воркеры получат событие только вместе с коммитом
+    for payload in _chunk_payloads(changes):
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": settings.CHANGE_CHANNEL, "payload": payload}
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    for change in changes or []:
+        dispatch(change)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def dispatch_payload(payload: str):
+    """Применить уведомление, пришедшее от другого воркера"""
+    try:
+        raw = json.loads(payload)
+    except ValueError:
+        logger.warning("Malformed change notification: %r", payload)
+        return
+    if raw.get("o") == WORKER_ID:
+        return
+    for item in raw.get("c", []):
+        dispatch(ChangeEvent.from_dict(item, origin=raw.get("o")))
+
+
+class ChangeListener:
+    """
+    Фоновая задача, слушающая LISTEN-канал PostgreSQL.
+    Уведомления из event loop только ставятся в очередь, а применяются к кэшам в потоке,
+    чтобы обновление индексов не задерживало запросы воркера.
+    При потере соединения сбрасывает все локальные кэши (события могли быть пропущены)
+    и переподключается.
+    """
+
+    def __init__(self, engine: Engine, channel: str, reconnect_delay: float = 1.0):
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.listening = asyncio.Event()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Кэши могли загрузиться без подписки: после подключения их нужно сбросить
+        self._reset_on_listen = False
+
+    def _connect(self):
+        conn = self.engine.raw_connection()
+        # Соединение живет все время работы воркера, в пул его не возвращаем
+        conn.detach()
+        dbapi_conn = conn.driver_connection
+        dbapi_conn.autocommit = True
+        with dbapi_conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return dbapi_conn
+
+    async def _listen_once(self):
+        loop = asyncio.get_running_loop()
+        dbapi_conn = await asyncio.to_thread(self._connect)
+        if self._reset_on_listen:
+            self._reset_on_listen = False
+            self._queue.put_nowait(ChangeEvent(ALL, "reset"))
+        self.listening.set()
+        lost = loop.create_future()
+
+        def on_readable():
+            try:
+                dbapi_conn.poll()
+            except Exception as exc:
+                if not lost.done():
+                    lost.set_exception(exc)
+                return
+            while dbapi_conn.notifies:
+                self._queue.put_nowait(dbapi_conn.notifies.pop(0).payload)
+
+        loop.add_reader(dbapi_conn.fileno(), on_readable)
+        try:
+            await lost
+        finally:
+            loop.remove_reader(dbapi_conn.fileno())
+            dbapi_conn.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change listener connection lost")
+            self._queue.put_nowait(ChangeEvent(ALL, "reset"))
+            # Кэши, загруженные до нового LISTEN, тоже могли пропустить изменения
+            self._reset_on_listen = True
+            await asyncio.sleep(self.reconnect_delay)
+
+    @staticmethod
+    def _apply(items: List[Union[str, ChangeEvent]]):
+        for item in items:
+            if isinstance(item, str):
+                dispatch_payload(item)
+            else:
+                dispatch(item)
+
+    async def _consume(self):
+        """Применять уведомления по порядку; накопившиеся за время применения - одним заходом в поток"""
+        while True:
+            items = [await self._queue.get()]
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            await asyncio.to_thread(self._apply, items)
+
+    def start(self):
+        if not self._tasks:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._consume()), asyncio.create_task(self._run())]
+
+    async def wait_listening(self, timeout: float) -> bool:
+        """Дождаться LISTEN; False - не дождались, кэши будут сброшены после подключения"""
+        try:
+            await asyncio.wait_for(self.listening.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._reset_on_listen = True
+            return False
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
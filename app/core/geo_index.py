@@ -0,0 +1,305 @@
+import heapq
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from math import radians, degrees, cos, sin, sqrt, atan2
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.models.building import Building
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000
+
+_COORD_BITS = 32
+_COORD_SCALE = (1 << _COORD_BITS) - 1
+
+# До стольких изменений позиции ищутся через array.index и массивы сдвигаются на месте,
+# больше - одним проходом по массиву id и пересборкой массивов
+_INDEX_LOOKUP_MAX = 8
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние между двумя точками в метрах (формула гаверсинуса)"""
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    return EARTH_RADIUS_M * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def radius_bounds(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """
+    Ограничивающий прямоугольник круга: (min_lat, max_lat, min_lon, max_lon).
+    Долготы могут выходить за [-180, 180] - см. split_longitudes
+    """
+    dlat = degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = cos(radians(lat))
+    if cos_lat < 1e-9 or abs(lat) + dlat >= 90:
+        # Окружность захватывает полюс - берем все долготы
+        dlon = 360.0
+    else:
+        dlon = degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    return max(lat - dlat, -90.0), min(lat + dlat, 90.0), lon - dlon, lon + dlon
+
+
+def split_longitudes(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    """Диапазоны долгот внутри [-180, 180] с учетом перехода через 180-й меридиан"""
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def _spread_bits(v: int) -> int:
+    v &= 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+
+def morton_code(lat: float, lon: float) -> int:
+    """Код Z-кривой (Morton) для точки: чередование битов квантованных координат"""
+    lat = min(max(lat, -90.0), 90.0)
+    lon = min(max(lon, -180.0), 180.0)
+    y = int((lat + 90.0) / 180.0 * _COORD_SCALE)
+    x = int((lon + 180.0) / 360.0 * _COORD_SCALE)
+    return (_spread_bits(y) << 1) | _spread_bits(x)
+
+
+class CoordinateStore:
+    """
+    Колоночное хранилище координат зданий в памяти процесса.
+
+    Параллельные массивы id/широт/долгот отсортированы по коду Z-кривой,
+    поэтому прямоугольный запрос сводится к бинарному поиску диапазона кодов
+    и фильтрации кандидатов. На одно здание приходится 32 байта.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Одновременно выполняется только одна загрузка: остальные вызовы ждут ее результат
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        # Изменения, пришедшие во время загрузки: применяются к загруженным массивам повторно
+        self._pending: Optional[List[Tuple[List[Tuple[int, int, float, float]], Set[int]]]] = None
+        # Увеличивается при сбросе: загрузка, начатая до сброса, результат не сохраняет
+        self._generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._codes = array("Q")
+        self._ids = array("q")
+        self._lats = array("d")
+        self._lons = array("d")
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self._codes, self._ids, self._lats, self._lons))
+
+    def clear(self):
+        """Сбросить хранилище; при следующем запросе оно будет загружено заново"""
+        with self._lock:
+            self._clear()
+            self._loaded = False
+            self._generation += 1
+
+    def load(self, db: Session):
+        """
+        Загрузить координаты всех зданий из таблицы buildings.
+        Изменения, закоммиченные между SELECT и заменой массивов, записываются
+        с начала загрузки и применяются после замены (повторное применение безвредно)
+        """
+        with self._load_lock:
+            self._load(db)
+
+    def _load(self, db: Session):
+        with self._lock:
+            generation = self._generation
+            self._pending = []
+        try:
+            rows = db.execute(
+                select(Building.id, Building.latitude, Building.longitude)
+            ).all()
+            entries = sorted((morton_code(lat, lon), id_, lat, lon) for id_, lat, lon in rows)
+
+            with self._lock:
+                if generation != self._generation:
+                    logger.info("Coordinate store was reset during load, discarding it")
+                    return
+                self._codes = array("Q", (e[0] for e in entries))
+                self._ids = array("q", (e[1] for e in entries))
+                self._lats = array("d", (e[2] for e in entries))
+                self._lons = array("d", (e[3] for e in entries))
+                for added, affected in self._pending:
+                    self._splice(self._positions(affected), added)
+                self._loaded = True
+        finally:
+            with self._lock:
+                self._pending = None
+
+        logger.info("Coordinate store loaded: %d buildings, %d bytes", len(entries), self.nbytes)
+
+    def ensure_loaded(self, db: Session):
+        """Загрузить хранилище, если оно не загружено; параллельные вызовы ждут одну загрузку"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load(db)
+
+    def _positions(self, building_ids: Set[int]) -> List[int]:
+        """Позиции зданий в массивах по возрастанию"""
+        if len(building_ids) <= _INDEX_LOOKUP_MAX:
+            positions = []
+            for building_id in building_ids:
+                try:
+                    positions.append(self._ids.index(building_id))
+                except ValueError:
+                    pass
+            return sorted(positions)
+        return [pos for pos, building_id in enumerate(self._ids) if building_id in building_ids]
+
+    def _splice(self, removed: List[int], added: List[Tuple[int, int, float, float]]):
+        """
+        Пересобрать массивы: удалить позиции removed и вставить added (отсортированы по коду).
+        Массивы копируются срезами один раз на пакет, а не сдвигаются на каждое изменение
+        """
+        arrays = (self._codes, self._ids, self._lats, self._lons)
+        if len(removed) + len(added) <= _INDEX_LOOKUP_MAX:
+            # Единичные изменения дешевле сдвигом на месте
+            for pos in reversed(removed):
+                for a in arrays:
+                    del a[pos]
+            for entry in added:
+                pos = bisect_right(self._codes, entry[0])
+                for a, value in zip(arrays, entry):
+                    a.insert(pos, value)
+            return
+
+        if removed:
+            kept = tuple(array(a.typecode) for a in arrays)
+            previous = 0
+            for pos in removed + [len(self._ids)]:
+                for target, source in zip(kept, arrays):
+                    target.extend(source[previous:pos])
+                previous = pos + 1
+            arrays = kept
+
+        if added:
+            merged = tuple(array(a.typecode) for a in arrays)
+            previous = 0
+            for entry in added:
+                pos = bisect_right(arrays[0], entry[0], lo=previous)
+                for target, source, value in zip(merged, arrays, entry):
+                    target.extend(source[previous:pos])
+                    target.append(value)
+                previous = pos
+            for target, source in zip(merged, arrays):
+                target.extend(source[previous:])
+            arrays = merged
+
+        self._codes, self._ids, self._lats, self._lons = arrays
+
+    def apply(self, upserts: Iterable[Tuple[int, float, float]] = (), removals: Iterable[int] = ()):
+        """Пакетно добавить или переместить здания (id, широта, долгота) и удалить здания"""
+        # Повтор id в пакете: действует последнее значение
+        latest = {building_id: (lat, lon) for building_id, lat, lon in upserts}
+        added = sorted((morton_code(lat, lon), building_id, lat, lon) for building_id, (lat, lon) in latest.items())
+        affected = latest.keys() | set(removals)
+        if not affected:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((added, affected))
+            if self._loaded:
+                self._splice(self._positions(affected), added)
+
+    def upsert(self, building_id: int, lat: float, lon: float):
+        """Добавить или переместить здание"""
+        self.apply(upserts=[(building_id, lat, lon)])
+
+    def remove(self, building_id: int):
+        self.apply(removals=[building_id])
+
+    def _scan(
+            self, min_lat: float, max_lat: float, min_lon: float, max_lon: float
+    ) -> Iterator[int]:
+        """Позиции точек внутри прямоугольника (без учета перехода через 180-й меридиан)"""
+        lo = bisect_left(self._codes, morton_code(min_lat, min_lon))
+        hi = bisect_right(self._codes, morton_code(max_lat, max_lon))
+        lats, lons = self._lats, self._lons
+        for pos in range(lo, hi):
+            if min_lat <= lats[pos] <= max_lat and min_lon <= lons[pos] <= max_lon:
+                yield pos
+
+    def _scan_wrapped(
+            self, min_lat: float, max_lat: float, min_lon: float, max_lon: float
+    ) -> Iterator[int]:
+        for lon_from, lon_to in split_longitudes(min_lon, max_lon):
+            yield from self._scan(min_lat, max_lat, lon_from, lon_to)
+
+    def in_rectangle(
+            self, *, min_lat: float, max_lat: float, min_lon: float, max_lon: float
+    ) -> List[int]:
+        """ID зданий в прямоугольной области"""
+        with self._lock:
+            return [self._ids[pos] for pos in self._scan(min_lat, max_lat, min_lon, max_lon)]
+
+    def in_radius(
+            self, *, lat: float, lon: float, radius_m: float, limit: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        ID зданий в радиусе вместе с расстоянием в метрах, ближайшие первыми.
+        С limit ближайшие отбираются кучей ограниченного размера без сортировки всех совпадений
+        """
+        result = []
+        with self._lock:
+            for pos in self._scan_wrapped(*radius_bounds(lat, lon, radius_m)):
+                distance = haversine(lat, lon, self._lats[pos], self._lons[pos])
+                if distance <= radius_m:
+                    result.append((self._ids[pos], distance))
+        return nearest(result, limit)
+
+
+coordinate_store = CoordinateStore()
+
+
+def nearest(items: List[Tuple], limit: Optional[int] = None, distance=lambda item: item[1]) -> List[Tuple]:
+    """Элементы по возрастанию расстояния; с limit - только limit ближайших (O(n log limit))"""
+    if limit is None:
+        return sorted(items, key=distance)
+    return heapq.nsmallest(limit, items, key=distance)
+
+
+def _on_building_change(change: events.ChangeEvent):
+    if change.action == "upsert" and change.data:
+        coordinate_store.upsert(change.id, change.data["latitude"], change.data["longitude"])
+    elif change.action == "bulk_upsert" and change.data:
+        coordinate_store.apply(upserts=change.data["rows"])
+    elif change.action == "delete":
+        coordinate_store.remove(change.id)
+    else:
+        coordinate_store.clear()
+
+
+events.subscribe(Building.__tablename__, _on_building_change)
@@ -0,0 +1,89 @@
+from typing import List, Optional, Tuple
+
+# Алфавит geohash упорядочен так же, как строки сравниваются в БД (цифры, затем строчные буквы),
+# поэтому ячейка - это диапазон строк [hash, successor(hash)), а соседние по Z-кривой ячейки
+# склеиваются в один диапазон
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+PRECISION = 12
+
+# Ограничение на число ячеек покрытия: больше ячеек - точнее покрытие, но длиннее условие WHERE
+MAX_COVER_CELLS = 16
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    """Geohash точки"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Размер ячейки в градусах: (широта, долгота)"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def successor(cell: str) -> Optional[str]:
+    """Следующая строка после всех строк с префиксом cell (None - таких строк нет)"""
+    while cell:
+        position = BASE32.index(cell[-1])
+        if position + 1 < len(BASE32):
+            return cell[:-1] + BASE32[position + 1]
+        cell = cell[:-1]
+    return None
+
+
+def _grid(value: float, low: float, step: float, count: int) -> int:
+    return min(max(int((value - low) // step), 0), count - 1)
+
+
+def cover(
+        min_lat: float, max_lat: float, min_lon: float, max_lon: float, max_cells: int = MAX_COVER_CELLS
+) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """
+    Покрытие прямоугольника (долготы внутри [-180, 180]) ячейками geohash одной длины,
+    склеенное в диапазоны строк [start, end). Длина ячеек - наибольшая, при которой
+    покрытие укладывается в max_cells ячеек; None - не укладывается даже из самых крупных
+    ячеек, и диапазоны не сужают поиск
+    """
+    cells = None
+    for precision in range(PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        lat_count, lon_count = round(180.0 / lat_step), round(360.0 / lon_step)
+        lat_from, lat_to = _grid(min_lat, -90.0, lat_step, lat_count), _grid(max_lat, -90.0, lat_step, lat_count)
+        lon_from, lon_to = _grid(min_lon, -180.0, lon_step, lon_count), _grid(max_lon, -180.0, lon_step, lon_count)
+        if (lat_to - lat_from + 1) * (lon_to - lon_from + 1) <= max_cells:
+            cells = [
+                encode(-90.0 + (i + 0.5) * lat_step, -180.0 + (j + 0.5) * lon_step, precision)
+                for i in range(lat_from, lat_to + 1)
+                for j in range(lon_from, lon_to + 1)
+            ]
+            break
+    if cells is None:
+        return None
+
+    ranges: List[Tuple[str, Optional[str]]] = []
+    for cell in sorted(cells):
+        end = successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((cell, end))
+    return ranges
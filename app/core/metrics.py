@@ -0,0 +1,61 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Счетчики и gauge-метрики процесса в текстовом формате Prometheus.
+    Метрики хранятся в памяти воркера; каждый воркер отдает свои значения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+        self._values: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+
+    def register(self, name: str, kind: str, help_text: str):
+        """Описать метрику (kind: counter | gauge)"""
+        with self._lock:
+            self._types[name] = kind
+            self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def get(self, name: str, **labels) -> float:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            return self._values.get(name, {}).get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(set(self._types) | set(self._values)):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                if name in self._types:
+                    lines.append(f"# TYPE {name} {self._types[name]}")
+                for labels, value in sorted(self._values.get(name, {}).items()):
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                    series = f"{name}{{{label_text}}}" if label_text else name
+                    lines.append(f"{series} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
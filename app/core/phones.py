@@ -0,0 +1,26 @@
+import re
+from typing import Optional
+
+from app.core.config import settings
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(number: str) -> Optional[str]:
+    """
+    Номер в формате E.164 без "+" (только цифры) или None, если формат не распознан.
+    Национальные форматы: 8-XXX-XXX-XX-XX, XXX-XXX-XX-XX и местный XXX-XX-XX
+    (с кодом города PHONE_DEFAULT_AREA_CODE); номер с "+" принимается как международный
+    """
+    digits = _NON_DIGITS.sub("", number)
+    country = settings.PHONE_COUNTRY_CODE
+    if number.lstrip().startswith("+"):
+        return digits if 8 <= len(digits) <= 15 else None
+    if len(digits) == 7 and settings.PHONE_DEFAULT_AREA_CODE:
+        return country + settings.PHONE_DEFAULT_AREA_CODE + digits
+    if len(digits) == 10:
+        return country + digits
+    if len(digits) == 11 and digits[0] in ("8", country):
+        # 8 - национальный префикс выхода на междугороднюю связь
+        return country + digits[1:]
+    return None
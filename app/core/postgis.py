@@ -0,0 +1,74 @@
+import logging
+import threading
+from typing import Dict
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.geo_index import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+# Сферические расстояния PostGIS считаются по среднему радиусу WGS84 (2a + b) / 3; приводим их
+# к EARTH_RADIUS_M haversine, чтобы оба пути находили одни и те же здания на границе радиуса
+POSTGIS_SPHERE_RADIUS_M = (2 * 6378137.0 + 6356752.314245179) / 3
+_SPHERE_SCALE = EARTH_RADIUS_M / POSTGIS_SPHERE_RADIUS_M
+
+# Колонка geography(Point, 4326) создается миграцией только при наличии PostGIS и вычисляется
+# самой БД из latitude/longitude (GENERATED ... STORED), поэтому в модели Building ее нет
+GEOG = literal_column("buildings.geog")
+
+_lock = threading.Lock()
+_available: Dict[Engine, bool] = {}
+
+
+def point(lat: float, lon: float):
+    """Точка как geography (долгота первой, как в PostGIS)"""
+    return func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+
+
+def envelope(min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+    return func.geography(func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326))
+
+
+def distance(lat: float, lon: float):
+    """Расстояние в метрах по сфере - как haversine в пути без PostGIS"""
+    return func.ST_Distance(GEOG, point(lat, lon), False) * _SPHERE_SCALE
+
+
+def within(lat: float, lon: float, radius_m: float):
+    """Условие ST_DWithin по GiST-индексу колонки geog"""
+    return func.ST_DWithin(GEOG, point(lat, lon), radius_m / _SPHERE_SCALE, False)
+
+
+def intersects_envelope(min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+    """Пересечение ограничивающих прямоугольников (&&) по GiST-индексу колонки geog"""
+    return GEOG.op("&&")(envelope(min_lat, max_lat, min_lon, max_lon))
+
+
+def _detect(engine: Engine) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'buildings' AND column_name = 'geog')"
+            )).scalar()
+    except Exception:
+        logger.exception("PostGIS detection failed, using plain SQL geo search")
+        return False
+
+
+def is_available(db: Session) -> bool:
+    """Использовать ли PostGIS для геопоиска (GEO_BACKEND или автоопределение, один раз на engine)"""
+    if settings.GEO_BACKEND != "auto":
+        return settings.GEO_BACKEND == "postgis"
+    engine = db.get_bind()
+    with _lock:
+        if engine not in _available:
+            _available[engine] = _detect(engine)
+            logger.info("Geo search backend: %s", "postgis" if _available[engine] else "sql")
+        return _available[engine]
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.register("rate_limit_rejected_total", "counter", "Запросы, отклоненные с 429, по ключу и причине")
+
+
+class MemoryBucketBackend:
+    """Token bucket в памяти процесса: у каждого воркера свои корзины"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, key: str, cost: float, rate: float, burst: float) -> float:
+        """Списать cost токенов; 0 - запрос разрешен, иначе - через сколько секунд повторить"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / rate
+            self._buckets[key] = [tokens, now]
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketBackend:
+    """Token bucket в Redis: лимит общий для всех воркеров и экземпляров приложения"""
+
+    # Пополнение и списание атомарны внутри скрипта; время берется у Redis, а не у воркеров
+    SCRIPT = """
+    local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    local retry_after = 0
+    if tokens >= cost then tokens = tokens - cost else retry_after = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def acquire(self, key: str, cost: float, rate: float, burst: float) -> float:
+        try:
+            return float(self._script(keys=[f"rate_limit:{key}"], args=[rate, burst, cost]))
+        except self._errors:
+            # Недоступность Redis не должна останавливать API: пропускаем запрос
+            logger.exception("Rate limit backend is unavailable")
+            return 0.0
+
+    def clear(self):
+        pass
+
+
+class ConcurrencyLimiter:
+    """Счетчики одновременных запросов по ключу в пределах процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = defaultdict(int)
+
+    def enter(self, key: str, limit: int) -> bool:
+        with self._lock:
+            if self._active[key] >= limit:
+                return False
+            self._active[key] += 1
+            return True
+
+    def exit(self, key: str):
+        with self._lock:
+            self._active[key] -= 1
+            if self._active[key] <= 0:
+                del self._active[key]
+
+    def clear(self):
+        with self._lock:
+            self._active.clear()
+
+
+def create_bucket_backend():
+    # redis импортируется только для общего бэкенда: воркеру с лимитами в памяти он не нужен
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        try:
+            return RedisBucketBackend(settings.RATE_LIMIT_REDIS_URL)
+        except ImportError:
+            logger.warning("RATE_LIMIT_BACKEND=redis, but redis is not installed; using in-memory buckets")
+    return MemoryBucketBackend()
+
+
+buckets = create_bucket_backend()
+concurrency = ConcurrencyLimiter()
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Optional
+
+from starlette.types import Message
+
+from app.core import events
+from app.core.config import settings
+
+
+@dataclass
+class CachedResponse:
+    messages: List[Message]
+    size: int
+    stored_at: float
+    generation: int
+
+
+class ResponseCache:
+    """
+    Последние успешные ответы GET-запросов для деградированного режима.
+    LRU с ограничением по суммарному размеру тел. Любое событие изменения
+    помечает все записи устаревшими: они остаются доступными, но отдаются с пометкой stale.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.generation = 0
+
+    def put(self, key: Hashable, messages: List[Message]):
+        size = sum(len(m.get("body", b"")) for m in messages)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = CachedResponse(messages, size, time.monotonic(), self.generation)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def get(self, key: Hashable, max_stale: float) -> Optional[CachedResponse]:
+        """Запись по ключу; устаревшая запись отдается, только если она моложе max_stale секунд"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self.is_fresh(entry) and time.monotonic() - entry.stored_at > max_stale:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return entry.generation == self.generation
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache(settings.DEGRADED_CACHE_MAX_BYTES)
+
+
+def _on_change(change: events.ChangeEvent):
+    response_cache.invalidate()
+
+
+events.subscribe(events.ALL, _on_change)
@@ -0,0 +1,26 @@
+from typing import Any, Type
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson опционален
+    orjson = None
+
+
+def json_response_class() -> Type[JSONResponse]:
+    """Класс JSON-ответа: orjson, если он включен в настройках и установлен"""
+    if settings.JSON_RESPONSE == "orjson" and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+def json_response(content: Any, status_code: int = 200) -> JSONResponse:
+    """
+    Ответ из уже подготовленных dict/list.
+    FastAPI не валидирует возвращенный Response через response_model
+    и не прогоняет его через jsonable_encoder.
+    """
+    return json_response_class()(content=content, status_code=status_code)
\ No newline at end of file
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Hashable, List, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+metrics.register("single_flight_requests_total", "counter",
+                 "GET-запросы через single-flight: leader выполнил запрос, follower получил его результат")
+metrics.register("single_flight_in_flight", "gauge", "Уникальные запросы, выполняемые в данный момент")
+
+# Заголовки, от которых зависит ответ: запросы с разными значениями не объединяются
+VARY_HEADERS = (b"x-api-key", b"accept", b"accept-encoding")
+
+
+class SingleFlight:
+    """
+    Группа одновременных вызовов по ключу: первый вызов выполняет работу,
+    остальные ждут его результат.
+    Построена на concurrent.futures.Future, поэтому ожидать результат можно
+    из любого потока и event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Вернуть future вызова по ключу и признак, что вызывающий - leader"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def resolve(self, key: Hashable, future: Future, result=None, exc: BaseException = None):
+        """Завершить вызов; следующий join с тем же ключом начнет новый"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+def request_key(scope: Scope) -> Hashable:
+    """Ключ запроса: путь, query-параметры, отсортированные по имени, и заголовки из VARY_HEADERS"""
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    headers = dict(scope["headers"])
+    return (
+        scope["path"],
+        # Сортировка устойчива: порядок повторяющихся параметров сохраняется
+        tuple(sorted(query, key=lambda item: item[0])),
+        tuple(headers.get(name) for name in VARY_HEADERS),
+    )
+
+
+class SingleFlightMiddleware:
+    """
+    ASGI middleware, объединяющий одинаковые одновременные GET-запросы.
+    Leader выполняет запрос и буферизует ответ, остальные запросы с тем же ключом
+    получают копию его сообщений вместо собственного обращения к БД.
+    Работает выше роутинга, поэтому одинаково покрывает sync-маршруты в threadpool и async-маршруты.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = ""):
+        self.app = app
+        self.prefix = prefix
+        self.group = SingleFlight()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        key = request_key(scope)
+        future, leader = self.group.join(key)
+        if leader:
+            messages = await self._lead(key, future, scope, receive)
+        else:
+            metrics.inc("single_flight_requests_total", role="follower")
+            messages = await asyncio.wrap_future(future)
+            if messages is None:
+                # Leader был отменен (клиент отключился) - выполняем запрос сами
+                await self.app(scope, receive, send)
+                return
+
+        for message in messages:
+            await send(message)
+
+    async def _lead(self, key: Hashable, future: Future, scope: Scope, receive: Receive) -> List[Message]:
+        metrics.inc("single_flight_requests_total", role="leader")
+        metrics.set("single_flight_in_flight", len(self.group))
+        messages: List[Message] = []
+
+        async def capture(message: Message):
+            messages.append(message)
+
+        async def receive_request() -> Message:
+            # Результат leader нужен и остальным запросам: отключение его клиента
+            # не передается дальше и не отменяет выполнение
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                await asyncio.Event().wait()
+            return message
+
+        try:
+            await self.app(scope, receive_request, capture)
+        except asyncio.CancelledError:
+            self.group.resolve(key, future, None)
+            raise
+        except BaseException as exc:
+            self.group.resolve(key, future, exc=exc)
+            raise
+        else:
+            self.group.resolve(key, future, messages)
+        finally:
+            metrics.set("single_flight_in_flight", len(self.group))
+        return messages
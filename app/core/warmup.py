@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+from fastapi import FastAPI
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, configure_mappers
+
+from app.core.config import settings
+from app.core.geo_index import coordinate_store
+from app.core.workers import pool_limits
+from app.crud import activity as crud_activity
+from app.crud import building as crud_building
+from app.crud import organization as crud_organization
+from app.crud import organization_document as crud_document
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Состояние прогрева воркера для эндпоинта /ready"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.steps: Dict[str, float] = {}
+        self.errors: List[str] = []
+
+    def record(self, step: str, seconds: float):
+        with self._lock:
+            self.steps[step] = round(seconds * 1000, 1)
+
+    def fail(self, step: str, exc: Exception):
+        with self._lock:
+            self.errors.append(f"{step}: {exc}")
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready = True
+
+    def reset(self):
+        with self._lock:
+            self.ready = False
+            self.steps = {}
+            self.errors = []
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "status": "ready" if self.ready else "warming_up",
+                "steps_ms": dict(self.steps),
+                "errors": list(self.errors),
+            }
+
+
+readiness = Readiness()
+
+
+def _timed(step: str, fn: Callable[[], None]):
+    started = time.perf_counter()
+    fn()
+    readiness.record(step, time.perf_counter() - started)
+
+
+def open_pool(engine: Engine, size: int):
+    """Открыть size соединений заранее и вернуть их в пул"""
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_queries(db: Session, organizations: int):
+    """
+    Выполнить горячие запросы один раз: кэши компиляции SQLAlchemy, lambda_stmt и
+    ленивые структуры ORM заполняются до первого клиентского запроса
+    """
+    crud_activity.activity.get_tree(db)
+
+    organization_ids = crud_organization.organization.get_ids(db, limit=organizations)
+    crud_organization.organization.get_payloads(db, organization_ids)
+    if organization_ids:
+        crud_organization.organization.get_with_details(db, organization_ids[0])
+    if settings.ORGANIZATION_READ_MODEL_ENABLED:
+        # Модель чтения достраивает недостающие документы популярных организаций
+        crud_document.organization_document.get_bodies(db, organization_ids)
+
+    buildings = crud_building.building.get_multi_rows(db, limit=organizations)
+    crud_building.building.get_many(db, [row.id for row in buildings])
+    db.rollback()
+
+
+def run_warmup(app: FastAPI, engine: Engine, session_factory: Callable[[], Session]):
+    """Прогрев воркера; ошибки БД не фатальны, они попадают в /ready"""
+    readiness.reset()
+    _timed("mappers", configure_mappers)
+    # Схема OpenAPI строится лениво при первом обращении к /docs
+    _timed("openapi", app.openapi)
+
+    steps = [("pool", lambda db: open_pool(engine, pool_limits()[0]))]
+    if settings.GEO_INDEX_ENABLED:
+        steps.append(("coordinate_index", coordinate_store.ensure_loaded))
+    steps.append(("queries", lambda db: warm_queries(db, settings.WARMUP_ORGANIZATIONS)))
+
+    for step, fn in steps:
+        db = session_factory()
+        try:
+            _timed(step, lambda: fn(db))
+        except Exception as exc:
+            logger.exception("Warm-up step %s failed", step)
+            readiness.fail(step, exc)
+        finally:
+            db.close()
+
+    readiness.mark_ready()
+    logger.info("Warm-up finished: %s", readiness.as_dict())
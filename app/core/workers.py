@@ -0,0 +1,36 @@
+import os
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+
+def reserved_connections() -> int:
+    """Соединения воркера вне пула: LISTEN-соединение шины изменений"""
+    return 0 if settings.CHANGE_BUS == "local" else 1
+
+
+def worker_count(cpu_count: Optional[int] = None) -> int:
+    """
+    Число процессов: WEB_CONCURRENCY или 2 * CPU + 1, но не больше, чем помещается
+    в DB_CONNECTION_BUDGET при одном соединении пула на воркер
+    """
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    workers = 2 * (cpu_count or os.cpu_count() or 1) + 1
+    if settings.DB_CONNECTION_BUDGET > 0:
+        workers = min(workers, settings.DB_CONNECTION_BUDGET // (1 + reserved_connections()))
+    return max(workers, 1)
+
+
+def pool_limits(workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) пула одного воркера. Бюджет соединений делится поровну между
+    воркерами и только урезает DB_POOL_SIZE и DB_MAX_OVERFLOW: сначала переполнение, затем пул
+    """
+    if settings.DB_CONNECTION_BUDGET <= 0:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    # Без gunicorn (uvicorn напрямую) процесс один
+    workers = workers or settings.WEB_CONCURRENCY or 1
+    per_worker = max(settings.DB_CONNECTION_BUDGET // workers - reserved_connections(), 1)
+    pool_size = min(settings.DB_POOL_SIZE, per_worker)
+    return pool_size, min(settings.DB_MAX_OVERFLOW, per_worker - pool_size)
@@ -1,49 +1,363 @@
-from typing import List, Set
-from sqlalchemy.orm import Session, joinedload
-from app.models.activity import Activity
-from app.schemas.activity import ActivityCreate, ActivityUpdate
+from collections import defaultdict
+from typing import Hashable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import Integer, Row, case, distinct, exists, func, lambda_stmt, literal, select, text, update, insert
+from sqlalchemy.orm import Session, aliased, selectinload
+from app.models.activity import Activity, MAX_ACTIVITY_LEVELS
+from app.models.organization import Organization, organization_activities
+from app.schemas.activity import ActivityCreate, ActivityImportNode, ActivityImportRow, ActivityUpdate
 from app.crud.base import CRUDBase
+from app.crud.organization_document import organization_document
+
+# Ключ advisory-блокировки PostgreSQL для структурных изменений дерева (перенос, импорт, названия соседей):
+# два одновременных переноса не должны образовать цикл, а две записи - одинаковых соседей,
+# пройдя проверку каждая в своей транзакции
+TREE_LOCK_KEY = 4104202
+
+# Строка импорта: (ключ в пакете, название, ключ родителя в пакете или None)
+ImportItem = Tuple[Hashable, str, Optional[Hashable]]
 
 
 class CRUDActivity(CRUDBase[Activity, ActivityCreate, ActivityUpdate]):
     def get_by_name(self, db: Session, name: str) -> Activity:
-        return db.query(Activity).filter(Activity.name == name).first()
+        return db.execute(
+            lambda_stmt(lambda: select(Activity)) + (lambda s: s.where(Activity.name == name))
+        ).scalars().first()
 
-    def get_tree(self, db: Session) -> List[Activity]:
-        return db.query(Activity).filter(Activity.parent_id.is_(None)).options(
-            joinedload(Activity.children)
+    def get_tree(self, db: Session, max_depth: int = MAX_ACTIVITY_LEVELS) -> List[dict]:
+        """
+        Дерево видов деятельности до глубины max_depth (корни - 0).
+        Плоские строки загружаются одним запросом по хранимой глубине и собираются в дерево за O(n).
+        """
+        rows = db.execute(
+            lambda_stmt(lambda: select(Activity.id, Activity.name, Activity.parent_id).order_by(Activity.id))
+            + (lambda s: s.where(Activity.depth <= max_depth))
         ).all()
 
+        nodes = {row.id: {"id": row.id, "name": row.name, "parent_id": row.parent_id, "children": []} for row in rows}
+        roots = []
+        for node in nodes.values():
+            if node["parent_id"] is None:
+                roots.append(node)
+            elif node["parent_id"] in nodes:
+                nodes[node["parent_id"]]["children"].append(node)
+        return roots
+
     def get_with_children(self, db: Session, activity_id: int) -> Activity:
-        return db.query(Activity).filter(Activity.id == activity_id).options(
-            joinedload(Activity.children)
-        ).first()
+        return db.execute(
+            lambda_stmt(lambda: select(Activity).options(selectinload(Activity.children)))
+            + (lambda s: s.where(Activity.id == activity_id))
+        ).scalars().first()
 
     def get_all_descendants(self, db: Session, activity_id: int) -> Set[int]:
         """Получить всех потомков активности (включая саму активность)"""
+        subtree = self._subtree(activity_id)
+        return set(db.execute(select(subtree.c.id)).scalars())
 
-        def get_children_ids(activity_id: int) -> Set[int]:
-            activity = db.query(Activity).filter(Activity.id == activity_id).first()
-            if not activity:
-                return set()
+    def get_activity_depth(self, db: Session, activity_id: int) -> int:
+        """Получить глубину активности в дереве (хранится в колонке depth)"""
+        return db.execute(select(Activity.depth).where(Activity.id == activity_id)).scalar() or 0
 
-            ids = {activity_id}
-            for child in activity.children:
-                ids.update(get_children_ids(child.id))
-            return ids
+    def _ancestors(self, activity_id: int):
+        """Рекурсивный CTE предков (включая саму запись) с расстоянием level до нее"""
+        ancestors = select(
+            Activity.id, Activity.parent_id, literal(0, Integer).label("level")
+        ).where(Activity.id == activity_id).cte("activity_ancestors", recursive=True)
 
-        return get_children_ids(activity_id)
+        parent = aliased(Activity)
+        return ancestors.union_all(
+            select(parent.id, parent.parent_id, ancestors.c.level + 1)
+            .where(parent.id == ancestors.c.parent_id)
+            # Ограничение на случай уже испорченных данных с циклом
+            .where(ancestors.c.level < MAX_ACTIVITY_LEVELS + 1)
+        )
 
-    def get_activity_depth(self, db: Session, activity_id: int) -> int:
-        """Получить глубину активности в дереве"""
+    def _subtree(self, activity_id: int):
+        """Рекурсивный CTE поддерева (включая саму запись) с относительной глубиной level"""
+        subtree = select(
+            Activity.id, literal(0, Integer).label("level")
+        ).where(Activity.id == activity_id).cte("activity_subtree", recursive=True)
+
+        child = aliased(Activity)
+        return subtree.union_all(
+            select(child.id, subtree.c.level + 1)
+            .where(child.parent_id == subtree.c.id)
+            .where(subtree.c.level < MAX_ACTIVITY_LEVELS + 1)
+        )
+
+    def check_placement(self, db: Session, parent_id: Optional[int], activity_id: Optional[int] = None) -> int:
+        """
+        Проверить, что запись activity_id (или новую запись) можно поместить под parent_id.
+        Одним запросом: цепочка предков родителя (его существование, глубина, цикл)
+        и высота поддерева переносимой записи. Возвращает новую глубину записи,
+        при нарушении правил - ValueError.
+        """
+        if parent_id is None:
+            return 0
+        if parent_id == activity_id:
+            raise ValueError("Activity cannot be its own parent")
+
+        ancestors = self._ancestors(parent_id)
+        columns = [select(func.count()).select_from(ancestors).scalar_subquery().label("parent_levels")]
+        if activity_id is not None:
+            subtree = self._subtree(activity_id)
+            columns += [
+                exists().where(ancestors.c.id == activity_id).label("creates_cycle"),
+                select(func.max(subtree.c.level)).scalar_subquery().label("height"),
+            ]
+        row = db.execute(select(*columns)).one()
+
+        if row.parent_levels == 0:
+            raise ValueError("Parent activity not found")
+        if activity_id is not None and row.creates_cycle:
+            raise ValueError("Activity cannot be moved under its own descendant")
+        depth = row.parent_levels
+        height = row.height or 0 if activity_id is not None else 0
+        if depth + height >= MAX_ACTIVITY_LEVELS:
+            raise ValueError(f"Maximum nesting depth of {MAX_ACTIVITY_LEVELS} levels exceeded")
+        return depth
+
+    def check_sibling_names(self, db: Session, parent_id: Optional[int], names: Sequence[str],
+                            activity_id: Optional[int] = None):
+        """
+        Названия names не должны повторяться между собой и совпадать с названиями других
+        детей parent_id (кроме самой записи activity_id); иначе ValueError.
+        Общая проверка создания, изменения, переноса и импорта
+        """
+        if len(set(names)) != len(names):
+            raise ValueError("Activity names must be unique among siblings")
+        if not names:
+            return
+        # Под блокировкой дерева параллельная запись не добавит соседа с тем же названием после проверки
+        self._lock_tree(db)
+        stmt = select(Activity.id).where(
+            Activity.parent_id.is_(None) if parent_id is None else Activity.parent_id == parent_id,
+            Activity.name.in_(names)
+        )
+        if activity_id is not None:
+            stmt = stmt.where(Activity.id != activity_id)
+        if db.execute(stmt.limit(1)).scalar() is not None:
+            raise ValueError("Activity names must be unique among siblings")
+
+    def create_with_validation(self, db: Session, *, obj_in: ActivityCreate) -> Activity:
+        self.check_sibling_names(db, obj_in.parent_id, [obj_in.name])
+        depth = self.check_placement(db, obj_in.parent_id)
+        db_obj = Activity(name=obj_in.name, parent_id=obj_in.parent_id, depth=depth)
+        db.add(db_obj)
+        db.flush()
+        self.on_change(db, "upsert", db_obj.id, db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def update_with_validation(self, db: Session, *, db_obj: Activity, obj_in: ActivityUpdate) -> Activity:
+        """
+        Обновить вид деятельности. При смене родителя глубины всей переносимой ветки
+        сдвигаются одним UPDATE по рекурсивному CTE, независимо от размера ветки.
+        """
+        update_data = obj_in.model_dump(exclude_unset=True)
+        renamed = update_data.get("name") is not None and update_data["name"] != db_obj.name
+        parent_id = update_data.get("parent_id", db_obj.parent_id)
+        if renamed or parent_id != db_obj.parent_id:
+            self.check_sibling_names(
+                db, parent_id, [update_data["name"] if renamed else db_obj.name], activity_id=db_obj.id
+            )
+        if renamed:
+            db_obj.name = update_data["name"]
+
+        if "parent_id" in update_data:
+            self._reparent(db, db_obj, update_data["parent_id"])
+
+        db.flush()
+        if renamed:
+            # Название вида деятельности входит в документы связанных организаций;
+            # перенос в дереве и новые записи документы не меняют
+            organization_document.refresh_for_activity(db, db_obj.id)
+        self.on_change(db, "upsert", db_obj.id, db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def update(self, db: Session, *, db_obj: Activity, obj_in: ActivityUpdate) -> Activity:
+        return self.update_with_validation(db, db_obj=db_obj, obj_in=obj_in)
+
+    def move(self, db: Session, *, db_obj: Activity, parent_id: Optional[int]) -> Activity:
+        """Перенести вид деятельности вместе с веткой под parent_id (None - сделать корнем) в одной транзакции"""
+        if parent_id != db_obj.parent_id:
+            self.check_sibling_names(db, parent_id, [db_obj.name], activity_id=db_obj.id)
+        self._reparent(db, db_obj, parent_id)
+        db.flush()
+        self.on_change(db, "upsert", db_obj.id, db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def _lock_tree(self, db: Session):
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": TREE_LOCK_KEY})
 
-        def get_depth(activity_id: int, current_depth: int = 0) -> int:
-            activity = db.query(Activity).filter(Activity.id == activity_id).first()
-            if not activity or not activity.parent_id:
-                return current_depth
-            return get_depth(activity.parent_id, current_depth + 1)
+    def _reparent(self, db: Session, db_obj: Activity, parent_id: Optional[int]):
+        if parent_id == db_obj.parent_id:
+            return
+        self._lock_tree(db)
+        depth = self.check_placement(db, parent_id, db_obj.id)
+        shift = depth - db_obj.depth
+        if shift:
+            subtree = self._subtree(db_obj.id)
+            db.execute(
+                update(Activity)
+                .where(Activity.id.in_(select(subtree.c.id)))
+                .values(depth=Activity.depth + shift)
+                .execution_options(synchronize_session=False)
+            )
+        db_obj.parent_id = parent_id
+        db_obj.depth = depth
 
-        return get_depth(activity_id)
+    def import_tree(self, db: Session, *, nodes: Sequence[ActivityImportNode],
+                    parent_id: Optional[int] = None) -> List[int]:
+        """Импорт вложенного дерева; id возвращаются в порядке обхода (родитель перед потомками)"""
+        items: List[ImportItem] = []
+        stack = [(node, None) for node in reversed(nodes)]
+        while stack:
+            node, parent_key = stack.pop()
+            key = len(items)
+            items.append((key, node.name, parent_key))
+            stack.extend((child, key) for child in reversed(node.children))
+        return self.import_items(db, items, parent_id)
+
+    def import_rows(self, db: Session, *, rows: Sequence[ActivityImportRow],
+                    parent_id: Optional[int] = None) -> List[int]:
+        """Импорт плоских строк id/parent_id; id в БД возвращаются в порядке строк"""
+        return self.import_items(db, [(row.id, row.name, row.parent_id) for row in rows], parent_id)
+
+    def import_items(self, db: Session, items: Sequence[ImportItem], parent_id: Optional[int] = None) -> List[int]:
+        """
+        Вставить пакет видов деятельности под parent_id.
+        Ссылки, циклы, глубина и уникальность названий среди соседей проверяются в памяти
+        до первой вставки; затем каждый уровень вставляется одним INSERT ... RETURNING.
+        """
+        self._lock_tree(db)
+        base_depth = self.check_placement(db, parent_id)
+
+        positions = {}
+        for position, (key, _, _) in enumerate(items):
+            if key in positions:
+                raise ValueError(f"Duplicate activity reference {key!r}")
+            positions[key] = position
+
+        children = defaultdict(list)
+        for position, (_, _, parent_key) in enumerate(items):
+            if parent_key is not None and parent_key not in positions:
+                raise ValueError(f"Unknown parent reference {parent_key!r}")
+            children[positions.get(parent_key)].append(position)
+
+        for parent_position, siblings in children.items():
+            names = [items[position][1] for position in siblings]
+            if parent_position is None:
+                self.check_sibling_names(db, parent_id, names)
+            elif len(set(names)) != len(names):
+                # У новых родителей еще нет детей в БД: достаточно проверки внутри пакета
+                raise ValueError("Activity names must be unique among siblings")
+
+        levels = []
+        level = children[None]
+        while level:
+            if base_depth + len(levels) >= MAX_ACTIVITY_LEVELS:
+                raise ValueError(f"Maximum nesting depth of {MAX_ACTIVITY_LEVELS} levels exceeded")
+            levels.append(level)
+            level = [child for position in level for child in children[position]]
+        if sum(map(len, levels)) != len(items):
+            raise ValueError("Activity references form a cycle")
+
+        ids: List[Optional[int]] = [None] * len(items)
+        for depth, level in enumerate(levels, start=base_depth):
+            new_ids = db.execute(
+                insert(Activity).returning(Activity.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": items[position][1],
+                        "parent_id": parent_id if items[position][2] is None else ids[positions[items[position][2]]],
+                        "depth": depth,
+                    }
+                    for position in level
+                ]
+            ).scalars().all()
+            for position, new_id in zip(level, new_ids):
+                ids[position] = new_id
+
+        # Новые записи еще не связаны с организациями: достаточно события для кэшей
+        for new_id in ids:
+            self.publish(db, "upsert", new_id)
+        db.commit()
+        return ids
+
+    def get_delete_blockers(self, db: Session, activity_id: int) -> Row:
+        """Есть ли у вида деятельности потомки и связанные организации (два EXISTS в одном запросе)"""
+        return db.execute(select(
+            exists().where(Activity.parent_id == activity_id).label("has_children"),
+            exists().where(organization_activities.c.activity_id == activity_id).label("has_organizations"),
+        )).one()
+
+    def count_organizations(self, db: Session, activity_id: int) -> int:
+        """Количество организаций, напрямую связанных с видом деятельности"""
+        return db.execute(
+            select(func.count())
+            .select_from(organization_activities)
+            .where(organization_activities.c.activity_id == activity_id)
+        ).scalar_one()
+
+    def _closure(self, activity_id: Optional[int] = None):
+        """Рекурсивный CTE пар (предок, потомок), включая пары (x, x)"""
+        base = select(Activity.id.label("ancestor_id"), Activity.id.label("descendant_id"))
+        if activity_id is not None:
+            base = base.where(Activity.id == activity_id)
+        closure = base.cte("activity_closure", recursive=True)
+
+        child = aliased(Activity)
+        return closure.union_all(
+            select(closure.c.ancestor_id, child.id).where(child.parent_id == closure.c.descendant_id)
+        )
+
+    def get_stats(self, db: Session, activity_id: Optional[int] = None) -> List[Row]:
+        """
+        Статистика по видам деятельности одним агрегирующим запросом:
+        прямые и по поддереву количества организаций и зданий, глубина в дереве
+        """
+        closure = self._closure(activity_id)
+        is_direct = closure.c.descendant_id == closure.c.ancestor_id
+
+        counts = (
+            select(
+                closure.c.ancestor_id.label("id"),
+                func.count(distinct(case((is_direct, organization_activities.c.organization_id))))
+                .label("organizations_count"),
+                func.count(distinct(organization_activities.c.organization_id))
+                .label("subtree_organizations_count"),
+                func.count(distinct(case((is_direct, Organization.building_id))))
+                .label("buildings_count"),
+                func.count(distinct(Organization.building_id))
+                .label("subtree_buildings_count"),
+            )
+            .select_from(closure)
+            .outerjoin(organization_activities, organization_activities.c.activity_id == closure.c.descendant_id)
+            .outerjoin(Organization, Organization.id == organization_activities.c.organization_id)
+            .group_by(closure.c.ancestor_id)
+            .subquery()
+        )
+
+        return db.execute(
+            select(
+                Activity.id,
+                Activity.name,
+                Activity.parent_id,
+                Activity.depth,
+                counts.c.organizations_count,
+                counts.c.subtree_organizations_count,
+                counts.c.buildings_count,
+                counts.c.subtree_buildings_count,
+            )
+            .join(counts, counts.c.id == Activity.id)
+            .order_by(Activity.id)
+        ).all()
 
 
 activity = CRUDActivity(Activity)
\ No newline at end of file
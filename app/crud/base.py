@@ -1,7 +1,9 @@
 from typing import Any, Generic, List, Optional, Type, TypeVar
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, lambda_stmt, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from app.core import events
 from app.models.base import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -12,36 +14,60 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        self.entity = model.__tablename__
+
+    def event_data(self, db_obj: ModelType) -> Optional[dict]:
+        """Данные, передаваемые в событии изменения (достаточные для обновления кэшей)"""
+        return None
+
+    def publish(self, db: Session, action: str, id: int, db_obj: Optional[ModelType] = None):
+        data = self.event_data(db_obj) if action == "upsert" and db_obj is not None else None
+        events.publish(db, self.entity, action, id, data)
+
+    def on_change(self, db: Session, action: str, id: int, db_obj: Optional[ModelType] = None):
+        """Вызывается в транзакции записи до коммита"""
+        self.publish(db, action, id, db_obj)
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+        # Session.get сначала смотрит identity map и использует закэшированный запрос по первичному ключу
+        return db.get(self.model, id)
 
     def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        model = self.model
+        return db.execute(
+            lambda_stmt(lambda: select(model).order_by(model.id)) + (lambda s: s.offset(skip).limit(limit))
+        ).scalars().all()
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
+        db.flush()
+        self.on_change(db, "upsert", db_obj.id, db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
     def update(self, db: Session, *, db_obj: ModelType, obj_in: UpdateSchemaType) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        columns = self.model.__table__.columns.keys()
         update_data = obj_in.model_dump(exclude_unset=True)
 
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        for field, value in update_data.items():
+            if field in columns:
+                setattr(db_obj, field, value)
 
         db.add(db_obj)
+        self.on_change(db, "upsert", db_obj.id, db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
-    def remove(self, db: Session, *, id: int) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
+    def remove(self, db: Session, *, id: int) -> Optional[int]:
+        """Удалить запись одним DELETE ... RETURNING; возвращает id или None, если записи не было"""
+        deleted_id = db.execute(
+            delete(self.model).where(self.model.id == id).returning(self.model.id)
+        ).scalar_one_or_none()
+        if deleted_id is not None:
+            self.on_change(db, "delete", deleted_id)
         db.commit()
-        return obj
\ No newline at end of file
+        return deleted_id
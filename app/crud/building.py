@@ -1,52 +1,267 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import (
+    ColumnElement, Float, Integer, Row, String, and_, bindparam, cast, column, func, lambda_stmt, or_, select, update,
+    values
+)
 from sqlalchemy.orm import Session
-from math import radians, cos, sin, sqrt, atan2
+from app.core.config import settings
+from app.core import events, geohash, postgis
+from app.core.geo_index import coordinate_store, haversine, nearest, radius_bounds, split_longitudes
 from app.models.building import Building
-from app.schemas.building import BuildingCreate, BuildingUpdate
+from app.schemas.building import (
+    BuildingCreate, BuildingUpdate, BuildingBatchItem, BuildingBatchItemResult, BuildingBatchResult
+)
 from app.crud.base import CRUDBase
 
 
 class CRUDBuilding(CRUDBase[Building, BuildingCreate, BuildingUpdate]):
+    # Колонки BuildingSimple: списки и геопоиск читают только их
+    columns = (Building.id, Building.address, Building.latitude, Building.longitude)
+
+    # Горячие запросы собираются через lambda_stmt: построение select() и ключ кэша компиляции
+    # вычисляются один раз на место вызова, при повторных вызовах меняются только параметры
+
     def get_by_address(self, db: Session, address: str) -> Building:
-        return db.query(Building).filter(Building.address == address).first()
+        return db.execute(
+            lambda_stmt(lambda: select(Building)) + (lambda s: s.where(Building.address == address))
+        ).scalars().first()
 
-    def get_in_radius(
-            self, db: Session, *, lat: float, lon: float, radius_m: float
-    ) -> List[Tuple[Building, float]]:
+    def get_multi_rows(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[Row]:
+        columns = self.columns
+        return db.execute(
+            lambda_stmt(lambda: select(*columns).order_by(Building.id)) + (lambda s: s.offset(skip).limit(limit))
+        ).all()
+
+    def get_many(self, db: Session, ids: List[int]) -> Dict[int, Row]:
+        """Получить строки зданий (id, address, latitude, longitude) по списку ID одним запросом"""
+        if not ids:
+            return {}
+        columns = self.columns
+        return {
+            row.id: row
+            for row in db.execute(lambda_stmt(lambda: select(*columns)) + (lambda s: s.where(Building.id.in_(ids))))
+        }
+
+    def event_data(self, db_obj: Building) -> dict:
+        return {"latitude": db_obj.latitude, "longitude": db_obj.longitude}
+
+    def update_many(
+            self, db: Session, items: List[BuildingBatchItem], chunk_size: int = 1000
+    ) -> BuildingBatchResult:
         """
-        Получить здания в радиусе с расчетом расстояния
-        Используем формулу гаверсинуса
+        Пакетное частичное обновление адресов и координат.
+        Каждая пачка применяется одним UPDATE ... FROM (VALUES ...) на PostgreSQL
+        (на других СУБД - одним executemany); результат сообщается по каждой строке.
         """
-        buildings_with_distance = []
+        results: Dict[int, BuildingBatchItemResult] = {}
+        rows = {}
+        for item in items:
+            try:
+                data = BuildingUpdate(**item.model_dump(exclude={"id"}, exclude_unset=True))
+            except ValidationError as exc:
+                results[item.id] = BuildingBatchItemResult(
+                    id=item.id, status="invalid", detail="; ".join(e["msg"] for e in exc.errors())
+                )
+                continue
+            if item.id in rows or item.id in results:
+                results[item.id] = BuildingBatchItemResult(id=item.id, status="invalid", detail="Duplicate id in batch")
+                rows.pop(item.id, None)
+                continue
+            if not data.model_fields_set:
+                results[item.id] = BuildingBatchItemResult(id=item.id, status="invalid", detail="No fields to update")
+                continue
+            rows[item.id] = {
+                "id": item.id, "address": data.address, "latitude": data.latitude, "longitude": data.longitude
+            }
 
-        for building in db.query(Building).all():
-            R = 6371000
+        pending = list(rows.values())
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            updated = self._update_chunk(db, chunk)
+            moved = {r["id"] for r in chunk if r["latitude"] is not None or r["longitude"] is not None}
+            self._update_geohashes(db, [row for row in updated if row.id in moved])
+            for row in updated:
+                results[row.id] = BuildingBatchItemResult(id=row.id, status="updated")
+            if updated:
+                # Одно событие на пачку: индекс координат применяет ее одной пересборкой массивов
+                events.publish(db, self.entity, "bulk_upsert", data={
+                    "rows": [[row.id, row.latitude, row.longitude] for row in updated]
+                })
+        db.commit()
 
-            lat1 = radians(lat)
-            lon1 = radians(lon)
-            lat2 = radians(building.latitude)
-            lon2 = radians(building.longitude)
+        ordered = [
+            results.get(item_id) or BuildingBatchItemResult(id=item_id, status="not_found")
+            for item_id in dict.fromkeys(item.id for item in items)
+        ]
+        return BuildingBatchResult(
+            updated=sum(r.status == "updated" for r in ordered),
+            not_found=sum(r.status == "not_found" for r in ordered),
+            invalid=sum(r.status == "invalid" for r in ordered),
+            results=ordered
+        )
 
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
+    def _update_chunk(self, db: Session, rows: List[dict]) -> List[Row]:
+        """Обновить пачку строк; возвращает (id, latitude, longitude) обновленных зданий"""
+        returning = (Building.id, Building.latitude, Building.longitude)
 
-            a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            distance = R * c
+        if db.get_bind().dialect.name == "postgresql":
+            data = values(
+                column("id", Integer), column("address", String),
+                column("latitude", Float), column("longitude", Float),
+                name="v"
+            ).data([(r["id"], r["address"], r["latitude"], r["longitude"]) for r in rows])
+            return db.execute(
+                update(Building)
+                .where(Building.id == data.c.id)
+                .values(
+                    address=func.coalesce(cast(data.c.address, String), Building.address),
+                    latitude=func.coalesce(cast(data.c.latitude, Float), Building.latitude),
+                    longitude=func.coalesce(cast(data.c.longitude, Float), Building.longitude),
+                )
+                .returning(*returning),
+                execution_options={"synchronize_session": False}
+            ).all()
+
+        ids = [r["id"] for r in rows]
+        db.connection().execute(
+            update(Building.__table__)
+            .where(Building.id == bindparam("b_id"))
+            .values(
+                address=func.coalesce(bindparam("b_address", type_=String), Building.address),
+                latitude=func.coalesce(bindparam("b_latitude", type_=Float), Building.latitude),
+                longitude=func.coalesce(bindparam("b_longitude", type_=Float), Building.longitude),
+            ),
+            [{"b_" + key: value for key, value in r.items()} for r in rows]
+        )
+        return db.execute(select(*returning).where(Building.id.in_(ids))).all()
+
+    def _update_geohashes(self, db: Session, rows: List[Row]):
+        """
+        Пересчитать geohash зданий с измененными координатами одним executemany.
+        Считается по итоговым координатам из RETURNING: в пакете может прийти только одна из них
+        """
+        if not rows:
+            return
+        db.connection().execute(
+            update(Building.__table__).where(Building.id == bindparam("b_id")).values(geohash=bindparam("b_geohash")),
+            [{"b_id": row.id, "b_geohash": geohash.encode(row.latitude, row.longitude)} for row in rows]
+        )
+
+    def get_in_radius(
+            self, db: Session, *, lat: float, lon: float, radius_m: float, limit: Optional[int] = None
+    ) -> List[Tuple[Row, float]]:
+        """
+        Получить здания в радиусе с расчетом расстояния, ближайшие первыми (не более limit)
+        Кандидаты отбираются по индексу координат в памяти, из БД читаются только найденные здания
+        """
+        if not settings.GEO_INDEX_ENABLED:
+            return self._get_in_radius_from_db(db, lat=lat, lon=lon, radius_m=radius_m, limit=limit)
 
+        coordinate_store.ensure_loaded(db)
+        matches = coordinate_store.in_radius(lat=lat, lon=lon, radius_m=radius_m, limit=limit)
+        buildings = self.get_many(db, [building_id for building_id, _ in matches])
+        return [
+            (buildings[building_id], distance)
+            for building_id, distance in matches
+            if building_id in buildings
+        ]
+
+    def _get_in_radius_from_db(
+            self, db: Session, *, lat: float, lon: float, radius_m: float, limit: Optional[int]
+    ) -> List[Tuple[Row, float]]:
+        """
+        Поиск в радиусе средствами БД. С PostGIS - ST_DWithin по GiST-индексу, сортировка и limit в SQL;
+        без него - ограничивающий прямоугольник по диапазонам geohash и haversine по кандидатам
+        """
+        if postgis.is_available(db):
+            distance = postgis.distance(lat, lon).label("distance")
+            rows = db.execute(
+                select(*self.columns, distance)
+                .where(postgis.within(lat, lon, radius_m))
+                .order_by(distance, Building.id)
+                .limit(limit)
+            ).all()
+            return [(row, row.distance) for row in rows]
+
+        min_lat, max_lat, min_lon, max_lon = radius_bounds(lat, lon, radius_m)
+        candidates = db.execute(select(*self.columns).where(
+            self._area_condition(db, min_lat, max_lat, split_longitudes(min_lon, max_lon))
+        ))
+        buildings_with_distance = []
+        for building in candidates:
+            distance = haversine(lat, lon, building.latitude, building.longitude)
             if distance <= radius_m:
                 buildings_with_distance.append((building, distance))
-
-        return buildings_with_distance
+        return nearest(buildings_with_distance, limit)
 
     def get_in_rectangle(
+            self, db: Session, *, min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+            limit: Optional[int] = None
+    ) -> List[Row]:
+        """Получить здания в прямоугольной области (не более limit)"""
+        if not settings.GEO_INDEX_ENABLED:
+            stmt = select(*self.columns).where(self._area_condition(db, min_lat, max_lat, [(min_lon, max_lon)]))
+            if limit is not None:
+                stmt = stmt.order_by(Building.id).limit(limit)
+            return db.execute(stmt).all()
+
+        coordinate_store.ensure_loaded(db)
+        # Индекс отдает здания в порядке кривой Мортона; limit отбирает первые по id, как запрос в БД
+        ids = sorted(coordinate_store.in_rectangle(
+            min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon
+        ))[:limit]
+        buildings = self.get_many(db, ids)
+        return [buildings[building_id] for building_id in ids if building_id in buildings]
+
+    def get_distances_in_radius(self, db: Session, *, lat: float, lon: float, radius_m: float) -> Dict[int, float]:
+        """Расстояния до зданий в радиусе по их ID; с индексом координат строки зданий из БД не читаются"""
+        if not settings.GEO_INDEX_ENABLED:
+            return {
+                building.id: distance
+                for building, distance in self.get_in_radius(db, lat=lat, lon=lon, radius_m=radius_m)
+            }
+
+        coordinate_store.ensure_loaded(db)
+        return dict(coordinate_store.in_radius(lat=lat, lon=lon, radius_m=radius_m))
+
+    def get_ids_in_rectangle(
             self, db: Session, *, min_lat: float, max_lat: float, min_lon: float, max_lon: float
-    ) -> List[Building]:
-        """Получить здания в прямоугольной области"""
-        return db.query(Building).filter(
-            Building.latitude.between(min_lat, max_lat),
-            Building.longitude.between(min_lon, max_lon)
-        ).all()
+    ) -> List[int]:
+        """ID зданий в прямоугольной области; с индексом координат строки зданий из БД не читаются"""
+        if not settings.GEO_INDEX_ENABLED:
+            return db.execute(
+                select(Building.id).where(self._area_condition(db, min_lat, max_lat, [(min_lon, max_lon)]))
+            ).scalars().all()
+
+        coordinate_store.ensure_loaded(db)
+        return coordinate_store.in_rectangle(min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+
+    @staticmethod
+    def _area_condition(
+            db: Session, min_lat: float, max_lat: float, lon_ranges: List[Tuple[float, float]]
+    ) -> ColumnElement:
+        """
+        Условие попадания в прямоугольники (по одному на диапазон долгот).
+        Индексная часть - && по GiST-индексу geog (PostGIS) или диапазоны префиксов geohash
+        по ix_buildings_geohash; точная граница всегда проверяется по координатам
+        """
+        conditions = []
+        for lon_from, lon_to in lon_ranges:
+            bounds = [Building.latitude.between(min_lat, max_lat), Building.longitude.between(lon_from, lon_to)]
+            if postgis.is_available(db):
+                bounds.insert(0, postgis.intersects_envelope(min_lat, max_lat, lon_from, lon_to))
+            else:
+                ranges = geohash.cover(min_lat, max_lat, lon_from, lon_to)
+                # Без покрытия условие по geohash не добавляется: оно отбросило бы здания без geohash
+                if ranges is not None:
+                    bounds.insert(0, or_(*(
+                        Building.geohash >= start if end is None
+                        else and_(Building.geohash >= start, Building.geohash < end)
+                        for start, end in ranges
+                    )))
+            conditions.append(and_(*bounds))
+        return or_(*conditions)
 
 
-building = CRUDBuilding(Building)
\ No newline at end of file
+building = CRUDBuilding(Building)
@@ -1,68 +1,311 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
-from app.models.organization import Organization
+import heapq
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, lambda_stmt, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core.phones import normalize_phone
+from app.models.organization import Organization, organization_activities
 from app.models.phone_number import PhoneNumber
 from app.models.activity import Activity
 from app.schemas.organization import OrganizationCreate, OrganizationUpdate
 from app.crud.base import CRUDBase
+from app.crud.organization_document import organization_document
 
 
 class CRUDOrganization(CRUDBase[Organization, OrganizationCreate, OrganizationUpdate]):
+    def on_change(self, db: Session, action: str, id: int, db_obj: Optional[Organization] = None):
+        if action == "upsert":
+            organization_document.refresh(db, [id])
+        super().on_change(db, action, id, db_obj)
+
+    @staticmethod
+    def _details_stmt():
+        """
+        Организации со зданием, телефонами и видами деятельности.
+        Коллекции грузятся selectinload: без декартова произведения строк телефонов и видов деятельности
+        """
+        return lambda_stmt(lambda: select(Organization).options(
+            joinedload(Organization.building),
+            selectinload(Organization.phone_numbers),
+            selectinload(Organization.activities)
+        ))
+
     def get_multi_with_details(
             self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[Organization]:
-        return db.query(Organization).options(
-            joinedload(Organization.building),
-            joinedload(Organization.phone_numbers),
-            joinedload(Organization.activities)
-        ).offset(skip).limit(limit).all()
+        return db.execute(
+            self._details_stmt() + (lambda s: s.order_by(Organization.id).offset(skip).limit(limit))
+        ).scalars().all()
+
+    def get_ids(
+            self,
+            db: Session,
+            *,
+            skip: int = 0,
+            limit: Optional[int] = 100,
+            activity_ids: Optional[Iterable[int]] = None,
+            name: Optional[str] = None,
+            building_ids: Optional[Iterable[int]] = None
+    ) -> List[int]:
+        """Страница ID организаций по фильтрам; строки организаций не загружаются"""
+        stmt = select(Organization.id)
+        if activity_ids is not None:
+            stmt = stmt.where(Organization.id.in_(
+                select(organization_activities.c.organization_id)
+                .where(organization_activities.c.activity_id.in_(list(activity_ids)))
+            ))
+        if name is not None:
+            stmt = stmt.where(Organization.name.ilike(f"%{name}%"))
+        if building_ids is not None:
+            stmt = stmt.where(Organization.building_id.in_(list(building_ids)))
+        return db.execute(stmt.order_by(Organization.id).offset(skip).limit(limit)).scalars().all()
+
+    def get_ids_by_distance(
+            self, db: Session, building_distances: Dict[int, float], *, skip: int = 0, limit: int = 100
+    ) -> List[Tuple[int, float]]:
+        """
+        Страница (id, расстояние) организаций в найденных зданиях, ближайшие первыми.
+        Из БД читаются только пары id/building_id; страница отбирается кучей размера skip + limit
+        """
+        if not building_distances:
+            return []
+        rows = db.execute(
+            select(Organization.id, Organization.building_id)
+            .where(Organization.building_id.in_(list(building_distances)))
+        ).all()
+        page = heapq.nsmallest(skip + limit, rows, key=lambda row: (building_distances[row.building_id], row.id))
+        return [(row.id, building_distances[row.building_id]) for row in page[skip:]]
+
+    def count_by_building(self, db: Session, building_ids: List[int]) -> Dict[int, int]:
+        """Количество организаций по зданиям одним агрегирующим запросом; здания без организаций - 0"""
+        counts = dict.fromkeys(building_ids, 0)
+        if building_ids:
+            counts.update(db.execute(
+                select(Organization.building_id, func.count())
+                .where(Organization.building_id.in_(building_ids))
+                .group_by(Organization.building_id)
+            ).all())
+        return counts
+
+    def get_payloads(self, db: Session, organization_ids: List[int]) -> List[dict]:
+        """
+        Собрать ответы OrganizationSimple из плоских строк тремя запросами,
+        без построения ORM-графа и декартова произведения телефонов и видов деятельности
+        """
+        payloads = organization_document.build_payloads(db, organization_ids)
+        return [payloads[org_id] for org_id in organization_ids if org_id in payloads]
 
     def get_with_details(self, db: Session, id: int) -> Optional[Organization]:
-        return db.query(Organization).options(
-            joinedload(Organization.building),
-            joinedload(Organization.phone_numbers),
-            joinedload(Organization.activities)
-        ).filter(Organization.id == id).first()
+        return db.execute(
+            self._details_stmt() + (lambda s: s.where(Organization.id == id))
+        ).scalars().first()
 
     def get_by_building(self, db: Session, building_id: int) -> List[Organization]:
-        return db.query(Organization).options(
-            joinedload(Organization.building),
-            joinedload(Organization.phone_numbers),
-            joinedload(Organization.activities)
-        ).filter(Organization.building_id == building_id).all()
+        return db.execute(
+            self._details_stmt() + (lambda s: s.where(Organization.building_id == building_id))
+        ).scalars().all()
 
     def get_by_activity(self, db: Session, activity_id: int) -> List[Organization]:
-        return db.query(Organization).options(
-            joinedload(Organization.building),
-            joinedload(Organization.phone_numbers),
-            joinedload(Organization.activities)
-        ).filter(Organization.activities.any(id=activity_id)).all()
+        return db.execute(
+            self._details_stmt() + (lambda s: s.where(Organization.activities.any(Activity.id == activity_id)))
+        ).scalars().all()
 
     def search_by_name(self, db: Session, name: str) -> List[Organization]:
-        return db.query(Organization).options(
-            joinedload(Organization.building),
-            joinedload(Organization.phone_numbers)
-        ).filter(Organization.name.ilike(f"%{name}%")).all()
+        pattern = f"%{name}%"
+        return db.execute(
+            self._details_stmt() + (lambda s: s.where(Organization.name.ilike(pattern)))
+        ).scalars().all()
+
+    def get_id_by_phone(self, db: Session, normalized: str) -> Optional[int]:
+        """ID организации по нормализованному номеру (одно обращение к уникальному индексу)"""
+        return db.execute(
+            lambda_stmt(lambda: select(PhoneNumber.organization_id))
+            + (lambda s: s.where(PhoneNumber.normalized == normalized))
+        ).scalar()
+
+    def check_phones(self, db: Session, numbers: List[str], organization_id: Optional[int] = None):
+        """Номера не должны совпадать между собой и с номерами других организаций; иначе ValueError"""
+        normalized = [phone for phone in map(normalize_phone, numbers) if phone is not None]
+        if len(set(normalized)) != len(normalized):
+            raise ValueError("Duplicate phone numbers")
+        if not normalized:
+            return
+        stmt = select(PhoneNumber.number).where(PhoneNumber.normalized.in_(normalized))
+        if organization_id is not None:
+            stmt = stmt.where(PhoneNumber.organization_id != organization_id)
+        taken = db.execute(stmt.limit(1)).scalar()
+        if taken is not None:
+            raise ValueError(f"Phone number {taken} belongs to another organization")
+
+    @contextmanager
+    def _phone_conflicts(self, db: Session):
+        """
+        Откатить транзакцию при конфликте номеров и сообщить о нем ValueError.
+        check_phones не защищает от гонки: номер, записанный параллельной транзакцией
+        после проверки, отклоняет уникальный индекс normalized
+        """
+        try:
+            yield
+        except ValueError:
+            db.rollback()
+            raise
+        except IntegrityError as exc:
+            if "normalized" not in str(exc.orig):
+                raise
+            db.rollback()
+            raise ValueError("Phone number belongs to another organization") from exc
 
     def create_with_phones_and_activities(
             self, db: Session, *, obj_in: OrganizationCreate
     ) -> Organization:
-        org_data = obj_in.model_dump(exclude={"phone_numbers", "activity_ids"})
-        db_obj = Organization(**org_data)
-        db.add(db_obj)
-        db.flush()
+        with self._phone_conflicts(db):
+            self.check_phones(db, [phone.number for phone in obj_in.phone_numbers])
+            org_data = obj_in.model_dump(exclude={"phone_numbers", "activity_ids"})
+            db_obj = Organization(**org_data)
+            db.add(db_obj)
+            db.flush()
 
-        for phone_data in obj_in.phone_numbers:
-            phone = PhoneNumber(**phone_data.model_dump(), organization_id=db_obj.id)
-            db.add(phone)
+            for phone_data in obj_in.phone_numbers:
+                phone = PhoneNumber(**phone_data.model_dump(), organization_id=db_obj.id)
+                db.add(phone)
 
-        if obj_in.activity_ids:
-            activities = db.query(Activity).filter(Activity.id.in_(obj_in.activity_ids)).all()
-            db_obj.activities.extend(activities)
+            if obj_in.activity_ids:
+                activities = db.execute(select(Activity).where(Activity.id.in_(obj_in.activity_ids))).scalars().all()
+                db_obj.activities.extend(activities)
 
-        db.commit()
+            self.on_change(db, "upsert", db_obj.id, db_obj)
+            db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def update_with_relations(
+            self, db: Session, *, id: int, obj_in: OrganizationUpdate
+    ) -> Optional[dict]:
+        """
+        Обновить организацию вместе с телефонами и видами деятельности.
+        Скалярные поля обновляются одним UPDATE ... RETURNING, для коллекций применяется
+        только разница с текущим состоянием. Возвращает готовый ответ OrganizationDetail
+        или None, если организации нет.
+        """
+        update_data = obj_in.model_dump(exclude_unset=True, exclude={"phone_numbers", "activity_ids"})
+        update_data = {field: value for field, value in update_data.items() if value is not None}
+
+        columns = (Organization.id, Organization.name, Organization.building_id)
+        if update_data:
+            row = db.execute(
+                update(Organization).where(Organization.id == id).values(**update_data).returning(*columns)
+            ).one_or_none()
+        else:
+            row = db.execute(select(*columns).where(Organization.id == id)).one_or_none()
+        if row is None:
+            db.rollback()
+            return None
+
+        if obj_in.phone_numbers is not None:
+            # Номера проверяются после поиска организации: для отсутствующей - 404, а не конфликт
+            numbers = [phone.number for phone in obj_in.phone_numbers]
+            with self._phone_conflicts(db):
+                self.check_phones(db, numbers, organization_id=id)
+                phone_numbers = self._sync_phones(db, id, numbers)
+        else:
+            phone_numbers = db.execute(
+                select(PhoneNumber.id, PhoneNumber.number).where(PhoneNumber.organization_id == id)
+            ).all()
+
+        if obj_in.activity_ids is not None:
+            activities = self._sync_activities(db, id, obj_in.activity_ids)
+        else:
+            activities = db.execute(
+                select(Activity.id, Activity.name)
+                .join(organization_activities, organization_activities.c.activity_id == Activity.id)
+                .where(organization_activities.c.organization_id == id)
+            ).all()
+
+        payload = {
+            "name": row.name,
+            "building_id": row.building_id,
+            "id": row.id,
+            "phone_numbers": [{"number": p.number, "id": p.id} for p in sorted(phone_numbers, key=lambda p: p.id)],
+            "activities": [{"id": a.id, "name": a.name} for a in sorted(activities, key=lambda a: a.id)],
+        }
+        organization_document.put(db, {id: payload})
+        self.publish(db, "upsert", id)
+        db.commit()
+        return payload
+
+    def _sync_phones(self, db: Session, organization_id: int, numbers: List[str]) -> list:
+        """Привести телефоны к списку numbers: удаляются и вставляются только отличающиеся номера"""
+        wanted = list(numbers)
+        kept, obsolete = [], []
+        for phone in db.execute(
+                select(PhoneNumber.id, PhoneNumber.number).where(PhoneNumber.organization_id == organization_id)
+        ):
+            if phone.number in wanted:
+                wanted.remove(phone.number)
+                kept.append(phone)
+            else:
+                obsolete.append(phone.id)
+
+        if obsolete:
+            db.execute(delete(PhoneNumber).where(PhoneNumber.id.in_(obsolete)))
+        if wanted:
+            kept.extend(db.execute(
+                insert(PhoneNumber).returning(PhoneNumber.id, PhoneNumber.number, sort_by_parameter_order=True),
+                [
+                    {"number": number, "normalized": normalize_phone(number), "organization_id": organization_id}
+                    for number in wanted
+                ]
+            ).all())
+        return kept
+
+    def _sync_activities(self, db: Session, organization_id: int, activity_ids: List[int]) -> list:
+        """Привести связи с видами деятельности к activity_ids (несуществующие id пропускаются)"""
+        activities = db.execute(
+            select(Activity.id, Activity.name).where(Activity.id.in_(set(activity_ids)))
+        ).all()
+        wanted = {activity.id for activity in activities}
+        current = set(db.execute(
+            select(organization_activities.c.activity_id)
+            .where(organization_activities.c.organization_id == organization_id)
+        ).scalars())
+
+        if current - wanted:
+            db.execute(delete(organization_activities).where(
+                organization_activities.c.organization_id == organization_id,
+                organization_activities.c.activity_id.in_(current - wanted)
+            ))
+        if wanted - current:
+            db.execute(
+                insert(organization_activities),
+                [{"organization_id": organization_id, "activity_id": activity_id} for activity_id in wanted - current]
+            )
+        return activities
+
+    def remove_many(self, db: Session, ids: Iterable[int], chunk_size: int = 1000) -> List[int]:
+        """
+        Удалить организации вместе с телефонами, связями с видами деятельности и документами.
+        Каждая сущность удаляется одним DELETE на пачку id; возвращает id удаленных организаций.
+        """
+        ids = list(dict.fromkeys(ids))
+        deleted = []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            db.execute(delete(PhoneNumber).where(PhoneNumber.organization_id.in_(chunk)))
+            db.execute(delete(organization_activities).where(organization_activities.c.organization_id.in_(chunk)))
+            organization_document.remove(db, chunk)
+            deleted.extend(db.execute(
+                delete(Organization).where(Organization.id.in_(chunk)).returning(Organization.id)
+            ).scalars())
+
+        for organization_id in deleted:
+            self.on_change(db, "delete", organization_id)
+        db.commit()
+        return deleted
+
+    def remove(self, db: Session, *, id: int) -> Optional[int]:
+        deleted = self.remove_many(db, [id])
+        return deleted[0] if deleted else None
+
 
 organization = CRUDOrganization(Organization)
\ No newline at end of file
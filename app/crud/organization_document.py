@@ -0,0 +1,147 @@
+import json
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.activity import Activity
+from app.models.organization import Organization, organization_activities
+from app.models.organization_document import OrganizationDocument
+from app.models.phone_number import PhoneNumber
+
+
+class CRUDOrganizationDocument:
+    """
+    Материализованная модель чтения организаций.
+    Документы обновляются в той же транзакции, что и исходные данные,
+    а при отсутствии документа он строится при первом чтении.
+    """
+
+    def build_payloads(self, db: Session, organization_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Ответы OrganizationDetail по id из плоских строк тремя запросами.
+        Порядок ключей - как у полей схемы, телефоны и виды деятельности - по id:
+        документы и ответы списков собираются одинаково на любой СУБД
+        """
+        organization_ids = list(organization_ids)
+        if not organization_ids:
+            return {}
+
+        payloads = {
+            org_id: {"name": name, "building_id": building_id, "id": org_id, "phone_numbers": [], "activities": []}
+            for org_id, name, building_id in db.execute(
+                select(Organization.id, Organization.name, Organization.building_id)
+                .where(Organization.id.in_(organization_ids))
+            )
+        }
+
+        for phone_id, number, org_id in db.execute(
+                select(PhoneNumber.id, PhoneNumber.number, PhoneNumber.organization_id)
+                .where(PhoneNumber.organization_id.in_(organization_ids))
+                .order_by(PhoneNumber.id)
+        ):
+            payloads[org_id]["phone_numbers"].append({"number": number, "id": phone_id})
+
+        for org_id, activity_id, activity_name in db.execute(
+                select(organization_activities.c.organization_id, Activity.id, Activity.name)
+                .join(Activity, Activity.id == organization_activities.c.activity_id)
+                .where(organization_activities.c.organization_id.in_(organization_ids))
+                .order_by(Activity.id)
+        ):
+            payloads[org_id]["activities"].append({"id": activity_id, "name": activity_name})
+
+        return payloads
+
+    def render_payload(self, payload: dict) -> str:
+        """JSON уже собранного ответа OrganizationDetail (без повторной валидации)"""
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+    def _insert(self, db: Session):
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(OrganizationDocument)
+        if dialect == "sqlite":
+            return sqlite.insert(OrganizationDocument)
+        return None
+
+    def _store(self, db: Session, bodies: Dict[int, str], overwrite: bool):
+        if not bodies:
+            return
+        rows = [{"organization_id": org_id, "body": body} for org_id, body in bodies.items()]
+        stmt = self._insert(db)
+        if stmt is None:
+            # Диалект без upsert: удаляем и вставляем заново
+            db.execute(delete(OrganizationDocument).where(OrganizationDocument.organization_id.in_(bodies)))
+            db.execute(OrganizationDocument.__table__.insert(), rows)
+        elif overwrite:
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[OrganizationDocument.organization_id],
+                    set_={"body": stmt.excluded.body}
+                ),
+                rows
+            )
+        else:
+            db.execute(stmt.on_conflict_do_nothing(index_elements=[OrganizationDocument.organization_id]), rows)
+
+    def _build(self, db: Session, organization_ids: Iterable[int]) -> Dict[int, str]:
+        return {
+            org_id: self.render_payload(payload)
+            for org_id, payload in self.build_payloads(db, organization_ids).items()
+        }
+
+    def put(self, db: Session, payloads: Dict[int, dict]):
+        """Записать документы из уже собранных ответов"""
+        self._store(db, {org_id: self.render_payload(payload) for org_id, payload in payloads.items()}, overwrite=True)
+
+    def refresh(self, db: Session, organization_ids: Iterable[int]):
+        """Перестроить документы организаций (вызывается до коммита транзакции записи)"""
+        organization_ids = set(organization_ids)
+        if not organization_ids:
+            return
+        db.flush()
+        bodies = self._build(db, organization_ids)
+        self._store(db, bodies, overwrite=True)
+
+        missing = organization_ids - bodies.keys()
+        if missing:
+            self.remove(db, missing)
+
+    def refresh_for_activity(self, db: Session, activity_id: int):
+        """Перестроить документы организаций, связанных с видом деятельности"""
+        organization_ids = db.execute(
+            select(organization_activities.c.organization_id)
+            .where(organization_activities.c.activity_id == activity_id)
+        ).scalars().all()
+        self.refresh(db, organization_ids)
+
+    def remove(self, db: Session, organization_ids: Iterable[int]):
+        db.execute(
+            delete(OrganizationDocument)
+            .where(OrganizationDocument.organization_id.in_(list(organization_ids)))
+        )
+
+    def get_bodies(self, db: Session, organization_ids: List[int]) -> Dict[int, str]:
+        """Готовые JSON-документы организаций; недостающие строятся и сохраняются"""
+        if not organization_ids:
+            return {}
+        bodies = dict(db.execute(
+            select(OrganizationDocument.organization_id, OrganizationDocument.body)
+            .where(OrganizationDocument.organization_id.in_(organization_ids))
+        ).all())
+
+        missing = set(organization_ids) - bodies.keys()
+        if missing:
+            built = self._build(db, missing)
+            # Чтение не коммитит сессию запроса (это завершило бы ее транзакцию посреди запроса):
+            # документы сохраняются отдельной короткой транзакцией, конфликт с записью уступает ей
+            with Session(db.get_bind()) as writer:
+                self._store(writer, built, overwrite=False)
+                writer.commit()
+            bodies.update(built)
+        return bodies
+
+    def get_body(self, db: Session, organization_id: int) -> Optional[str]:
+        return self.get_bodies(db, [organization_id]).get(organization_id)
+
+
+organization_document = CRUDOrganizationDocument()
@@ -1,21 +1,107 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
 from app.core.config import settings
+from app.core import events
+from app.core.admission import AdmissionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.deadlines import QueryCancellationMiddleware, is_deadline_error
+from app.core.database import SessionLocal, engine
+from app.core.metrics import metrics
+from app.core.responses import json_response_class
+from app.core.single_flight import SingleFlightMiddleware
+from app.core.warmup import readiness, run_warmup
 from app.api.api import api_router
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Кэши загружаются только после LISTEN, чтобы не пропустить изменения между ними;
+    # события, пришедшие во время загрузки, индекс координат применяет после нее
+    listener = None
+    if settings.CHANGE_BUS != "local" and engine.dialect.name == "postgresql":
+        listener = events.ChangeListener(engine, settings.CHANGE_CHANNEL)
+        listener.start()
+        if not await listener.wait_listening(settings.DB_POOL_TIMEOUT):
+            logger.warning("Change listener is not connected yet, caches will be reset once it is")
+
+    # Прогрев идет в фоне: /health отвечает сразу, /ready - только после прогрева
+    warmup = None
+    if settings.WARMUP_ENABLED:
+        warmup = asyncio.create_task(asyncio.to_thread(run_warmup, app, engine, SessionLocal))
+    else:
+        readiness.mark_ready()
+    yield
+
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    if listener is not None:
+        await listener.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=json_response_class(),
+    lifespan=lifespan
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Последний добавленный middleware - внешний: одинаковые запросы объединяются до admission control,
+# и слот занимает только тот запрос, который действительно выполняется. Сжатие - внутри них,
+# чтобы кэш ответов и объединенные запросы получали уже сжатые байты
+app.add_middleware(QueryCancellationMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, min_size=settings.COMPRESSION_MIN_SIZE)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, prefix=settings.API_V1_STR)
+if settings.SINGLE_FLIGHT_ENABLED:
+    app.add_middleware(SingleFlightMiddleware, prefix=settings.API_V1_STR)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Пул соединений исчерпан дольше DB_POOL_TIMEOUT"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is overloaded"},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(OperationalError)
+async def query_deadline_handler(request: Request, exc: OperationalError):
+    """Запрос к БД прерван по statement_timeout или после отключения клиента"""
+    if not is_deadline_error(exc):
+        raise exc
+    route = request.scope.get("route")
+    metrics.inc("query_deadline_exceeded_total", route=getattr(route, "name", ""))
+    return JSONResponse(status_code=504, content={"detail": "Query deadline exceeded"})
+
 @app.get("/")
 async def root():
     return {"message": settings.PROJECT_NAME, "version": settings.VERSION}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready_check():
+    """Готовность принимать трафик: 503, пока воркер не прогрет"""
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.as_dict())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
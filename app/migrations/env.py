@@ -14,6 +14,7 @@ from app.models.base import Base
 from app.models.building import Building
 from app.models.activity import Activity
 from app.models.organization import Organization
+from app.models.organization_document import OrganizationDocument
 from app.models.phone_number import PhoneNumber
 
 # this is the Alembic Config object, which provides
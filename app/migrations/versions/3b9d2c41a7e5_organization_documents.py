@@ -0,0 +1,34 @@
+"""Organization documents read model
+
+Revision ID: 3b9d2c41a7e5
+Revises: 0f7ab719a721
+Create Date: 2026-10-19 10:12:41.208311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2c41a7e5'
+down_revision: Union[str, Sequence[str], None] = '0f7ab719a721'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_documents',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+    # Документы строятся лениво при первом чтении
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('organization_documents')
@@ -0,0 +1,40 @@
+"""Activity depth column
+
+Revision ID: 7c1e4f92d8a3
+Revises: 3b9d2c41a7e5
+Create Date: 2026-10-19 14:05:17.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4f92d8a3'
+down_revision: Union[str, Sequence[str], None] = '3b9d2c41a7e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('activities', sa.Column('depth', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_activities_parent_id'), 'activities', ['parent_id'], unique=False)
+    # Заполнение глубины существующих записей одним рекурсивным запросом
+    op.execute("""
+        WITH RECURSIVE tree (id, depth) AS (
+            SELECT id, 0 FROM activities WHERE parent_id IS NULL
+            UNION ALL
+            SELECT activities.id, tree.depth + 1
+            FROM activities JOIN tree ON activities.parent_id = tree.id
+        )
+        UPDATE activities SET depth = tree.depth FROM tree WHERE activities.id = tree.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_activities_parent_id'), table_name='activities')
+    op.drop_column('activities', 'depth')
@@ -0,0 +1,49 @@
+"""Building coordinates index and PostGIS geography column
+
+Revision ID: 9a4d2e6b1f08
+Revises: 7c1e4f92d8a3
+Create Date: 2026-10-19 15:32:08.774215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d2e6b1f08'
+down_revision: Union[str, Sequence[str], None] = '7c1e4f92d8a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _postgis_installable() -> bool:
+    bind = op.get_bind()
+    return bind.dialect.name == 'postgresql' and bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")
+    ).scalar())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_buildings_lat_lon', 'buildings', ['latitude', 'longitude'], unique=False)
+
+    # Без PostGIS геопоиск идет по индексу координат; приложение определяет режим само
+    if not _postgis_installable():
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    # Колонка вычисляется БД из latitude/longitude при любой записи, включая пакетные UPDATE
+    op.execute(
+        "ALTER TABLE buildings ADD COLUMN geog geography(Point, 4326) "
+        "GENERATED ALWAYS AS (geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))) STORED"
+    )
+    op.execute("CREATE INDEX ix_buildings_geog ON buildings USING gist (geog)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_buildings_geog")
+        op.execute("ALTER TABLE buildings DROP COLUMN IF EXISTS geog")
+    op.drop_index('ix_buildings_lat_lon', table_name='buildings')
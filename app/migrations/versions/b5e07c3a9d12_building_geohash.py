@@ -0,0 +1,65 @@
+"""Building geohash column
+
+Revision ID: b5e07c3a9d12
+Revises: 9a4d2e6b1f08
+Create Date: 2026-10-19 17:04:51.119630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core import geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e07c3a9d12'
+down_revision: Union[str, Sequence[str], None] = '9a4d2e6b1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Диапазоны префиксов сравниваются побайтово: на PostgreSQL колонка в collation "C"
+    collation = 'C' if bind.dialect.name == 'postgresql' else None
+    op.add_column('buildings', sa.Column('geohash', sa.String(geohash.PRECISION, collation=collation), nullable=True))
+
+    buildings = sa.table(
+        'buildings', sa.column('id', sa.Integer), sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float), sa.column('geohash', sa.String)
+    )
+    update = (
+        sa.update(buildings)
+        .where(buildings.c.id == sa.bindparam('b_id'))
+        .values(geohash=sa.bindparam('b_geohash'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(buildings.c.id, buildings.c.latitude, buildings.c.longitude)
+            .where(buildings.c.id > last_id)
+            .order_by(buildings.c.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {'b_id': row.id, 'b_geohash': geohash.encode(row.latitude, row.longitude)} for row in rows
+        ])
+        last_id = rows[-1].id
+
+    op.create_index(op.f('ix_buildings_geohash'), 'buildings', ['geohash'], unique=False)
+    # Диапазоны geohash заменяют индекс по координатам
+    op.drop_index('ix_buildings_lat_lon', table_name='buildings')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_buildings_lat_lon', 'buildings', ['latitude', 'longitude'], unique=False)
+    op.drop_index(op.f('ix_buildings_geohash'), table_name='buildings')
+    op.drop_column('buildings', 'geohash')
@@ -0,0 +1,79 @@
+"""Normalized phone numbers
+
+Revision ID: d3f81a5c6e27
+Revises: b5e07c3a9d12
+Create Date: 2026-10-19 18:21:36.540912
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.phones import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f81a5c6e27'
+down_revision: Union[str, Sequence[str], None] = 'b5e07c3a9d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 5000
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('phone_numbers', sa.Column('normalized', sa.String(length=15), nullable=True))
+
+    bind = op.get_bind()
+    phones = sa.table(
+        'phone_numbers', sa.column('id', sa.Integer), sa.column('number', sa.String),
+        sa.column('normalized', sa.String)
+    )
+    update = (
+        sa.update(phones)
+        .where(phones.c.id == sa.bindparam('b_id'))
+        .values(normalized=sa.bindparam('b_normalized'))
+    )
+    # Номер остается за самой ранней записью; у повторов normalized остается NULL
+    owners = {}
+    duplicates = []
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(phones.c.id, phones.c.number)
+            .where(phones.c.id > last_id)
+            .order_by(phones.c.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            normalized = normalize_phone(row.number)
+            if normalized in owners:
+                duplicates.append((row.id, owners[normalized]))
+            elif normalized is not None:
+                owners[normalized] = row.id
+                params.append({'b_id': row.id, 'b_normalized': normalized})
+        if params:
+            bind.execute(update, params)
+        last_id = rows[-1].id
+    if duplicates:
+        # Такие записи не находятся поиском по номеру: их нужно исправить или удалить вручную
+        logger.warning(
+            "%d duplicate phone numbers left without normalized value (phone id -> id of the phone keeping it): %s",
+            len(duplicates), ", ".join(f"{phone_id} -> {owner_id}" for phone_id, owner_id in duplicates)
+        )
+
+    op.create_index(op.f('ix_phone_numbers_normalized'), 'phone_numbers', ['normalized'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_phone_numbers_normalized'), table_name='phone_numbers')
+    op.drop_column('phone_numbers', 'normalized')
@@ -1,16 +1,31 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, event, select
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
+# Максимальная вложенность дерева видов деятельности: корень имеет глубину 0
+MAX_ACTIVITY_LEVELS = 3
+
 
 class Activity(Base):
     __tablename__ = "activities"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
-    parent_id = Column(Integer, ForeignKey("activities.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("activities.id"), nullable=True, index=True)
+    # Глубина в дереве; при переносе ветки пересчитывается для всего поддерева одним UPDATE
+    depth = Column(Integer, nullable=False, default=0, server_default="0")
 
     children = relationship("Activity", back_populates="parent")
     parent = relationship("Activity", back_populates="children", remote_side=[id])
 
-    organizations = relationship("Organization", secondary="organization_activities", back_populates="activities")
\ No newline at end of file
+    organizations = relationship("Organization", secondary="organization_activities", back_populates="activities")
+
+
+@event.listens_for(Activity, "before_insert")
+def _set_depth(mapper, connection, target: Activity):
+    """Глубина для записей, созданных напрямую через ORM (фикстуры, сиды)"""
+    if target.parent_id is not None and not target.depth:
+        parent_depth = connection.scalar(
+            select(Activity.__table__.c.depth).where(Activity.__table__.c.id == target.parent_id)
+        )
+        target.depth = (parent_depth or 0) + 1
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, event
 from sqlalchemy.orm import relationship
 
+from app.core import geohash
 from app.models.base import Base
 
 class Building(Base):
@@ -10,5 +11,20 @@ class Building(Base):
     address = Column(String, nullable=False, index=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # Геопоиск без PostGIS: прямоугольник раскладывается в диапазоны префиксов geohash по этому индексу.
+    # С PostGIS миграция добавляет вычисляемую колонку geog с GiST-индексом (см. app.core.postgis)
+    # Диапазоны префиксов сравниваются побайтово: на PostgreSQL колонка в collation "C", как в миграции
+    geohash = Column(
+        String(geohash.PRECISION).with_variant(String(geohash.PRECISION, collation="C"), "postgresql"),
+        nullable=True, index=True
+    )
 
-    organizations = relationship("Organization", back_populates="building")
\ No newline at end of file
+    organizations = relationship("Organization", back_populates="building")
+
+
+@event.listens_for(Building, "before_insert")
+@event.listens_for(Building, "before_update")
+def _set_geohash(mapper, connection, target: Building):
+    """Geohash пересчитывается при каждой записи координат через ORM; пакетный UPDATE считает его сам"""
+    if target.latitude is not None and target.longitude is not None:
+        target.geohash = geohash.encode(target.latitude, target.longitude)
@@ -18,5 +18,10 @@ class Organization(Base):
     building_id = Column(Integer, ForeignKey("buildings.id"), nullable=False)
 
     building = relationship("Building", back_populates="organizations")
-    phone_numbers = relationship("PhoneNumber", back_populates="organization", cascade="all, delete-orphan")
-    activities = relationship("Activity", secondary=organization_activities, back_populates="organizations")
\ No newline at end of file
+    # Коллекции упорядочены по id, как в документах модели чтения
+    phone_numbers = relationship(
+        "PhoneNumber", back_populates="organization", cascade="all, delete-orphan", order_by="PhoneNumber.id"
+    )
+    activities = relationship(
+        "Activity", secondary=organization_activities, back_populates="organizations", order_by="Activity.id"
+    )
\ No newline at end of file
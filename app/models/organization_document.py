@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey
+from app.models.base import Base
+
+
+class OrganizationDocument(Base):
+    """Денормализованное представление организации: готовый JSON ответа OrganizationDetail"""
+    __tablename__ = "organization_documents"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    body = Column(Text, nullable=False)
\ No newline at end of file
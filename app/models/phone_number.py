@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, event, inspect
 from sqlalchemy.orm import relationship
+from app.core.phones import normalize_phone
 from app.models.base import Base
 
 
@@ -8,6 +9,21 @@ class PhoneNumber(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     number = Column(String, nullable=False, index=True)
+    # Номер в E.164 (только цифры) для поиска по номеру; NULL - формат не распознан
+    normalized = Column(String(15), nullable=True, unique=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
 
-    organization = relationship("Organization", back_populates="phone_numbers")
\ No newline at end of file
+    organization = relationship("Organization", back_populates="phone_numbers")
+
+
+@event.listens_for(PhoneNumber, "before_insert")
+def _set_normalized(mapper, connection, target: PhoneNumber):
+    target.normalized = normalize_phone(target.number)
+
+
+@event.listens_for(PhoneNumber, "before_update")
+def _update_normalized(mapper, connection, target: PhoneNumber):
+    # Только при смене номера: у повторов, оставленных миграцией без normalized,
+    # пересчет при любом другом изменении нарушил бы уникальный индекс
+    if inspect(target).attrs.number.history.has_changes():
+        target.normalized = normalize_phone(target.number)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Optional, List, Union
 
 
 class ActivityBase(BaseModel):
@@ -42,6 +42,63 @@ class ActivityUpdate(BaseModel):
         return v
 
 
+class ActivityMove(BaseModel):
+    # None - сделать вид деятельности корневым
+    parent_id: Optional[int] = None
+
+    @field_validator('parent_id')
+    @classmethod
+    def validate_parent_id(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('parent_id must be positive')
+        return v
+
+
+class ActivityImportNode(BaseModel):
+    name: str
+    children: List['ActivityImportNode'] = []
+
+    @field_validator('name')
+    @classmethod
+    def validate_name(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Activity name cannot be empty')
+        return v.strip()
+
+
+class ActivityImportRow(BaseModel):
+    # id и parent_id - ссылки внутри пакета, а не id записей в БД
+    id: Union[int, str]
+    name: str
+    parent_id: Optional[Union[int, str]] = None
+
+    @field_validator('name')
+    @classmethod
+    def validate_name(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Activity name cannot be empty')
+        return v.strip()
+
+
+class ActivityImport(BaseModel):
+    # Существующий вид деятельности, под который импортируется пакет (None - новые корни)
+    parent_id: Optional[int] = None
+    tree: List[ActivityImportNode] = Field([], max_length=10000)
+    rows: List[ActivityImportRow] = Field([], max_length=100000)
+
+    @model_validator(mode='after')
+    def validate_source(self):
+        if bool(self.tree) == bool(self.rows):
+            raise ValueError('Exactly one of tree or rows must be provided')
+        return self
+
+
+class ActivityImportResult(BaseModel):
+    created: int
+    # Для tree - в порядке обхода (родитель перед потомками), для rows - в порядке строк
+    ids: List[int] = []
+
+
 class ActivityInDB(ActivityBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
@@ -64,5 +121,18 @@ class ActivityDetail(ActivitySimple):
     organizations_count: int = 0
 
 
+class ActivityStats(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    depth: int
+    organizations_count: int = 0
+    subtree_organizations_count: int = 0
+    buildings_count: int = 0
+    subtree_buildings_count: int = 0
+    model_config = ConfigDict(from_attributes=True)
+
+
+ActivityImportNode.model_rebuild()
 ActivityTree.model_rebuild()
 ActivityDetail.model_rebuild()
\ No newline at end of file
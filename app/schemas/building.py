@@ -1,20 +1,94 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, List
 from app.schemas.organization import OrganizationSimple
 
+
+def check_latitude(v):
+    if v is not None and not -90 <= v <= 90:
+        raise ValueError('latitude must be between -90 and 90')
+    return v
+
+
+def check_longitude(v):
+    if v is not None and not -180 <= v <= 180:
+        raise ValueError('longitude must be between -180 and 180')
+    return v
+
+
 class BuildingBase(BaseModel):
     address: str
     latitude: float
     longitude: float
 
 class BuildingCreate(BuildingBase):
-    pass
+    @field_validator('address')
+    @classmethod
+    def validate_address(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Address cannot be empty')
+        return v.strip()
+
+    @field_validator('latitude')
+    @classmethod
+    def validate_latitude(cls, v):
+        return check_latitude(v)
+
+    @field_validator('longitude')
+    @classmethod
+    def validate_longitude(cls, v):
+        return check_longitude(v)
 
 class BuildingUpdate(BaseModel):
     address: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
 
+    @field_validator('address', 'latitude', 'longitude')
+    @classmethod
+    def validate_not_null(cls, v, info):
+        # Колонки NOT NULL: поле можно не передавать, но нельзя обнулить
+        if v is None:
+            raise ValueError(f'{info.field_name} cannot be null')
+        return v
+
+    @field_validator('address')
+    @classmethod
+    def validate_address(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError('Address cannot be empty')
+        return v.strip() if v else v
+
+    @field_validator('latitude')
+    @classmethod
+    def validate_latitude(cls, v):
+        return check_latitude(v)
+
+    @field_validator('longitude')
+    @classmethod
+    def validate_longitude(cls, v):
+        return check_longitude(v)
+
+class BuildingBatchItem(BaseModel):
+    # Строки пакета проверяются по отдельности, чтобы ошибка в одной не отклоняла весь пакет
+    id: int
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class BuildingBatchUpdate(BaseModel):
+    items: List[BuildingBatchItem] = Field(..., min_length=1, max_length=100000)
+
+class BuildingBatchItemResult(BaseModel):
+    id: int
+    status: str  # updated | not_found | invalid
+    detail: Optional[str] = None
+
+class BuildingBatchResult(BaseModel):
+    updated: int = 0
+    not_found: int = 0
+    invalid: int = 0
+    results: List[BuildingBatchItemResult] = []
+
 class BuildingInDB(BuildingBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
@@ -25,6 +99,8 @@ class BuildingSimple(BuildingInDB):
 
 class BuildingWithDistance(BuildingSimple):
     distance: Optional[float] = None
+    # Только при include=org_count
+    organizations_count: Optional[int] = None
 
 class BuildingDetail(BuildingSimple):
     organizations: List[OrganizationSimple] = []
\ No newline at end of file
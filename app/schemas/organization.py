@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from app.schemas.activity import ActivitySimple
 
@@ -35,5 +35,16 @@ class OrganizationSimple(OrganizationInDB):
     phone_numbers: List[PhoneNumber] = []
     activities: List[ActivitySimple] = []
 
+class OrganizationWithDistance(OrganizationSimple):
+    # Расстояние до здания в метрах, только при поиске по кругу
+    distance: Optional[float] = None
+
 class OrganizationDetail(OrganizationSimple):
     activities: List[ActivitySimple] = []
+
+class OrganizationBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+class OrganizationBulkDeleteResult(BaseModel):
+    deleted: List[int] = []
+    not_found: List[int] = []
@@ -0,0 +1,40 @@
+"""
+Production-запуск: gunicorn управляет процессами, каждый воркер - uvicorn
+(uvloop и httptools, если установлены):
+
+    gunicorn -c deploy/gunicorn.conf.py app.main:app
+
+Настраивается переменными окружения (см. app/core/config.py): WEB_CONCURRENCY,
+DB_CONNECTION_BUDGET, WORKER_MAX_REQUESTS, WORKER_MAX_REQUESTS_JITTER, WORKER_GRACEFUL_TIMEOUT.
+Плавный перезапуск без потери запросов - сигнал HUP мастеру.
+"""
+import os
+
+from app.core.config import settings
+from app.core.workers import worker_count
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = worker_count()
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Приложение загружается в каждом воркере после fork: пул соединений, LISTEN-соединение
+# шины изменений и кэши в памяти у каждого процесса свои
+preload_app = False
+
+# Перезапуск воркера после max_requests запросов ограничивает рост памяти;
+# разброс не дает всем воркерам перезапуститься одновременно
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+graceful_timeout = settings.WORKER_GRACEFUL_TIMEOUT
+# Воркер, не отвечающий мастеру дольше timeout, перезапускается; самые долгие запросы
+# (импорт, пакетные операции) ограничены QUERY_TIMEOUTS в 60 секунд
+timeout = 90
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Число воркеров могли задать ключом -w: пул воркера делит бюджет соединений на фактическое число
+    settings.WEB_CONCURRENCY = server.cfg.workers
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сжатия ответов: байты на проводе и процессорное время.
+
+Поднимает приложение поверх SQLite в памяти с синтетическими данными (как bench_serialization.py).
+Для тел тяжелых эндпоинтов печатает размер и CPU сжатия по кодировкам и уровням,
+затем CPU на запрос через приложение без сжатия, со сжатием и с попаданием в кэш сжатых тел
+(в него входит и распаковка ответа тестовым клиентом):
+
+    python scripts/bench_compression.py --organizations 1000 --repeat 30
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import compression
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import app
+from app.models.base import Base
+from bench_serialization import ENDPOINTS, seed
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6)
+
+
+def codec_cases():
+    cases = [(f"gzip-{level}", "COMPRESSION_GZIP_LEVEL", level, compression._gzip) for level in GZIP_LEVELS]
+    if compression.brotli is not None:
+        cases += [(f"br-{quality}", "COMPRESSION_BROTLI_QUALITY", quality, compression._brotli)
+                  for quality in BROTLI_QUALITIES]
+    return cases
+
+
+def cpu_ms(fn, repeat: int) -> float:
+    fn()  # прогрев
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def measure_request(client: TestClient, path: str, encoding: str, repeat: int, cached: bool):
+    """CPU на запрос через приложение и размер тела на проводе"""
+    headers = {"Accept-Encoding": encoding}
+
+    def request():
+        if not cached:
+            compression.compressed_bodies.clear()
+        return client.get(path, headers=headers)
+
+    wire = int(request().headers["content-length"])
+    return cpu_ms(request, repeat), wire
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    # Бенчмарк измеряет сжатие, а не лимиты: повторяющиеся запросы не должны получать 429
+    settings.RATE_LIMIT_ENABLED = False
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    seed(session, args.organizations)
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.headers["x-api-key"] = settings.API_KEY
+
+    levels = {name: getattr(settings, name) for name in ("COMPRESSION_GZIP_LEVEL", "COMPRESSION_BROTLI_QUALITY")}
+    print("codecs: compressed bytes (ratio) and cpu ms per body")
+    for name, path in ENDPOINTS:
+        body = client.get(path, headers={"Accept-Encoding": "identity"}).content
+        print(f"{name:<20}{'identity':>10}{len(body):>10}")
+        for codec, setting, value, fn in codec_cases():
+            setattr(settings, setting, value)
+            compressed = fn(body)
+            cpu = cpu_ms(lambda: fn(body), args.repeat)
+            print(f"{'':<20}{codec:>10}{len(compressed):>10} ({len(body) / len(compressed):>4.1f}x){cpu:>9.2f} ms")
+        # Попадание в кэш сжатых тел стоит одного хеша тела
+        cpu = cpu_ms(lambda: compression.CompressedBodies.key("gzip", body), args.repeat)
+        print(f"{'':<20}{'cache hit':>10}{'':>18}{cpu:>9.2f} ms")
+
+    for setting, value in levels.items():
+        setattr(settings, setting, value)
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+
+    print("\nrequests: cpu ms/req and bytes on wire (cached - body compressed earlier)")
+    print(f"{'endpoint':<20}{'encoding':>10}{'cpu ms':>10}{'cached ms':>11}{'bytes':>10}")
+    for name, path in ENDPOINTS:
+        for encoding in encodings:
+            cpu, wire = measure_request(client, path, encoding, args.repeat, cached=False)
+            cached, _ = measure_request(client, path, encoding, args.repeat, cached=True)
+            print(f"{name:<20}{encoding:>10}{cpu:>10.2f}{cached:>11.2f}{wire:>10}")
+
+
+if __name__ == "__main__":
+    main()
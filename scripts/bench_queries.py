@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк Python-накладных расходов горячих запросов CRUD.
+
+Сравнивает прежние реализации через db.query(...) с текущими (Session.get, lambda_stmt)
+на SQLite в памяти и показывает долю попаданий в кэш компиляции SQLAlchemy:
+
+    python scripts/bench_queries.py --organizations 1000 --repeat 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.main  # noqa: F401 - регистрирует все модели и обработчики событий
+from app.core.metrics import metrics
+from app.crud import building as crud_building
+from app.crud import organization as crud_organization
+from app.models.base import Base
+from app.models.building import Building
+from app.models.organization import Organization
+from bench_serialization import seed
+
+
+def legacy_get(db, id):
+    return db.query(Building).filter(Building.id == id).first()
+
+
+def legacy_get_with_details(db, id):
+    return db.query(Organization).options(
+        joinedload(Organization.building),
+        joinedload(Organization.phone_numbers),
+        joinedload(Organization.activities)
+    ).filter(Organization.id == id).first()
+
+
+def legacy_get_by_building(db, building_id):
+    return db.query(Organization).options(
+        joinedload(Organization.building),
+        joinedload(Organization.phone_numbers),
+        joinedload(Organization.activities)
+    ).filter(Organization.building_id == building_id).all()
+
+
+def legacy_get_in_rectangle(db, min_lat, max_lat, min_lon, max_lon):
+    return db.query(Building).filter(
+        Building.latitude.between(min_lat, max_lat),
+        Building.longitude.between(min_lon, max_lon)
+    ).all()
+
+
+def current_get_in_rectangle(db, min_lat, max_lat, min_lon, max_lon):
+    # Резервный путь без индекса координат: тот же запрос к БД, что и у legacy-варианта
+    from app.core.config import settings
+    settings.GEO_INDEX_ENABLED = False
+    return crud_building.building.get_in_rectangle(
+        db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon
+    )
+
+
+def cache_counts():
+    return {
+        result: metrics.get("sqlalchemy_compiled_cache_total", result=result)
+        for result in ("cache_hit", "cache_miss")
+    }
+
+
+def measure(session_factory, fn, args_list):
+    """Среднее время вызова в микросекундах; сессия новая на каждый вызов, как в запросе API"""
+    before = cache_counts()
+    start = time.perf_counter()
+    for args in args_list:
+        session = session_factory()
+        fn(session, *args)
+        session.close()
+    elapsed = (time.perf_counter() - start) / len(args_list) * 1e6
+    after = cache_counts()
+    hits = after["cache_hit"] - before["cache_hit"]
+    total = hits + after["cache_miss"] - before["cache_miss"]
+    return elapsed, hits / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(Session(), args.organizations)
+
+    rnd = random.Random(7)
+    organization_ids = [rnd.randint(1, args.organizations) for _ in range(args.repeat)]
+    building_ids = [rnd.randint(1, args.organizations // 2) for _ in range(args.repeat)]
+    rectangles = [
+        (lat, lat + 0.01, lon, lon + 0.01)
+        for lat, lon in ((55.65 + rnd.random() * 0.2, 37.52 + rnd.random() * 0.2) for _ in range(args.repeat))
+    ]
+
+    cases = [
+        ("get", legacy_get, crud_building.building.get, [(i,) for i in building_ids]),
+        ("get_with_details", legacy_get_with_details, crud_organization.organization.get_with_details,
+         [(i,) for i in organization_ids]),
+        ("get_by_building", legacy_get_by_building, crud_organization.organization.get_by_building,
+         [(i,) for i in building_ids]),
+        ("get_in_rectangle", legacy_get_in_rectangle, current_get_in_rectangle, rectangles),
+    ]
+
+    print(f"{'query':<20}{'legacy us':>12}{'current us':>12}{'saved us':>10}{'cache hit':>11}")
+    for name, legacy, current, args_list in cases:
+        measure(Session, legacy, args_list[:50])  # прогрев
+        measure(Session, current, args_list[:50])
+        legacy_us, _ = measure(Session, legacy, args_list)
+        current_us, hit_ratio = measure(Session, current, args_list)
+        print(f"{name:<20}{legacy_us:>12.1f}{current_us:>12.1f}{legacy_us - current_us:>10.1f}{hit_ratio:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк CPU на запрос для тяжелых списочных эндпоинтов.
+
+Поднимает приложение поверх SQLite в памяти, заполняет его синтетическими данными
+и измеряет процессорное время (time.process_time) на запрос:
+
+    python scripts/bench_serialization.py --organizations 1000 --repeat 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import app
+from app.models.base import Base
+from app.models.activity import Activity
+from app.models.building import Building
+from app.models.organization import Organization
+from app.models.phone_number import PhoneNumber
+
+ENDPOINTS = [
+    ("organizations", "/api/v1/organizations/?limit=1000"),
+    ("buildings/nearby", "/api/v1/buildings/nearby?lat=55.75&lon=37.62&radius=20000"),
+    ("activities", "/api/v1/activities/"),
+]
+
+
+def seed(session, organizations: int):
+    rnd = random.Random(42)
+
+    roots = [Activity(name=f"Корень {i}") for i in range(10)]
+    session.add_all(roots)
+    session.flush()
+    children = [Activity(name=f"Дочерний {r.id}-{i}", parent_id=r.id) for r in roots for i in range(10)]
+    session.add_all(children)
+    session.flush()
+    leaves = [Activity(name=f"Лист {c.id}-{i}", parent_id=c.id) for c in children for i in range(9)]
+    session.add_all(leaves)
+    session.flush()
+    activities = roots + children + leaves
+
+    buildings = [
+        Building(
+            address=f"г. Москва, ул. Бенчмарк {i}",
+            latitude=55.75 + rnd.uniform(-0.1, 0.1),
+            longitude=37.62 + rnd.uniform(-0.1, 0.1)
+        )
+        for i in range(organizations // 2)
+    ]
+    session.add_all(buildings)
+    session.flush()
+
+    for i in range(organizations):
+        organization = Organization(name=f"Организация {i}", building_id=rnd.choice(buildings).id)
+        organization.activities.extend(rnd.sample(activities, 2))
+        session.add(organization)
+        session.flush()
+        session.add_all([
+            PhoneNumber(number=f"8-9{rnd.randint(10, 99)}-{rnd.randint(100, 999)}-{i:04d}", organization_id=organization.id)
+            for _ in range(2)
+        ])
+    session.commit()
+
+
+def measure(client: TestClient, path: str, repeat: int):
+    client.get(path)  # прогрев
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    size = 0
+    for _ in range(repeat):
+        response = client.get(path)
+        assert response.status_code == 200, response.text
+        size = len(response.content)
+    cpu = (time.process_time() - cpu_start) / repeat * 1000
+    wall = (time.perf_counter() - wall_start) / repeat * 1000
+    return cpu, wall, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    # Бенчмарк измеряет сериализацию, а не лимиты: повторяющиеся запросы не должны получать 429
+    settings.RATE_LIMIT_ENABLED = False
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    seed(session, args.organizations)
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.headers["x-api-key"] = settings.API_KEY
+
+    print(f"{'endpoint':<20}{'cpu ms/req':>12}{'wall ms/req':>13}{'bytes':>10}")
+    for name, path in ENDPOINTS:
+        cpu, wall, size = measure(client, path, args.repeat)
+        print(f"{name:<20}{cpu:>12.2f}{wall:>13.2f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность production-запуска (deploy/gunicorn.conf.py) в зависимости от числа воркеров.
+
+Для каждого числа воркеров поднимает gunicorn, ждет прогрева и в течение --duration секунд
+нагружает горячие чтения API (дерево деятельностей, карточки организаций, поиск рядом)
+из --clients процессов по --concurrency запросов в каждом. БД - из настроек (POSTGRES_*),
+заполненная scripts/seed_db.py; лимиты запросов на ключ на время замера отключаются:
+
+    python scripts/seed_db.py
+    python scripts/bench_workers.py --workers 1,2,4,8 --duration 15
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from app.core.config import settings  # noqa: E402
+
+
+def hot_paths(base_url: str, headers: dict):
+    """Адреса горячих чтений на данных seed_db.py"""
+    prefix = f"{base_url}{settings.API_V1_STR}"
+    organizations = httpx.get(f"{prefix}/organizations/", params={"limit": 50}, headers=headers).json()
+    paths = [f"{prefix}/activities/", f"{prefix}/buildings/nearby?lat=55.7558&lon=37.6173&radius=5000"]
+    paths += [f"{prefix}/organizations/{item['id']}" for item in organizations]
+    return paths
+
+
+async def client(paths, headers, concurrency: int, deadline: float, results):
+    async with httpx.AsyncClient(headers=headers, limits=httpx.Limits(max_connections=concurrency)) as http:
+        async def loop(offset: int):
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await http.get(paths[i % len(paths)])
+                results.append((response.status_code, time.perf_counter() - started))
+                i += 1
+
+        await asyncio.gather(*(loop(i) for i in range(concurrency)))
+
+
+def run_client(paths, headers, concurrency: int, deadline: float, queue):
+    results = []
+    asyncio.run(client(paths, headers, concurrency, deadline, results))
+    queue.put(results)
+
+
+def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ready").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not become ready")
+
+
+def measure(workers: int, args, headers):
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, RATE_LIMIT_ENABLED="false", WORKER_MAX_REQUESTS="0", WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "deploy/gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{args.port}", "app.main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(base_url)
+        # /ready отвечает случайный воркер: даем прогреться остальным
+        time.sleep(args.warmup)
+        paths = hot_paths(base_url, headers)
+
+        queue = multiprocessing.Queue()
+        deadline = time.perf_counter() + args.duration
+        clients = [
+            multiprocessing.Process(target=run_client, args=(paths, headers, args.concurrency, deadline, queue))
+            for _ in range(args.clients)
+        ]
+        for process in clients:
+            process.start()
+        results = [row for _ in clients for row in queue.get()]
+        for process in clients:
+            process.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies = sorted(seconds for _, seconds in results)
+    errors = sum(1 for code, _ in results if code != 200)
+    return (
+        len(results) / args.duration,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+        errors
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1},{2 * (os.cpu_count() or 1) + 1}")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    headers = {settings.API_KEY_NAME: settings.API_KEY}
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        rps, p50, p99, errors = measure(workers, args, headers)
+        print(f"{workers:>8}{rps:>10.0f}{p50:>10.1f}{p99:>10.1f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
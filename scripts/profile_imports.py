@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Профиль импорта app.main (python -X importtime) для оценки холодного старта воркера.
+
+Печатает общее время импорта, самые дорогие модули по собственному и накопленному времени
+и проверяет, что модули, не нужные для обслуживания запросов (Alembic, миграции, скрипты),
+не импортируются:
+
+    python scripts/profile_imports.py --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые воркер не должен загружать при старте
+FORBIDDEN_PREFIXES = ("alembic", "app.migrations", "scripts", "seed_db", "pytest", "numpy")
+
+
+def profile(target: str):
+    """Список (модуль, собственное время us, накопленное время us) в порядке импорта"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = profile(args.target)
+    total = next(cumulative for module, _, cumulative in rows if module == args.target)
+    print(f"import {args.target}: {total / 1000:.1f} ms, {len(rows)} modules\n")
+
+    for title, key in (("self", 1), ("cumulative", 2)):
+        print(f"top by {title} time:")
+        for row in sorted(rows, key=lambda r: r[key], reverse=True)[:args.top]:
+            print(f"  {row[key] / 1000:>8.1f} ms  {row[0]}")
+        print()
+
+    forbidden = sorted({module for module, _, _ in rows if module.startswith(FORBIDDEN_PREFIXES)})
+    if forbidden:
+        print("modules not needed for serving were imported:", ", ".join(forbidden))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
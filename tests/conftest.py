@@ -1,11 +1,16 @@
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.database import get_db
+from app.core.deadlines import bind_deadline, release_deadline
 from app.core.config import settings
+from app.core.geo_index import coordinate_store
+from app.core.rate_limit import buckets, concurrency
+from app.core.response_cache import response_cache
 from app.main import app
 from app.models.base import Base
 
@@ -23,6 +28,10 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.create_all(bind=engine)
+    coordinate_store.clear()
+    buckets.clear()
+    concurrency.clear()
+    response_cache.clear()
 
     session = TestingSessionLocal()
     try:
@@ -35,11 +44,12 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session):
 
-    def override_get_db():
+    def override_get_db(request: Request):
+        bind_deadline(db_session, request)
         try:
             yield db_session
         finally:
-            pass
+            release_deadline(db_session)
 
     app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
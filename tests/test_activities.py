@@ -1,3 +1,4 @@
+import pytest
 from fastapi import status
 
 
@@ -29,6 +30,36 @@ class TestActivities:
         assert len(data[0]["children"]) == 1
         assert len(data[0]["children"][0]["children"]) == 0
 
+    def test_get_activities_tree_single_query(self, client, db_session):
+        """Тест: дерево любого размера загружается одним запросом"""
+        from sqlalchemy import event
+        from app.models.activity import Activity
+
+        for i in range(5):
+            root = Activity(name=f"Корень {i}")
+            db_session.add(root)
+            db_session.flush()
+            for j in range(5):
+                child = Activity(name=f"Дочерняя {i}.{j}", parent_id=root.id)
+                db_session.add(child)
+                db_session.flush()
+                db_session.add_all(Activity(name=f"Внучка {i}.{j}.{k}", parent_id=child.id) for k in range(5))
+        db_session.commit()
+
+        statements = []
+        engine = db_session.get_bind()
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get("/api/v1/activities/")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 5
+        assert sum(len(child["children"]) for root in response.json() for child in root["children"]) == 125
+        assert len(statements) == 1
+
     def test_get_activity_detail(self, client, test_activity_tree, test_organization):
         """Тест получения деталей активности"""
         activity = test_activity_tree["root"]
@@ -49,3 +80,226 @@ class TestActivities:
         response = client.get("/api/v1/activities/999")
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_get_activities_stats(self, client, test_activity_tree, test_organization, db_session):
+        """Тест статистики по видам деятельности"""
+        from app.models.organization import Organization
+
+        organization = Organization(name="Организация внучки", building_id=test_organization.building_id)
+        organization.activities.append(test_activity_tree["grandchild"])
+        db_session.add(organization)
+        db_session.commit()
+
+        response = client.get("/api/v1/activities/stats")
+
+        assert response.status_code == status.HTTP_200_OK
+        stats = {item["id"]: item for item in response.json()}
+
+        root = stats[test_activity_tree["root"].id]
+        assert root["depth"] == 0
+        assert root["organizations_count"] == 1
+        assert root["subtree_organizations_count"] == 2
+        assert root["buildings_count"] == 1
+        assert root["subtree_buildings_count"] == 1
+
+        child = stats[test_activity_tree["child"].id]
+        assert child["depth"] == 1
+        assert child["organizations_count"] == 0
+        assert child["subtree_organizations_count"] == 1
+
+        assert stats[test_activity_tree["grandchild"].id]["depth"] == 2
+
+    def test_get_activity_stats(self, client, test_activity_tree, test_organization):
+        """Тест статистики по одному виду деятельности"""
+        response = client.get(f"/api/v1/activities/{test_activity_tree['child'].id}/stats")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        assert data["depth"] == 1
+        assert data["parent_id"] == test_activity_tree["root"].id
+        assert data["subtree_organizations_count"] == 0
+
+    def test_get_nonexistent_activity_stats(self, client):
+        """Тест статистики несуществующей активности"""
+        response = client.get("/api/v1/activities/999/stats")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete_activity_with_children(self, client, test_activity_tree):
+        """Тест запрета удаления активности с потомками"""
+        response = client.delete(f"/api/v1/activities/{test_activity_tree['root'].id}")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_delete_activity_used_by_organization(self, client, db_session, test_activity_tree, test_organization):
+        """Тест запрета удаления активности, используемой организациями"""
+        test_organization.activities.append(test_activity_tree["grandchild"])
+        db_session.commit()
+
+        response = client.delete(f"/api/v1/activities/{test_activity_tree['grandchild'].id}")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_delete_activity(self, client, test_activity_tree):
+        """Тест удаления листовой активности"""
+        activity_id = test_activity_tree["grandchild"].id
+
+        response = client.delete(f"/api/v1/activities/{activity_id}")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = client.delete(f"/api/v1/activities/{activity_id}")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+    def test_create_child_activity(self, client, test_activity_tree):
+        """Тест создания дочерней активности с вычислением глубины"""
+        response = client.post(
+            "/api/v1/activities/",
+            json={"name": "Новая дочерняя", "parent_id": test_activity_tree["child"].id}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["parent_id"] == test_activity_tree["child"].id
+
+        stats = client.get(f"/api/v1/activities/{response.json()['id']}/stats").json()
+        assert stats["depth"] == 2
+
+    def test_create_activity_too_deep(self, client, test_activity_tree):
+        """Тест запрета создания четвертого уровня вложенности"""
+        response = client.post(
+            "/api/v1/activities/",
+            json={"name": "Правнучка", "parent_id": test_activity_tree["grandchild"].id}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_create_activity_with_missing_parent(self, client):
+        """Тест создания активности с несуществующим родителем"""
+        response = client.post("/api/v1/activities/", json={"name": "Сирота", "parent_id": 99999})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Parent activity not found"
+
+    def test_sibling_names_unique(self, client, test_activity_tree):
+        """Тест: создание, переименование, перенос и импорт не допускают соседей с одним названием"""
+        root, child, grandchild = test_activity_tree["root"], test_activity_tree["child"], test_activity_tree["grandchild"]
+        sibling = client.post("/api/v1/activities/", json={"name": "Соседка", "parent_id": root.id}).json()
+        client.post("/api/v1/activities/", json={"name": "Тестовая внучка"})
+
+        responses = [
+            client.post("/api/v1/activities/", json={"name": "Тестовая дочерняя", "parent_id": root.id}),
+            client.post("/api/v1/activities/", json={"name": "Тестовая корневая"}),
+            client.put(f"/api/v1/activities/{sibling['id']}", json={"name": "Тестовая дочерняя"}),
+            client.post(f"/api/v1/activities/{grandchild.id}/move", json={"parent_id": None}),
+            client.put(f"/api/v1/activities/{grandchild.id}", json={"parent_id": None}),
+            client.post("/api/v1/activities/import", json={"parent_id": root.id, "tree": [{"name": "Соседка"}]}),
+        ]
+        for response in responses:
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert response.json()["detail"] == "Activity names must be unique among siblings"
+
+        # Свое же название и такое же название под другим родителем допустимы
+        assert client.put(f"/api/v1/activities/{sibling['id']}", json={"name": "Соседка"}).status_code == 200
+        response = client.post("/api/v1/activities/", json={"name": "Соседка", "parent_id": child.id})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_update_activity_cycle(self, client, test_activity_tree):
+        """Тест запрета переноса активности под собственного потомка"""
+        response = client.put(
+            f"/api/v1/activities/{test_activity_tree['root'].id}",
+            json={"parent_id": test_activity_tree["grandchild"].id}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_update_activity_moves_subtree(self, client, db_session, test_activity_tree):
+        """Тест переноса ветки: глубины потомков сдвигаются вместе с ней"""
+        from app.models.activity import Activity
+
+        response = client.put(f"/api/v1/activities/{test_activity_tree['child'].id}", json={"parent_id": None})
+        assert response.status_code == status.HTTP_200_OK
+
+        db_session.expire_all()
+        assert db_session.get(Activity, test_activity_tree["child"].id).depth == 0
+        assert db_session.get(Activity, test_activity_tree["grandchild"].id).depth == 1
+
+        new_root = Activity(name="Другой корень")
+        db_session.add(new_root)
+        db_session.commit()
+
+        response = client.put(f"/api/v1/activities/{test_activity_tree['child'].id}",
+                              json={"parent_id": new_root.id})
+        assert response.status_code == status.HTTP_200_OK
+
+        db_session.expire_all()
+        assert db_session.get(Activity, test_activity_tree["grandchild"].id).depth == 2
+
+    def test_import_tree(self, client, db_session, test_activity_tree):
+        """Тест импорта вложенного дерева под существующий вид деятельности"""
+        from app.models.activity import Activity
+
+        response = client.post("/api/v1/activities/import", json={
+            "parent_id": test_activity_tree["root"].id,
+            "tree": [
+                {"name": "Ветка", "children": [{"name": "Лист 1"}, {"name": "Лист 2"}]},
+                {"name": "Вторая ветка"},
+            ]
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["created"] == 4
+
+        branch, first_leaf = db_session.get(Activity, data["ids"][0]), db_session.get(Activity, data["ids"][1])
+        assert branch.parent_id == test_activity_tree["root"].id
+        assert branch.depth == 1
+        assert first_leaf.parent_id == branch.id
+        assert first_leaf.depth == 2
+
+    def test_import_rows(self, client, db_session):
+        """Тест импорта плоских строк с ссылками внутри пакета"""
+        from app.models.activity import Activity
+
+        response = client.post("/api/v1/activities/import", json={"rows": [
+            {"id": "leaf", "name": "Лист", "parent_id": "root"},
+            {"id": "root", "name": "Корень"},
+        ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        leaf_id, root_id = response.json()["ids"]
+        assert db_session.get(Activity, leaf_id).parent_id == root_id
+
+    @pytest.mark.parametrize("payload", [
+        {"rows": [{"id": 1, "name": "A", "parent_id": 2}, {"id": 2, "name": "B", "parent_id": 1}]},
+        {"rows": [{"id": 1, "name": "A", "parent_id": 3}]},
+        {"tree": [{"name": "A"}, {"name": "A"}]},
+        {"tree": [{"name": "A", "children": [{"name": "B", "children": [{"name": "C", "children": [{"name": "D"}]}]}]}]},
+    ])
+    def test_import_invalid(self, client, db_session, payload):
+        """Тест отклонения пакета с циклом, неизвестной ссылкой, дублем или лишней глубиной"""
+        from app.models.activity import Activity
+
+        response = client.post("/api/v1/activities/import", json=payload)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert db_session.query(Activity).count() == 0
+
+    def test_move_activity(self, client, db_session, test_activity_tree):
+        """Тест переноса ветки в корень и обратно"""
+        from app.models.activity import Activity
+
+        response = client.post(f"/api/v1/activities/{test_activity_tree['child'].id}/move", json={"parent_id": None})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["parent_id"] is None
+
+        db_session.expire_all()
+        assert db_session.get(Activity, test_activity_tree["grandchild"].id).depth == 1
+
+        response = client.post(f"/api/v1/activities/{test_activity_tree['root'].id}/move",
+                               json={"parent_id": test_activity_tree["grandchild"].id})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = client.post(f"/api/v1/activities/{test_activity_tree['child'].id}/move",
+                               json={"parent_id": test_activity_tree["root"].id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
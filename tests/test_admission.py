@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from app.core import events
+from app.core.admission import AdmissionController, admission
+from app.core.database import pool_monitor
+from app.core.response_cache import ResponseCache
+
+
+class TestAdmission:
+    """Тесты admission control и деградированного режима"""
+
+    @pytest.fixture
+    def overloaded(self, monkeypatch):
+        """Ни один запрос не допускается к выполнению"""
+        monkeypatch.setattr(admission, "max_concurrency", 0)
+        monkeypatch.setattr(admission, "queue_size", 0)
+
+    def test_queue(self):
+        """Тест очереди: слот передается ожидающему, лишние запросы отклоняются"""
+        controller = AdmissionController(max_concurrency=1, queue_size=1)
+
+        async def scenario():
+            assert await controller.acquire(timeout=1)
+            waiter = asyncio.ensure_future(controller.acquire(timeout=1))
+            await asyncio.sleep(0)
+            assert controller.queued == 1
+
+            assert not await controller.acquire(timeout=1)  # очередь заполнена
+
+            controller.release()
+            assert await waiter
+            assert controller.active == 1
+
+            assert not await controller.acquire(timeout=0.01)  # срок ожидания истек
+            controller.release()
+            assert controller.active == 0
+
+        asyncio.run(scenario())
+
+    def test_response_cache_limits_size(self):
+        """Тест вытеснения ответов по суммарному размеру"""
+        cache = ResponseCache(max_bytes=10)
+        body = [{"type": "http.response.start"}, {"type": "http.response.body", "body": b"123456"}]
+
+        cache.put("a", body)
+        cache.put("b", body)
+
+        assert cache.get("a", max_stale=60) is None
+        assert cache.get("b", max_stale=60) is not None
+        assert cache.size == 6
+
+    def test_overloaded_returns_503(self, client, overloaded):
+        """Тест сброса нагрузки: запрос без кэшированного ответа получает 503"""
+        response = client.get("/api/v1/buildings/")
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "2"
+
+    def test_overloaded_serves_cached_reads(self, client, test_building, monkeypatch):
+        """Тест деградированного режима: чтения отдаются из кэша, после изменений - как stale"""
+        first = client.get("/api/v1/buildings/")
+        assert first.status_code == status.HTTP_200_OK
+
+        monkeypatch.setattr(admission, "max_concurrency", 0)
+        monkeypatch.setattr(admission, "queue_size", 0)
+
+        response = client.get("/api/v1/buildings/")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Cache"] == "fresh"
+        assert response.json() == first.json()
+
+        events.dispatch(events.ChangeEvent("buildings", "upsert", test_building.id))
+
+        response = client.get("/api/v1/buildings/")
+        assert response.headers["X-Cache"] == "stale"
+
+        response = client.post(
+            "/api/v1/buildings/",
+            json={"address": "г. Москва, ул. Новая 5", "latitude": 55.7, "longitude": 37.6}
+        )
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def test_congested_pool_serves_cache(self, client, test_building, monkeypatch):
+        """Тест: при насыщенном пуле чтения с готовым ответом не ставятся в очередь"""
+        client.get("/api/v1/buildings/")
+        monkeypatch.setattr(pool_monitor, "average", 10.0)
+
+        response = client.get("/api/v1/buildings/")
+
+        assert response.headers["X-Cache"] == "fresh"
@@ -1,5 +1,8 @@
+import pytest
 from fastapi import status
 
+from app.core import events
+
 
 class TestBuildings:
     """Тесты для эндпоинтов Buildings"""
@@ -103,6 +106,57 @@ class TestBuildings:
         assert data[0]["id"] == test_building.id
         assert data[0]["distance"] is None  # Для прямоугольника distance не рассчитывается
 
+    @pytest.mark.parametrize("geo_index", [True, False])
+    def test_get_nearby_buildings_nearest_first(self, client, db_session, monkeypatch, geo_index):
+        """Тест сортировки по расстоянию и ограничения ближайших зданий"""
+        from app.core.config import settings
+        from app.models.building import Building
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", geo_index)
+
+        db_session.add_all(
+            Building(address=f"Здание {i}", latitude=55.75 + 0.001 * i, longitude=37.62) for i in (3, 1, 4, 2)
+        )
+        db_session.commit()
+
+        response = client.get("/api/v1/buildings/nearby",
+                              params={"lat": 55.75, "lon": 37.62, "radius": 1000, "limit": 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["address"] for item in response.json()] == ["Здание 1", "Здание 2"]
+
+    @pytest.mark.parametrize("geo_index", [True, False])
+    def test_get_nearby_buildings_default_limit(self, client, db_session, monkeypatch, geo_index):
+        """Тест: без limit возвращается не более 100 ближайших зданий, limit больше 1000 отклоняется"""
+        from app.core.config import settings
+        from app.models.building import Building
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", geo_index)
+
+        db_session.add_all(
+            Building(address=f"Здание {i}", latitude=55.75 + 0.0001 * i, longitude=37.62) for i in range(150)
+        )
+        db_session.commit()
+
+        response = client.get("/api/v1/buildings/nearby", params={"lat": 55.75, "lon": 37.62, "radius": 5000})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["address"] for item in response.json()] == [f"Здание {i}" for i in range(100)]
+
+        response = client.get("/api/v1/buildings/nearby",
+                              params={"lat": 55.75, "lon": 37.62, "radius": 5000, "limit": 1001})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_nearby_buildings_with_org_count(self, client, test_building, test_organization):
+        """Тест количества организаций по зданиям в результатах поиска"""
+        params = {"lat": 55.7558, "lon": 37.6173, "radius": 1000}
+
+        response = client.get("/api/v1/buildings/nearby", params={**params, "include": "org_count"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["organizations_count"] == 1
+        assert "organizations_count" not in client.get("/api/v1/buildings/nearby", params=params).json()[0]
+
+        response = client.get("/api/v1/buildings/nearby", params={**params, "include": "organizations"})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
     def test_get_nearby_buildings_invalid_params(self, client):
         """Тест поиска зданий с невалидными параметрами"""
         # Неполные параметры для круга
@@ -127,4 +181,105 @@ class TestBuildings:
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
 
-        assert len(data) == 0
\ No newline at end of file
+        assert len(data) == 0
+
+    def test_create_building(self, client):
+        """Тест создания здания"""
+        response = client.post(
+            "/api/v1/buildings/",
+            json={"address": "г. Москва, ул. Новая 5", "latitude": 55.7, "longitude": 37.6}
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+
+        assert data["id"] is not None
+        assert data["address"] == "г. Москва, ул. Новая 5"
+
+    def test_update_building(self, client, test_building):
+        """Тест частичного обновления здания"""
+        response = client.patch(
+            f"/api/v1/buildings/{test_building.id}",
+            json={"latitude": 59.9343, "longitude": 30.3351}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        assert data["address"] == "г. Москва, ул. Тестовая 1"
+        assert data["latitude"] == 59.9343
+
+        response = client.get(
+            "/api/v1/buildings/nearby",
+            params={"lat": 59.9343, "lon": 30.3351, "radius": 100}
+        )
+        assert [b["id"] for b in response.json()] == [test_building.id]
+
+    def test_update_building_invalid(self, client, test_building):
+        """Тест обновления здания с невалидной широтой"""
+        response = client.patch(f"/api/v1/buildings/{test_building.id}", json={"latitude": 91})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_update_building_null_field(self, client, test_building):
+        """Тест: обнулить обязательное поле нельзя ни по одному зданию, ни в пакете"""
+        response = client.patch(f"/api/v1/buildings/{test_building.id}", json={"latitude": None})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        response = client.patch("/api/v1/buildings/batch", json={"items": [{"id": test_building.id, "address": None}]})
+
+        assert response.json()["results"][0]["status"] == "invalid"
+        assert client.get(f"/api/v1/buildings/{test_building.id}").json()["address"] == test_building.address
+
+    def test_update_nonexistent_building(self, client):
+        """Тест обновления несуществующего здания"""
+        response = client.patch("/api/v1/buildings/999", json={"address": "Новый адрес"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_update_buildings_batch(self, client, db_session, test_building, monkeypatch):
+        """Тест пакетного обновления зданий с результатом по каждой строке"""
+        from app.models.building import Building
+
+        other = Building(address="г. Москва, ул. Вторая 2", latitude=55.0, longitude=37.0)
+        db_session.add(other)
+        db_session.commit()
+
+        # Индекс координат загружается до пакета, чтобы проверить его синхронизацию
+        client.get("/api/v1/buildings/nearby", params={"lat": 55.0, "lon": 37.0, "radius": 100})
+        published = []
+        monkeypatch.setitem(events._handlers, "buildings", events._handlers["buildings"] + [published.append])
+
+        response = client.patch(
+            "/api/v1/buildings/batch",
+            json={"items": [
+                {"id": test_building.id, "address": "г. Москва, ул. Исправленная 1"},
+                {"id": other.id, "latitude": 59.9343, "longitude": 30.3351},
+                {"id": 999, "latitude": 10.0},
+                {"id": 1000, "latitude": 200.0},
+                {"id": 1001},
+            ]}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        assert data["updated"] == 2
+        assert data["not_found"] == 1
+        assert data["invalid"] == 2
+        assert [r["status"] for r in data["results"]] == ["updated", "updated", "not_found", "invalid", "invalid"]
+        # Одно пакетное событие на пачку вместо события на строку
+        assert [change.action for change in published] == ["bulk_upsert"]
+
+        buildings = {b["id"]: b for b in client.get("/api/v1/buildings/").json()}
+        assert buildings[test_building.id]["address"] == "г. Москва, ул. Исправленная 1"
+        assert buildings[test_building.id]["latitude"] == 55.7558
+        assert buildings[other.id]["address"] == "г. Москва, ул. Вторая 2"
+        assert buildings[other.id]["latitude"] == 59.9343
+
+        response = client.get(
+            "/api/v1/buildings/nearby",
+            params={"lat": 59.9343, "lon": 30.3351, "radius": 100}
+        )
+        assert [b["id"] for b in response.json()] == [other.id]
@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+from fastapi import status
+
+from app.core.admission import admission
+from app.core.compression import CompressionMiddleware, codecs, compressed_bodies, negotiate
+from app.core.metrics import metrics
+from app.core.response_cache import response_cache
+from app.main import app
+
+
+class TestCompression:
+    """Тесты сжатия ответов"""
+
+    @pytest.fixture
+    def no_threshold(self, client, monkeypatch):
+        """Сжимать ответы любого размера"""
+        client.get("/health")  # стек middleware строится при первом запросе
+        middleware = app.middleware_stack
+        while not isinstance(middleware, CompressionMiddleware):
+            middleware = middleware.app
+        monkeypatch.setattr(middleware, "min_size", 0)
+        compressed_bodies.clear()
+        response_cache.clear()
+
+    def test_negotiate(self):
+        """Тест выбора кодировки по Accept-Encoding"""
+        assert negotiate("gzip, deflate") == "gzip"
+        assert negotiate("deflate;q=1.0, gzip;q=0.5") == "gzip"
+        assert negotiate("identity") is None
+        assert negotiate("gzip;q=0") is None
+        assert negotiate("*") == next(iter(codecs()))
+        assert negotiate("*, gzip;q=0") == ("br" if "br" in codecs() else None)
+
+    def test_large_response_is_compressed(self, client):
+        """Тест: крупный JSON сжимается gzip, мелкий и без Accept-Encoding - нет"""
+        response = client.get("/api/v1/openapi.json", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert "paths" in response.json()
+
+        response = client.get("/api/v1/openapi.json", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert int(response.headers["content-length"]) == len(response.content)
+
+        response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"status": "healthy"}
+
+    def test_identical_bodies_compressed_once(self, client, test_activity_tree, no_threshold):
+        """Тест: повторный ответ с теми же байтами берется из кэша сжатых тел"""
+        hits = metrics.get("compression_responses_total", encoding="gzip", cache="hit")
+
+        first = client.get("/api/v1/activities/", headers={"Accept-Encoding": "gzip"})
+        second = client.get("/api/v1/activities/?max_depth=3", headers={"Accept-Encoding": "gzip"})
+
+        assert first.headers["content-encoding"] == second.headers["content-encoding"] == "gzip"
+        assert first.json() == second.json()
+        assert metrics.get("compression_responses_total", encoding="gzip", cache="hit") == hits + 1
+        assert len(compressed_bodies) == 1
+
+    def test_cached_response_is_precompressed(self, client, test_organization, no_threshold, monkeypatch):
+        """Тест: кэш деградированного режима хранит и отдает уже сжатое тело"""
+        path = f"/api/v1/organizations/{test_organization.id}"
+        expected = client.get(path, headers={"Accept-Encoding": "gzip"}).json()
+
+        monkeypatch.setattr(admission, "max_concurrency", 0)
+        monkeypatch.setattr(admission, "queue_size", 0)
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["x-cache"] == "fresh"
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == expected
+        _, body = response_cache.get(next(iter(response_cache._entries)), 0).messages
+        assert gzip.decompress(body["body"]) == response.content
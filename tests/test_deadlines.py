@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core import deadlines
+from app.core.deadlines import (
+    QueryCancellationMiddleware, QueryDeadline, is_deadline_error, parse_route_timeouts
+)
+
+# Запрос, выполняющийся без прерывания десятки секунд
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) FROM c"
+)
+# Запрос на сотни тысяч шагов SQLite, выполняющийся за доли секунды
+MEDIUM_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000) SELECT count(*) FROM c"
+)
+
+
+class TestQueryDeadlines:
+    """Тесты сроков выполнения запросов к БД"""
+
+    @pytest.fixture
+    def deadline(self, db_session):
+        deadline = QueryDeadline()
+        db_session.info["query_deadline"] = deadline
+        yield deadline
+        deadlines.release_deadline(db_session)
+        db_session.rollback()
+
+    def test_parse_route_timeouts(self):
+        """Тест разбора настройки сроков по маршрутам"""
+        assert parse_route_timeouts("get_organizations=3, update_buildings_batch=60,") == {
+            "get_organizations": 3.0,
+            "update_buildings_batch": 60.0,
+        }
+
+    def test_deadline_interrupts_query(self, db_session, deadline):
+        """Тест прерывания запроса по истечении срока"""
+        deadline.start(0.05)
+
+        with pytest.raises(OperationalError) as exc_info:
+            db_session.execute(SLOW_QUERY)
+
+        assert is_deadline_error(exc_info.value)
+
+    def test_cancel_interrupts_query(self, db_session, deadline):
+        """Тест отмены выполняющегося запроса из другого потока"""
+        deadline.start(60)
+        timer = threading.Timer(0.05, deadline.cancel)
+        timer.start()
+
+        with pytest.raises(OperationalError) as exc_info:
+            db_session.execute(SLOW_QUERY)
+
+        timer.join()
+        assert is_deadline_error(exc_info.value)
+
+    def test_release_removes_interrupt(self, db_session, deadline):
+        """Тест: после снятия срока соединение снова выполняет запросы"""
+        deadline.start(60)
+        db_session.execute(text("SELECT 1"))
+        deadline.start(0)
+        deadlines.release_deadline(db_session)
+
+        assert db_session.execute(text("SELECT count(*) FROM buildings")).scalar_one() == 0
+
+    def test_commit_detaches_deadline(self, db_session, deadline):
+        """Тест: после коммита посреди запроса отмена не прерывает запросы другого владельца соединения"""
+        deadline.start(60)
+        db_session.execute(text("SELECT 1"))
+        db_session.commit()
+        deadline.cancel()
+
+        # StaticPool отдает то же соединение: его получает "другой запрос"
+        with db_session.get_bind().connect() as connection:
+            assert connection.execute(MEDIUM_QUERY).scalar_one() == 100000
+
+        # Следующая транзакция сессии снова получает срок
+        with pytest.raises(OperationalError) as exc_info:
+            db_session.execute(SLOW_QUERY)
+        assert is_deadline_error(exc_info.value)
+
+    def test_route_deadline_returns_504(self, client, db_session, monkeypatch):
+        """Тест ответа 504 при превышении срока маршрута"""
+        from app.crud import building as crud_building
+
+        def slow_get_multi_rows(db, **kwargs):
+            db.execute(SLOW_QUERY)
+
+        monkeypatch.setattr(crud_building.building, "get_multi_rows", slow_get_multi_rows)
+        monkeypatch.setitem(deadlines._route_timeouts, "get_buildings", 0.05)
+
+        response = client.get("/api/v1/buildings/")
+
+        assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+        assert response.json()["detail"] == "Query deadline exceeded"
+
+    def test_disconnect_cancels_query(self):
+        """Тест отмены запросов к БД при отключении клиента"""
+        seen = {}
+
+        async def app(scope, receive, send):
+            deadline = scope["state"]["query_deadline"]
+            deadline.start(60)
+            for _ in range(100):
+                if deadline.cancelled:
+                    break
+                await asyncio.sleep(0.01)
+            seen["cancelled"] = deadline.cancelled
+            seen["message"] = await receive()
+
+        incoming = [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}]
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            pass
+
+        asyncio.run(QueryCancellationMiddleware(app)({"type": "http"}, receive, send))
+
+        assert seen["cancelled"]
+        assert seen["message"] == {"type": "http.request", "body": b"", "more_body": False}
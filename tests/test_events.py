@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import events
+from app.core.geo_index import coordinate_store
+
+
+class TestChangeEvents:
+    """Тесты подсистемы уведомлений об изменениях"""
+
+    @pytest.fixture
+    def received(self, monkeypatch):
+        received = []
+        monkeypatch.setitem(events._handlers, "test_entity", [received.append])
+        return received
+
+    def test_dispatch_after_commit(self, db_session, received):
+        """Тест рассылки события только после коммита"""
+        events.publish(db_session, "test_entity", "upsert", 1, {"x": 1})
+
+        assert received == []
+
+        db_session.commit()
+
+        assert len(received) == 1
+        assert received[0].id == 1
+        assert received[0].data == {"x": 1}
+
+    def test_discard_on_rollback(self, db_session, received):
+        """Тест отбрасывания событий при откате транзакции"""
+        from app.models.building import Building
+
+        db_session.add(Building(address="Откатываемое здание", latitude=1.0, longitude=1.0))
+        db_session.flush()
+        events.publish(db_session, "test_entity", "delete", 1)
+        db_session.rollback()
+        db_session.commit()
+
+        assert received == []
+
+    def test_remote_payload(self, received):
+        """Тест применения уведомлений от других воркеров"""
+        payload = json.dumps({"o": "other-worker", "c": [{"e": "test_entity", "a": "delete", "i": 5}]})
+        events.dispatch_payload(payload)
+
+        own_payload = json.dumps({"o": events.WORKER_ID, "c": [{"e": "test_entity", "a": "delete", "i": 6}]})
+        events.dispatch_payload(own_payload)
+
+        assert [change.id for change in received] == [5]
+        assert received[0].origin == "other-worker"
+
+    def test_reset_reaches_all_handlers(self, received):
+        """Тест сброса всех кэшей при потере соединения listener'а"""
+        events.dispatch(events.ChangeEvent(events.ALL, "reset"))
+
+        assert received[0].action == "reset"
+
+    def test_listener_applies_notifications_off_loop(self, received):
+        """Тест: уведомления применяются по порядку в потоке, а не в event loop"""
+        import threading
+
+        threads = []
+        events._handlers["test_entity"].append(lambda change: threads.append(threading.get_ident()))
+
+        async def scenario():
+            listener = events.ChangeListener(engine=None, channel="test")
+            listener._queue = asyncio.Queue()
+            consumer = asyncio.create_task(listener._consume())
+            for i in range(3):
+                payload = {"o": "other-worker", "c": [{"e": "test_entity", "a": "delete", "i": i}]}
+                listener._queue.put_nowait(json.dumps(payload))
+            listener._queue.put_nowait(events.ChangeEvent("test_entity", "reset"))
+            while len(received) < 4:
+                await asyncio.sleep(0.01)
+            consumer.cancel()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+
+        assert [change.id for change in received[:3]] == [0, 1, 2]
+        assert received[3].action == "reset"
+        assert loop_thread not in threads
+
+    def test_payload_chunking(self):
+        """Тест разбиения больших пакетов событий под лимит NOTIFY"""
+        changes = [events.ChangeEvent("buildings", "delete", i) for i in range(2000)]
+        payloads = events._chunk_payloads(changes)
+
+        assert len(payloads) > 1
+        assert all(len(payload) < 8000 for payload in payloads)
+        assert sum(len(json.loads(payload)["c"]) for payload in payloads) == 2000
+
+    def test_bulk_payload_splitting(self):
+        """Тест: пакетное событие крупнее лимита NOTIFY делится на части без потери строк"""
+        rows = [[i, 55.0 + i / 1e4, 37.0] for i in range(1000)]
+        payloads = events._chunk_payloads([events.ChangeEvent("buildings", "bulk_upsert", data={"rows": rows})])
+
+        assert len(payloads) > 1
+        assert all(len(payload) < 8000 for payload in payloads)
+        parts = [item for payload in payloads for item in json.loads(payload)["c"]]
+        assert {item["a"] for item in parts} == {"bulk_upsert"}
+        assert [row for item in parts for row in item["d"]["rows"]] == rows
+
+    def test_coordinate_store_follows_building_writes(self, db_session, test_building):
+        """Тест обновления индекса координат через события CRUD"""
+        from app.crud.building import building as crud_building
+        from app.schemas.building import BuildingCreate, BuildingUpdate
+
+        coordinate_store.load(db_session)
+
+        created = crud_building.create(
+            db_session, obj_in=BuildingCreate(address="Новое здание", latitude=10.0, longitude=10.0)
+        )
+        assert coordinate_store.in_rectangle(min_lat=9, max_lat=11, min_lon=9, max_lon=11) == [created.id]
+
+        crud_building.update(db_session, db_obj=created, obj_in=BuildingUpdate(latitude=20.0))
+        assert coordinate_store.in_rectangle(min_lat=9, max_lat=11, min_lon=9, max_lon=11) == []
+        assert coordinate_store.in_rectangle(min_lat=19, max_lat=21, min_lon=9, max_lon=11) == [created.id]
+
+        crud_building.remove(db_session, id=created.id)
+        assert len(coordinate_store) == 1
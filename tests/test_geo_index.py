@@ -0,0 +1,376 @@
+import os
+
+import pytest
+
+from app.core import geohash
+from app.core.geo_index import CoordinateStore, haversine, morton_code
+
+
+class TestCoordinateStore:
+    """Тесты индекса координат зданий в памяти"""
+
+    @pytest.fixture
+    def store(self, db_session):
+        from app.models.building import Building
+
+        db_session.add_all([
+            Building(id=1, address="Москва 1", latitude=55.7558, longitude=37.6173),
+            Building(id=2, address="Москва 2", latitude=55.7600, longitude=37.6200),
+            Building(id=3, address="Санкт-Петербург", latitude=59.9343, longitude=30.3351),
+            Building(id=4, address="Камчатка", latitude=53.0, longitude=179.99),
+            Building(id=5, address="Чукотка", latitude=53.0, longitude=-179.99),
+        ])
+        db_session.commit()
+
+        store = CoordinateStore()
+        store.load(db_session)
+        return store
+
+    def test_load(self, store):
+        """Тест загрузки координат из БД"""
+        assert store.loaded
+        assert len(store) == 5
+        assert store.nbytes == 5 * 32
+
+    def test_in_rectangle(self, store):
+        """Тест поиска в прямоугольнике"""
+        ids = store.in_rectangle(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0)
+
+        assert sorted(ids) == [1, 2]
+
+    def test_in_radius(self, store):
+        """Тест поиска в радиусе с расстоянием"""
+        result = dict(store.in_radius(lat=55.7558, lon=37.6173, radius_m=1000))
+
+        assert set(result) == {1, 2}
+        assert result[1] == pytest.approx(0.0)
+        assert result[2] == pytest.approx(haversine(55.7558, 37.6173, 55.76, 37.62))
+
+    def test_in_radius_nearest_first(self, store):
+        """Тест упорядочивания по расстоянию и ограничения числа ближайших"""
+        result = store.in_radius(lat=55.76, lon=37.62, radius_m=1000)
+
+        assert [building_id for building_id, _ in result] == [2, 1]
+        assert store.in_radius(lat=55.76, lon=37.62, radius_m=1000, limit=1) == result[:1]
+
+    def test_in_radius_across_antimeridian(self, store):
+        """Тест поиска в радиусе через 180-й меридиан"""
+        ids = {building_id for building_id, _ in store.in_radius(lat=53.0, lon=180.0, radius_m=5000)}
+
+        assert ids == {4, 5}
+
+    def test_upsert_and_remove(self, store):
+        """Тест обновления индекса при изменении зданий"""
+        store.upsert(6, 55.7559, 37.6174)
+        store.upsert(3, 55.7557, 37.6172)
+        store.remove(1)
+
+        ids = store.in_rectangle(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0)
+
+        assert sorted(ids) == [2, 3, 6]
+        assert len(store) == 5
+
+    def test_bulk_apply_matches_reload(self, store):
+        """Тест: пакетное изменение дает те же массивы, что и загрузка с нуля"""
+        import random
+
+        rnd = random.Random(3)
+        upserts = [(i, rnd.uniform(-80, 80), rnd.uniform(-170, 170)) for i in range(2, 40)]
+        store.apply(upserts=upserts, removals=[1, 100])
+
+        expected = sorted((morton_code(lat, lon), i, lat, lon) for i, lat, lon in upserts)
+        assert list(zip(store._codes, store._ids, store._lats, store._lons)) == expected
+
+        store.apply(upserts=[(2, 55.7558, 37.6173)])
+        assert store.in_rectangle(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0) == [2]
+        assert len(store) == len(upserts)
+
+    def test_changes_during_load_are_replayed(self, store, db_session):
+        """Тест: изменение, пришедшее между SELECT загрузки и заменой массивов, не теряется"""
+
+        class ChangeAfterSelect:
+            def execute(self, statement):
+                rows = db_session.execute(statement)
+                store.upsert(1, 10.0, 10.0)
+                store.remove(2)
+                return rows
+
+        store.clear()
+        store.load(ChangeAfterSelect())
+
+        assert store.in_rectangle(min_lat=9, max_lat=11, min_lon=9, max_lon=11) == [1]
+        assert store.in_rectangle(min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0) == []
+        assert len(store) == 4
+
+    def test_concurrent_ensure_loaded_loads_once(self, store, db_session):
+        """Тест: параллельные ensure_loaded выполняют одну загрузку; сброс во время загрузки ее отменяет"""
+        import threading
+
+        selects = []
+        started, release = threading.Event(), threading.Event()
+
+        class SlowSelect:
+            def execute(self, statement):
+                selects.append(statement)
+                started.set()
+                release.wait(5)
+                return db_session.execute(statement)
+
+        store.clear()
+        threads = [threading.Thread(target=store.ensure_loaded, args=(SlowSelect(),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(selects) == 1
+        assert store.loaded and len(store) == 5
+
+        class ResetDuringSelect:
+            def execute(self, statement):
+                store.clear()
+                return db_session.execute(statement)
+
+        store.load(ResetDuringSelect())
+        assert not store.loaded
+
+    def test_codes_sorted(self, store):
+        """Тест упорядоченности по Z-кривой"""
+        codes = list(store._codes)
+
+        assert codes == sorted(codes)
+        assert morton_code(-90, -180) == 0
+
+
+class TestDatabaseGeoSearch:
+    """Тесты геопоиска в БД без индекса в памяти (PostGIS или прямоугольник по индексу координат)"""
+
+    @pytest.fixture
+    def buildings(self, db_session, monkeypatch):
+        from app.core.config import settings
+        from app.models.building import Building
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", False)
+
+        db_session.add_all([
+            Building(id=1, address="Москва 1", latitude=55.7558, longitude=37.6173),
+            Building(id=2, address="Москва 2", latitude=55.7600, longitude=37.6200),
+            Building(id=4, address="Камчатка", latitude=53.0, longitude=179.99),
+            Building(id=5, address="Чукотка", latitude=53.0, longitude=-179.99),
+        ])
+        db_session.commit()
+
+    def test_backend_detection(self, db_session, monkeypatch):
+        """Тест выбора режима: на SQLite PostGIS не используется, GEO_BACKEND переопределяет выбор"""
+        from app.core import postgis
+        from app.core.config import settings
+
+        assert not postgis.is_available(db_session)
+        monkeypatch.setattr(settings, "GEO_BACKEND", "postgis")
+        assert postgis.is_available(db_session)
+
+    def test_radius_matches_memory_index(self, db_session, buildings):
+        """Тест: поиск в БД возвращает то же, что индекс в памяти, включая переход через 180-й меридиан"""
+        from app.crud.building import building
+
+        for lat, lon, radius in ((55.7558, 37.6173, 1000), (53.0, 180.0, 5000)):
+            store = CoordinateStore()
+            store.load(db_session)
+            expected = store.in_radius(lat=lat, lon=lon, radius_m=radius)
+
+            result = building.get_in_radius(db_session, lat=lat, lon=lon, radius_m=radius)
+
+            assert [(row.id, distance) for row, distance in result] == expected
+
+    def test_rectangle_limit_matches_memory_index(self, db_session, buildings, monkeypatch):
+        """Тест: с limit индекс в памяти и запрос в БД отбирают одни и те же здания (по id)"""
+        from app.core.config import settings
+        from app.core.geo_index import coordinate_store
+        from app.crud.building import building
+
+        def search():
+            rows = building.get_in_rectangle(db_session, min_lat=-90, max_lat=90, min_lon=-180, max_lon=180, limit=3)
+            return [row.id for row in rows]
+
+        expected = search()
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", True)
+        coordinate_store.clear()
+
+        assert expected == [1, 2, 4]
+        assert search() == expected
+
+    def test_rectangle_without_cover_keeps_rows_without_geohash(self, db_session, buildings):
+        """Тест: прямоугольник, не покрываемый ячейками, находит и здания без geohash"""
+        from sqlalchemy import text
+        from app.crud.building import building
+
+        db_session.execute(text(
+            "INSERT INTO buildings (id, address, latitude, longitude) VALUES (6, 'Без geohash', 10.0, 10.0)"
+        ))
+        db_session.commit()
+
+        rows = building.get_in_rectangle(db_session, min_lat=-90, max_lat=90, min_lon=-180, max_lon=180)
+
+        assert 6 in {row.id for row in rows}
+
+    def test_geohash_column_collation(self):
+        """Тест: на PostgreSQL модель объявляет колонку geohash в collation "C", как миграция"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateTable
+        from app.models.building import Building
+
+        ddl = str(CreateTable(Building.__table__).compile(dialect=postgresql.dialect()))
+        assert 'geohash VARCHAR(12) COLLATE "C"' in ddl
+
+    def test_postgis_statements(self, db_session, buildings, monkeypatch):
+        """Тест запросов PostGIS: ST_DWithin и && по колонке geog, сортировка и limit в SQL"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.orm import Session
+        from app.core.config import settings
+        from app.crud.building import building
+        monkeypatch.setattr(settings, "GEO_BACKEND", "postgis")
+
+        statements = []
+
+        def execute(self, statement, *args, **kwargs):
+            statements.append(str(statement.compile(dialect=postgresql.dialect())))
+            raise RuntimeError("stop")
+
+        monkeypatch.setattr(Session, "execute", execute)
+        for search in (
+                lambda: building.get_in_radius(db_session, lat=55.75, lon=37.62, radius_m=1000, limit=20),
+                lambda: building.get_in_rectangle(db_session, min_lat=55.0, max_lat=56.0, min_lon=37.0, max_lon=38.0),
+        ):
+            with pytest.raises(RuntimeError):
+                search()
+
+        radius, rectangle = statements
+        assert "ST_DWithin(buildings.geog, geography(ST_SetSRID(ST_MakePoint(" in radius
+        assert "ORDER BY distance, buildings.id" in radius and "LIMIT" in radius
+        assert "buildings.geog && geography(ST_MakeEnvelope(" in rectangle
+
+
+class TestGeohash:
+    """Тесты geohash и покрытия прямоугольников диапазонами префиксов"""
+
+    def test_encode(self):
+        """Тест кодирования точки"""
+        assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+    def test_successor(self):
+        """Тест границы диапазона строк с префиксом"""
+        assert geohash.successor("u4p") == "u4q"
+        assert geohash.successor("uz") == "v"
+        assert geohash.successor("zz") is None
+
+    @pytest.mark.parametrize("rectangle", [
+        (55.75, 55.76, 37.61, 37.62),
+        (-0.01, 0.01, -0.01, 0.01),
+        (50.0, 60.0, 30.0, 40.0),
+        (-90.0, 90.0, -180.0, 180.0),
+    ])
+    def test_cover_contains_rectangle(self, rectangle):
+        """Тест: покрытие из не более чем MAX_COVER_CELLS ячеек содержит все точки прямоугольника"""
+        import random
+        min_lat, max_lat, min_lon, max_lon = rectangle
+        ranges = geohash.cover(min_lat, max_lat, min_lon, max_lon)
+        if ranges is None:
+            # Весь мир не покрывается MAX_COVER_CELLS ячейками: поиск идет без диапазонов
+            assert rectangle == (-90.0, 90.0, -180.0, 180.0)
+            return
+
+        assert len(ranges) <= geohash.MAX_COVER_CELLS
+        rnd = random.Random(1)
+        for _ in range(500):
+            code = geohash.encode(rnd.uniform(min_lat, max_lat), rnd.uniform(min_lon, max_lon))
+            assert any(code >= start and (end is None or code < end) for start, end in ranges)
+
+    def test_batch_update_recomputes_geohash(self, db_session):
+        """Тест пересчета geohash при пакетном изменении одной из координат"""
+        from app.crud.building import building
+        from app.models.building import Building
+        from app.schemas.building import BuildingBatchItem
+
+        db_session.add(Building(id=1, address="Москва", latitude=55.7558, longitude=37.6173))
+        db_session.commit()
+        assert db_session.get(Building, 1).geohash == geohash.encode(55.7558, 37.6173)
+
+        building.update_many(db_session, [BuildingBatchItem(id=1, latitude=59.9343)])
+
+        db_session.expire_all()
+        assert db_session.get(Building, 1).geohash == geohash.encode(59.9343, 37.6173)
+
+
+POSTGIS_TEST_URL = os.getenv("POSTGIS_TEST_URL")
+
+
+@pytest.mark.skipif(not POSTGIS_TEST_URL, reason="POSTGIS_TEST_URL не задан")
+class TestPostgisBackend:
+    """
+    Тесты геопоиска PostGIS на реальной БД: POSTGIS_TEST_URL - пустая база PostgreSQL,
+    в которой доступно расширение postgis. Схема создается миграциями и удаляется после теста
+    """
+
+    @pytest.fixture
+    def pg_session(self, monkeypatch):
+        import random
+        from alembic import command
+        from alembic.config import Config
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from app.core.config import settings
+        from app.models.building import Building
+
+        monkeypatch.setattr(settings, "DATABASE_URL", POSTGIS_TEST_URL)
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", False)
+        config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+        command.upgrade(config, "head")
+        engine = create_engine(POSTGIS_TEST_URL)
+        session = Session(engine)
+
+        rnd = random.Random(7)
+        points = [(55.75 + rnd.uniform(-0.1, 0.1), 37.62 + rnd.uniform(-0.15, 0.15)) for _ in range(500)]
+        points += [(53.0 + rnd.uniform(-0.05, 0.05), rnd.choice((-1, 1)) * rnd.uniform(179.95, 180.0)) for _ in range(50)]
+        session.add_all([
+            Building(id=i, address=f"Здание {i}", latitude=lat, longitude=lon)
+            for i, (lat, lon) in enumerate(points, start=1)
+        ])
+        session.commit()
+        try:
+            yield session
+        finally:
+            session.close()
+            engine.dispose()
+            command.downgrade(config, "base")
+
+    def _search(self, session, monkeypatch, backend, **kwargs):
+        from app.core.config import settings
+        from app.crud.building import building
+        monkeypatch.setattr(settings, "GEO_BACKEND", backend)
+        return [(row.id, distance) for row, distance in building.get_in_radius(session, **kwargs)]
+
+    @pytest.mark.parametrize("search", [
+        {"lat": 55.75, "lon": 37.62, "radius_m": 3000},
+        {"lat": 55.75, "lon": 37.62, "radius_m": 20000, "limit": 25},
+        {"lat": 53.0, "lon": 180.0, "radius_m": 5000},
+    ])
+    def test_radius_matches_haversine(self, pg_session, monkeypatch, search):
+        """Тест: ST_DWithin/ST_Distance по geography дают те же здания и порядок, что haversine"""
+        expected = self._search(pg_session, monkeypatch, "sql", **search)
+        result = self._search(pg_session, monkeypatch, "postgis", **search)
+
+        assert expected
+        assert [id for id, _ in result] == [id for id, _ in expected]
+        assert [distance for _, distance in result] == pytest.approx([distance for _, distance in expected], abs=0.01)
+
+    def test_geography_column_follows_coordinates(self, pg_session, monkeypatch):
+        """Тест: вычисляемая колонка geog пересчитывается при пакетном изменении координат"""
+        from app.crud.building import building
+        from app.schemas.building import BuildingBatchItem
+
+        building.update_many(pg_session, [BuildingBatchItem(id=1, latitude=10.0, longitude=10.0)])
+
+        assert [id for id, _ in self._search(pg_session, monkeypatch, "postgis", lat=10.0, lon=10.0, radius_m=1)] == [1]
+        rectangle = building.get_in_rectangle(pg_session, min_lat=9.9, max_lat=10.1, min_lon=9.9, max_lon=10.1)
+        assert [row.id for row in rectangle] == [1]
@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+
+
+class TestOrganizationReadModel:
+    """Тесты денормализованной модели чтения организаций"""
+
+    @pytest.fixture(autouse=True)
+    def read_model_enabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "ORGANIZATION_READ_MODEL_ENABLED", True)
+
+    def _document(self, db_session, organization_id):
+        from app.models.organization_document import OrganizationDocument
+
+        document = db_session.get(OrganizationDocument, organization_id, populate_existing=True)
+        return json.loads(document.body) if document else None
+
+    def test_detail_builds_document_on_read(self, client, db_session, test_organization):
+        """Тест ленивого построения документа при первом чтении"""
+        assert self._document(db_session, test_organization.id) is None
+
+        response = client.get(f"/api/v1/organizations/{test_organization.id}")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["name"] == test_organization.name
+        assert data["phone_numbers"][0]["number"] == "123-456-789"
+        assert len(data["activities"]) == 1
+        assert self._document(db_session, test_organization.id) == data
+
+    def test_read_does_not_commit_request_session(self, db_session, test_organization):
+        """Тест: построенный при чтении документ сохраняется без коммита сессии запроса"""
+        from sqlalchemy import event
+        from app.crud.organization_document import organization_document
+
+        commits = []
+
+        def on_commit(session):
+            commits.append(session)
+
+        event.listen(db_session, "after_commit", on_commit)
+        try:
+            body = organization_document.get_body(db_session, test_organization.id)
+        finally:
+            event.remove(db_session, "after_commit", on_commit)
+
+        assert commits == []
+        assert self._document(db_session, test_organization.id) == json.loads(body)
+
+    def test_list_served_from_documents(self, client, test_organization):
+        """Тест списка организаций из модели чтения"""
+        response = client.get("/api/v1/organizations/")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["id"] == test_organization.id
+
+    def test_nonexistent_organization(self, client):
+        """Тест 404 для отсутствующей организации"""
+        response = client.get("/api/v1/organizations/999")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_document_maintained_on_write(self, client, db_session, test_building, test_activity_tree):
+        """Тест обновления документа при создании, изменении и удалении"""
+        response = client.post("/api/v1/organizations/", json={
+            "name": "Организация с документом",
+            "building_id": test_building.id,
+            "phone_numbers": [{"number": "111-222-333"}],
+            "activity_ids": [test_activity_tree["child"].id]
+        })
+        organization_id = response.json()["id"]
+
+        document = self._document(db_session, organization_id)
+        assert document["name"] == "Организация с документом"
+        assert document["activities"][0]["name"] == "Тестовая дочерняя"
+
+        client.put(f"/api/v1/organizations/{organization_id}", json={"name": "Новое имя"})
+        assert self._document(db_session, organization_id)["name"] == "Новое имя"
+
+        client.delete(f"/api/v1/organizations/{organization_id}")
+        assert self._document(db_session, organization_id) is None
+
+    def test_document_refreshed_on_activity_rename(self, client, db_session, test_organization, test_activity_tree):
+        """Тест обновления документов при переименовании вида деятельности"""
+        from app.crud.activity import activity as crud_activity
+        from app.schemas.activity import ActivityUpdate
+
+        client.get(f"/api/v1/organizations/{test_organization.id}")
+        activity = crud_activity.get(db_session, test_activity_tree["root"].id)
+        crud_activity.update(db_session, db_obj=activity, obj_in=ActivityUpdate(name="Переименованная"))
+
+        document = self._document(db_session, test_organization.id)
+        assert document["activities"][0]["name"] == "Переименованная"
+
+    def test_document_not_rebuilt_on_activity_move(self, client, db_session, test_organization, test_activity_tree,
+                                                   monkeypatch):
+        """Тест: перенос вида деятельности и повтор прежнего названия документы не перестраивают"""
+        from app.crud.activity import activity as crud_activity
+        from app.crud.organization_document import organization_document
+        from app.schemas.activity import ActivityUpdate
+
+        refreshed = []
+        monkeypatch.setattr(organization_document, "refresh_for_activity", lambda db, id: refreshed.append(id))
+        child = crud_activity.get(db_session, test_activity_tree["child"].id)
+
+        crud_activity.move(db_session, db_obj=child, parent_id=None)
+        crud_activity.update(db_session, db_obj=child, obj_in=ActivityUpdate(name=child.name, parent_id=None))
+        assert refreshed == []
+
+        crud_activity.update(db_session, db_obj=child, obj_in=ActivityUpdate(name="Новое название"))
+        assert refreshed == [child.id]
+
+    def test_documents_built_from_payloads(self, client, db_session, test_organization, test_activity_tree):
+        """Тест: ленивое построение и запись при PUT дают те же байты, что ответ списка"""
+        from app.crud.organization import organization as crud_organization
+        from app.crud.organization_document import organization_document
+        from app.models.organization_document import OrganizationDocument
+
+        client.put(f"/api/v1/organizations/{test_organization.id}", json={
+            "phone_numbers": [{"number": "999-888-777"}, {"number": "123-456-789"}],
+            "activity_ids": [test_activity_tree["grandchild"].id, test_activity_tree["root"].id],
+        })
+        written = db_session.get(OrganizationDocument, test_organization.id, populate_existing=True).body
+        payload = crud_organization.get_payloads(db_session, [test_organization.id])[0]
+        assert written == organization_document.render_payload(payload)
+
+        organization_document.remove(db_session, [test_organization.id])
+        db_session.commit()
+        assert organization_document.get_body(db_session, test_organization.id) == written
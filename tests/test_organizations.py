@@ -1,3 +1,4 @@
+import pytest
 from fastapi import status
 
 
@@ -16,6 +17,22 @@ class TestOrganizations:
         assert len(data[0]["phone_numbers"]) == 1
         assert len(data[0]["activities"]) == 1
 
+    def test_get_organizations_matches_schema(self, client, test_organization):
+        """Тест соответствия быстрого ответа схеме OrganizationSimple"""
+        from typing import List
+        from pydantic import TypeAdapter
+        from app.schemas.organization import OrganizationSimple
+
+        response = client.get("/api/v1/organizations/")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        validated = TypeAdapter(List[OrganizationSimple]).validate_python(data)
+
+        assert [item.model_dump() for item in validated] == data
+        assert data[0]["phone_numbers"][0]["number"] == "123-456-789"
+        assert data[0]["activities"][0]["name"] == "Тестовая корневая"
+
     def test_get_organization_detail(self, client, test_organization):
         """Тест получения деталей организации"""
         response = client.get(f"/api/v1/organizations/{test_organization.id}")
@@ -80,6 +97,25 @@ class TestOrganizations:
         assert len(data) == 1
         assert data[0]["id"] == test_organization.id
 
+    def test_search_organizations_by_name_paginated(self, client, db_session, test_building):
+        """Тест пагинации отфильтрованного списка на стороне БД"""
+        from app.models.organization import Organization
+
+        db_session.add_all([
+            Organization(name=f"Фильтруемая {i}", building_id=test_building.id) for i in range(5)
+        ])
+        db_session.commit()
+
+        response = client.get(
+            "/api/v1/organizations/",
+            params={"name": "Фильтруемая", "skip": 1, "limit": 2}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        assert [org["name"] for org in data] == ["Фильтруемая 1", "Фильтруемая 2"]
+
     def test_search_organizations_by_name_no_results(self, client):
         """Тест поиска организаций по несуществующему названию"""
         response = client.get(
@@ -120,6 +156,48 @@ class TestOrganizations:
         assert len(data) == 1
         assert data[0]["id"] == test_organization.id
 
+    @pytest.mark.parametrize("read_model", [False, True])
+    def test_search_organizations_in_circle_nearest_first(self, client, db_session, test_building, monkeypatch,
+                                                          read_model):
+        """Тест выдачи организаций по кругу: ближайшие первыми, с расстоянием, с пагинацией"""
+        from app.core.config import settings
+        from app.models.building import Building
+        from app.models.organization import Organization
+        monkeypatch.setattr(settings, "ORGANIZATION_READ_MODEL_ENABLED", read_model)
+
+        far = Building(address="Дальнее здание", latitude=55.7608, longitude=37.6173)
+        db_session.add(far)
+        db_session.flush()
+        db_session.add_all([
+            Organization(name="Дальняя", building_id=far.id),
+            Organization(name="Ближняя", building_id=test_building.id),
+        ])
+        db_session.commit()
+
+        area = f"circle:{test_building.latitude},{test_building.longitude},1000"
+        data = client.get("/api/v1/organizations/", params={"in_area": area}).json()
+
+        assert [item["name"] for item in data] == ["Ближняя", "Дальняя"]
+        assert data[0]["distance"] == pytest.approx(0.0)
+        assert data[1]["distance"] == pytest.approx(556, abs=1)
+
+        data = client.get("/api/v1/organizations/", params={"in_area": area, "skip": 1, "limit": 1}).json()
+        assert [item["name"] for item in data] == ["Дальняя"]
+
+    def test_search_organizations_in_area_without_geo_index(self, client, test_organization, test_building,
+                                                            monkeypatch):
+        """Тест поиска организаций по области без индекса координат (ID зданий из БД)"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "GEO_INDEX_ENABLED", False)
+
+        for area in (f"circle:{test_building.latitude},{test_building.longitude},1000",
+                     f"rect:{test_building.latitude - 0.1},{test_building.longitude - 0.1},"
+                     f"{test_building.latitude + 0.1},{test_building.longitude + 0.1}"):
+            response = client.get("/api/v1/organizations/", params={"in_area": area})
+
+            assert response.status_code == status.HTTP_200_OK
+            assert [item["id"] for item in response.json()] == [test_organization.id]
+
     def test_search_organizations_invalid_area_format(self, client):
         """Тест поиска организаций с невалидным форматом области"""
         response = client.get(
@@ -151,6 +229,118 @@ class TestOrganizations:
         assert len(data["phone_numbers"]) == 2
         assert len(data["activities"]) == 1
 
+    @pytest.mark.parametrize("number, normalized", [
+        ("8-916-123-45-67", "79161234567"),
+        ("+7-916-123-45-67", "79161234567"),
+        ("(916) 123-45-67", "79161234567"),
+        ("123-45-67", "74951234567"),
+        ("+44 20 7946 0958", "442079460958"),
+        ("123-456-789", None),
+    ])
+    def test_normalize_phone(self, number, normalized):
+        """Тест приведения номеров к E.164"""
+        from app.core.phones import normalize_phone
+
+        assert normalize_phone(number) == normalized
+
+    def test_get_organization_by_phone(self, client, test_building):
+        """Тест поиска организации по номеру в другом формате"""
+        response = client.post("/api/v1/organizations/", json={
+            "name": "Организация с телефоном",
+            "building_id": test_building.id,
+            "phone_numbers": [{"number": "8-916-123-45-67"}],
+        })
+        organization_id = response.json()["id"]
+
+        response = client.get("/api/v1/organizations/by-phone", params={"number": "+7 (916) 123-45-67"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["id"] == organization_id
+        assert response.json()["phone_numbers"][0]["number"] == "8-916-123-45-67"
+
+        response = client.get("/api/v1/organizations/by-phone", params={"number": "8-916-000-00-00"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.get("/api/v1/organizations/by-phone", params={"number": "12-34"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_legacy_duplicate_phone_update(self, db_session, test_organization):
+        """Тест: повтор номера без normalized (после миграции) обновляется без нарушения индекса"""
+        from sqlalchemy import insert
+        from app.models.organization import Organization
+        from app.models.phone_number import PhoneNumber
+
+        owner = test_organization.phone_numbers[0]
+        owner.number = "8-916-123-45-67"
+        db_session.commit()
+        assert owner.normalized == "79161234567"
+
+        duplicate_id = db_session.execute(
+            insert(PhoneNumber).values(number="+7 916 123-45-67", normalized=None, organization_id=owner.organization_id)
+            .returning(PhoneNumber.id)
+        ).scalar_one()
+        db_session.commit()
+
+        other = Organization(name="Другая организация", building_id=test_organization.building_id)
+        db_session.add(other)
+        db_session.flush()
+        duplicate = db_session.get(PhoneNumber, duplicate_id)
+        duplicate.organization_id = other.id
+        db_session.commit()
+        assert duplicate.normalized is None
+
+        duplicate.number = "8-916-000-00-00"
+        db_session.commit()
+        assert duplicate.normalized == "79160000000"
+
+    def test_phone_belongs_to_one_organization(self, client, test_building, test_organization):
+        """Тест запрета одного номера у разных организаций"""
+        client.put(f"/api/v1/organizations/{test_organization.id}",
+                   json={"phone_numbers": [{"number": "8-916-123-45-67"}]})
+
+        response = client.post("/api/v1/organizations/", json={
+            "name": "Другая организация",
+            "building_id": test_building.id,
+            "phone_numbers": [{"number": "+7-916-123-45-67"}],
+        })
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        # Смена формата номера у той же организации не конфликтует
+        response = client.put(f"/api/v1/organizations/{test_organization.id}",
+                              json={"phone_numbers": [{"number": "+7-916-123-45-67"}]})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_update_missing_organization_with_phones(self, client, test_organization):
+        """Тест: обновление телефонов отсутствующей организации - 404, а не конфликт номеров"""
+        client.put(f"/api/v1/organizations/{test_organization.id}",
+                   json={"phone_numbers": [{"number": "8-916-123-45-67"}]})
+
+        response = client.put("/api/v1/organizations/999", json={"phone_numbers": [{"number": "8-916-123-45-67"}]})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_concurrent_phone_conflict(self, client, db_session, test_building, test_organization, monkeypatch):
+        """Тест: номер, занятый после проверки (гонка записей), отклоняется индексом с 409"""
+        from app.crud.organization import organization as crud_organization
+
+        client.put(f"/api/v1/organizations/{test_organization.id}",
+                   json={"phone_numbers": [{"number": "8-916-123-45-67"}]})
+        monkeypatch.setattr(crud_organization, "check_phones", lambda *args, **kwargs: None)
+
+        response = client.post("/api/v1/organizations/", json={
+            "name": "Другая организация",
+            "building_id": test_building.id,
+            "phone_numbers": [{"number": "+7-916-123-45-67"}],
+        })
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        other = client.post("/api/v1/organizations/", json={"name": "Третья", "building_id": test_building.id})
+        response = client.put(f"/api/v1/organizations/{other.json()['id']}",
+                              json={"name": "Переименованная", "phone_numbers": [{"number": "+7-916-123-45-67"}]})
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert client.get(f"/api/v1/organizations/{other.json()['id']}").json()["name"] == "Третья"
+
     def test_create_organization_invalid_building(self, client):
         """Тест создания организации с невалидным зданием"""
         organization_data = {
@@ -181,6 +371,39 @@ class TestOrganizations:
         assert data["name"] == "Обновленное название организации"
         assert data["id"] == test_organization.id
 
+    def test_update_organization_phones_and_activities(self, client, db_session, test_organization, test_activity_tree):
+        """Тест обновления телефонов и видов деятельности организации"""
+        from app.models.phone_number import PhoneNumber
+
+        kept_phone_id = test_organization.phone_numbers[0].id
+        update_data = {
+            "phone_numbers": [{"number": "123-456-789"}, {"number": "999-888-777"}],
+            "activity_ids": [test_activity_tree["child"].id, test_activity_tree["grandchild"].id, 999]
+        }
+
+        response = client.put(f"/api/v1/organizations/{test_organization.id}", json=update_data)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+
+        assert data["name"] == test_organization.name
+        assert [phone["number"] for phone in data["phone_numbers"]] == ["123-456-789", "999-888-777"]
+        assert data["phone_numbers"][0]["id"] == kept_phone_id
+        assert {activity["id"] for activity in data["activities"]} == {
+            test_activity_tree["child"].id, test_activity_tree["grandchild"].id
+        }
+        assert db_session.query(PhoneNumber).count() == 2
+
+        response = client.get(f"/api/v1/organizations/{test_organization.id}")
+        assert response.json()["phone_numbers"] == data["phone_numbers"]
+        assert len(response.json()["activities"]) == 2
+
+    def test_update_nonexistent_organization(self, client):
+        """Тест обновления несуществующей организации"""
+        response = client.put("/api/v1/organizations/999", json={"name": "Нет такой"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
     def test_delete_organization(self, client, db_session):
         """Тест удаления организации"""
         from app.models.organization import Organization
@@ -208,4 +431,45 @@ class TestOrganizations:
 
         # Проверяем, что организация удалена
         response = client.get(f"/api/v1/organizations/{organization.id}")
-        assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_bulk_delete_organizations(self, client, db_session, test_organization):
+        """Тест пакетного удаления организаций"""
+        from app.models.phone_number import PhoneNumber
+        from app.models.organization import organization_activities
+
+        response = client.post(
+            "/api/v1/organizations/bulk-delete",
+            json={"ids": [test_organization.id, 999]}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"deleted": [test_organization.id], "not_found": [999]}
+
+        assert db_session.query(PhoneNumber).count() == 0
+        assert db_session.query(organization_activities).count() == 0
+
+        response = client.get(f"/api/v1/organizations/{test_organization.id}")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete_nonexistent_organization(self, client):
+        """Тест удаления несуществующей организации"""
+        response = client.delete("/api/v1/organizations/999")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+    def test_details_query_uses_compiled_cache(self, db_session, test_organization):
+        """Тест: повторный запрос деталей организации берется из кэша компиляции"""
+        from app.core.metrics import metrics
+        from app.crud.organization import organization
+
+        organization.get_with_details(db_session, test_organization.id)
+        hits = metrics.get("sqlalchemy_compiled_cache_total", result="cache_hit")
+        db_session.expunge_all()
+
+        loaded = organization.get_with_details(db_session, test_organization.id)
+
+        assert loaded.building.id == test_organization.building_id
+        assert [phone.number for phone in loaded.phone_numbers] == ["123-456-789"]
+        assert metrics.get("sqlalchemy_compiled_cache_total", result="cache_hit") > hits
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from fastapi import status
+
+from app.core.api_keys import api_key_store, hash_key
+from app.core.config import settings
+from app.core.rate_limit import MemoryBucketBackend, concurrency
+
+
+class TestRateLimit:
+    """Тесты ключей API и ограничения частоты запросов"""
+
+    @pytest.fixture
+    def limited_key(self, tmp_path, monkeypatch):
+        """Дополнительный ключ с корзиной на 5 токенов"""
+        keys_file = tmp_path / "api_keys.json"
+        keys_file.write_text(json.dumps([
+            {"name": "partner", "sha256": hash_key("partner-key"), "rate": 0.1, "burst": 5, "concurrency": 1}
+        ]))
+        monkeypatch.setattr(settings, "API_KEYS_FILE", str(keys_file))
+        api_key_store.clear()
+        yield "partner-key"
+        api_key_store.clear()
+
+    def test_token_bucket(self):
+        """Тест списания и пополнения токенов"""
+        backend = MemoryBucketBackend()
+
+        assert backend.acquire("k", 3, rate=1, burst=4) == 0
+        assert backend.acquire("k", 1, rate=1, burst=4) == 0
+        assert backend.acquire("k", 2, rate=1, burst=4) == pytest.approx(2, abs=0.01)
+
+    def test_additional_key(self, client, limited_key):
+        """Тест аутентификации ключом из файла: хранится только хеш"""
+        response = client.get("/api/v1/buildings/", headers={"X-API-Key": limited_key})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert api_key_store.get(limited_key).name == "partner"
+        assert api_key_store.get(settings.API_KEY).name == "default"
+
+    def test_rate_limit_exceeded(self, client, limited_key):
+        """Тест ответа 429 с Retry-After после исчерпания корзины"""
+        headers = {"X-API-Key": limited_key}
+
+        for _ in range(5):
+            assert client.get("/api/v1/buildings/", headers=headers).status_code == status.HTTP_200_OK
+
+        response = client.get("/api/v1/buildings/", headers=headers)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["Retry-After"]) >= 1
+        # Лимит другого ключа не затронут
+        assert client.get("/api/v1/buildings/").status_code == status.HTTP_200_OK
+
+    def test_expensive_endpoint_costs_more(self, client, limited_key):
+        """Тест веса запроса: поиск по области списывает больше токенов"""
+        headers = {"X-API-Key": limited_key}
+        params = {"lat": 55.0, "lon": 37.0, "radius": 100}
+
+        assert client.get("/api/v1/buildings/nearby", params=params, headers=headers).status_code == 200
+        response = client.get("/api/v1/buildings/nearby", params=params, headers=headers)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_concurrency_limit(self, client, limited_key):
+        """Тест ограничения одновременных запросов ключа"""
+        assert concurrency.enter("partner", 1)
+        try:
+            response = client.get("/api/v1/buildings/", headers={"X-API-Key": limited_key})
+        finally:
+            concurrency.exit("partner")
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.json()["detail"] == "Too many concurrent requests"
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import status
+
+from app.core.metrics import metrics
+from app.core.single_flight import SingleFlight, request_key
+
+
+class TestSingleFlight:
+    """Тесты объединения одинаковых одновременных запросов"""
+
+    def test_join(self):
+        """Тест выбора leader и завершения вызова"""
+        group = SingleFlight()
+
+        future, leader = group.join("key")
+        same, follower_is_leader = group.join("key")
+
+        assert leader and not follower_is_leader
+        assert same is future
+
+        group.resolve("key", future, 42)
+
+        assert same.result() == 42
+        assert len(group) == 0
+        assert group.join("key")[1]
+
+    def test_request_key(self):
+        """Тест нормализации ключа запроса"""
+        def scope(query: bytes, api_key: bytes = b"k"):
+            return {"path": "/api/v1/organizations/", "query_string": query, "headers": [(b"x-api-key", api_key)]}
+
+        assert request_key(scope(b"name=a&limit=10")) == request_key(scope(b"limit=10&name=a"))
+        assert request_key(scope(b"name=a")) != request_key(scope(b"name=b"))
+        assert request_key(scope(b"name=a")) != request_key(scope(b"name=a", api_key=b"other"))
+
+    def test_concurrent_requests_coalesced(self, client, test_building, monkeypatch):
+        """Тест: одинаковые одновременные запросы выполняются один раз"""
+        from app.crud import building as crud_building
+
+        original = crud_building.building.get_multi_rows
+        calls = []
+        followers_before = metrics.get("single_flight_requests_total", role="follower")
+
+        def slow_get_multi_rows(*args, **kwargs):
+            calls.append(1)
+            # Ждем, пока остальные запросы присоединятся к выполняемому
+            deadline = time.monotonic() + 2
+            while (metrics.get("single_flight_requests_total", role="follower") - followers_before < 4
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(crud_building.building, "get_multi_rows", slow_get_multi_rows)
+
+        start = threading.Barrier(5)
+
+        def fetch(_):
+            start.wait()
+            return client.get("/api/v1/buildings/")
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(fetch, range(5)))
+
+        assert [r.status_code for r in responses] == [status.HTTP_200_OK] * 5
+        assert all(r.json() == responses[0].json() for r in responses)
+        assert responses[0].json()[0]["id"] == test_building.id
+        assert len(calls) == 1
+
+        response = client.get("/metrics")
+        assert 'single_flight_requests_total{role="follower"}' in response.text
@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+import pytest
+from fastapi import status
+from sqlalchemy.orm import sessionmaker
+
+from app.core.warmup import readiness, run_warmup
+from app.main import app
+
+
+class TestWarmup:
+    """Тесты прогрева воркера и готовности"""
+
+    @pytest.fixture
+    def engine(self, db_session):
+        return db_session.get_bind()
+
+    def test_ready_after_warmup(self, client, engine, test_organization):
+        """Тест: /ready отвечает 200 только после прогрева"""
+        readiness.reset()
+
+        response = client.get("/ready")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["status"] == "warming_up"
+
+        run_warmup(app, engine, sessionmaker(bind=engine))
+
+        response = client.get("/ready")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["errors"] == []
+        assert set(data["steps_ms"]) == {"mappers", "openapi", "pool", "coordinate_index", "queries"}
+
+    def test_warmup_errors_are_reported(self, engine, monkeypatch):
+        """Тест: ошибка шага прогрева не мешает готовности и видна в /ready"""
+        from app.core import warmup
+
+        def broken(db, organizations):
+            raise RuntimeError("database is unavailable")
+
+        monkeypatch.setattr(warmup, "warm_queries", broken)
+
+        run_warmup(app, engine, sessionmaker(bind=engine))
+
+        assert readiness.ready
+        assert readiness.errors == ["queries: database is unavailable"]
+
+    def test_serving_imports_exclude_tooling(self):
+        """Тест: импорт приложения не загружает Alembic, миграции и скрипты"""
+        code = (
+            "import sys, app.main; "
+            "print(','.join(m for m in sys.modules if m.split('.')[0] in ('alembic', 'scripts', 'redis') "
+            "or m.startswith('app.migrations')))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == ""
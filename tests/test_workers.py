@@ -0,0 +1,43 @@
+import pytest
+
+from app.core.config import settings
+from app.core.workers import pool_limits, worker_count
+
+
+class TestWorkers:
+    """Тесты числа воркеров и размера пула по бюджету соединений"""
+
+    @pytest.fixture(autouse=True)
+    def defaults(self, monkeypatch):
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 0)
+        monkeypatch.setattr(settings, "DB_CONNECTION_BUDGET", 0)
+        monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+        monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+        monkeypatch.setattr(settings, "CHANGE_BUS", "auto")
+
+    def test_worker_count(self, monkeypatch):
+        """Тест: 2 * CPU + 1, явное WEB_CONCURRENCY и ограничение бюджетом соединений"""
+        assert worker_count(cpu_count=4) == 9
+
+        monkeypatch.setattr(settings, "DB_CONNECTION_BUDGET", 10)
+        assert worker_count(cpu_count=4) == 5
+
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 3)
+        assert worker_count(cpu_count=4) == 3
+
+    def test_pool_limits_without_budget(self):
+        """Тест: без бюджета у воркера полный пул из настроек"""
+        assert pool_limits(workers=8) == (5, 10)
+
+    def test_pool_limits_split_budget(self, monkeypatch):
+        """Тест: бюджет делится между воркерами за вычетом LISTEN-соединения и урезает сначала переполнение"""
+        monkeypatch.setattr(settings, "DB_CONNECTION_BUDGET", 100)
+        assert pool_limits(workers=4) == (5, 10)
+        assert pool_limits(workers=10) == (5, 4)
+        assert pool_limits(workers=40) == (1, 0)
+
+        monkeypatch.setattr(settings, "CHANGE_BUS", "local")
+        assert pool_limits(workers=10) == (5, 5)
+
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 25)
+        assert pool_limits() == (4, 0)